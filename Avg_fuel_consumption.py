@@ -1,40 +1,20 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+from route_ledger import measured_fuel_ledger
+from signal_store import open_signals
 
-# Load data from the CSV file
-data = pd.read_csv("data.csv", sep=';')
+# Open the memory-mapped per-topic store (built from data.csv on the first run); only numbers are printed,
+# so neither pandas nor matplotlib is imported
+signals = open_signals('data.csv')
 
-# Convert timestamp column to datetime format and sort by time for consistency
-data['timestamp'] = pd.to_datetime(data['timestamp'])
-data.sort_values(by='timestamp', inplace=True)
-
-# Filter relevant rows: engine load and fuel consumption for each engine
-engine_load_data = data[data['var'].str.contains("engine_load")]
-fuel_data = data[data['var'].str.contains("fuel_consumption")]
-
-# Pivot data so each engine's load and fuel consumption are in separate columns
-engine_load_data = engine_load_data.pivot(index='timestamp', columns='var', values='value')
-fuel_data = fuel_data.pivot(index='timestamp', columns='var', values='value')
-
-# Merge engine load and fuel data into a single DataFrame
-merged_data = engine_load_data.join(fuel_data, how='outer').sort_index().fillna(method='ffill')
-
-# Calculate total fuel consumption at each time step by summing fuel consumption across engines
-merged_data['total_fuel_consumption'] = merged_data.filter(like='fuel_consumption').sum(axis=1)
-
-# Calculate time difference in hours between each reading
-time_diff_hours = merged_data.index.to_series().diff().dt.total_seconds().fillna(0) / 3600
-
-# Calculate fuel consumed at each step in liters and kilograms
-merged_data['fuel_consumed_step_L'] = merged_data['total_fuel_consumption'] * time_diff_hours
-merged_data['fuel_consumed_step_kg'] = merged_data['fuel_consumed_step_L'] * 0.82  # Convert to kg
+# Fuel consumed at each step (union of engine load and fuel consumption timestamps, fuel flow forward filled
+# per engine, flow * time since the previous reading), summed once in liters and kilograms
+ledger = measured_fuel_ledger(signals)
 
 # Calculate total fuel consumed in kg and liters over the entire period
-total_fuel_consumed_kg = merged_data['fuel_consumed_step_kg'].sum()
-total_fuel_consumed_L = merged_data['fuel_consumed_step_L'].sum()
+total_fuel_consumed_kg = ledger.prefix['fuel_kg'][-1]
+total_fuel_consumed_L = ledger.prefix['fuel_L'][-1]
 
 # Calculate total time in hours
-total_time_hours = time_diff_hours.sum()
+total_time_hours = (ledger.timestamps[-1] - ledger.timestamps[0]) / 3.6e12
 
 # Calculate average fuel consumption rate in kg per hour
 average_fuel_consumption_kg_per_hour = total_fuel_consumed_kg / total_time_hours
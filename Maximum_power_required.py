@@ -1,26 +1,16 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+from signal_store import load_signals, ENGINE1_LOAD, ENGINE2_LOAD, ENGINE3_LOAD
+from figures import figure_spec, hline, line, show_or_save
 
-# Load the data
-df = pd.read_csv('data.csv', sep=';')
-
-# Convert timestamp column to datetime format with UTC timezone
-df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
-
-# Filter data for specific engines
-df_engine_1 = df[df['var'] == 'gunnerus/RVG_mqtt/Engine1/engine_load']
-df_engine_2 = df[df['var'] == 'gunnerus/RVG_mqtt/Engine2/engine_load']
-df_engine_3 = df[df['var'] == 'gunnerus/RVG_mqtt/Engine3/engine_load']
+# Load the data, grouped by topic once (parsed once, then read from the binary cache)
+signals = load_signals('data.csv')
 
 # Define the adjustable start and stop interval for the entire trip
-start_time_tot = df['timestamp'].min()
-stop_time_tot = df['timestamp'].max()
+start_time_tot, stop_time_tot = signals.time_range()
 
-# Filter data for the full trip interval
-df_engine_1_interval = df_engine_1[(df_engine_1['timestamp'] >= start_time_tot) & (df_engine_1['timestamp'] <= stop_time_tot)]
-df_engine_2_interval = df_engine_2[(df_engine_2['timestamp'] >= start_time_tot) & (df_engine_2['timestamp'] <= stop_time_tot)]
-df_engine_3_interval = df_engine_3[(df_engine_3['timestamp'] >= start_time_tot) & (df_engine_3['timestamp'] <= stop_time_tot)]
+# Get data for specific engines in the interval (found by binary search in each topic)
+df_engine_1_interval = signals.frame(ENGINE1_LOAD, start=start_time_tot, stop=stop_time_tot)
+df_engine_2_interval = signals.frame(ENGINE2_LOAD, start=start_time_tot, stop=stop_time_tot)
+df_engine_3_interval = signals.frame(ENGINE3_LOAD, start=start_time_tot, stop=stop_time_tot)
 
 # Calculate the maximum engine load for each engine during the interval
 max_engine_1_load = df_engine_1_interval['value'].max()
@@ -32,28 +22,15 @@ print(f"Maximum Engine 1 Load: {max_engine_1_load:.2f} kW")
 print(f"Maximum Engine 2 Load: {max_engine_2_load:.2f} kW")
 print(f"Maximum Engine 3 Load: {max_engine_3_load:.2f} kW")
 
-# Plot the interval with engine loads for Engines 1, 2, and 3
-plt.figure(figsize=(12, 6))
-plt.plot(df_engine_1_interval['timestamp'], df_engine_1_interval['value'], label='Engine 1 Load', color='blue')
-plt.plot(df_engine_2_interval['timestamp'], df_engine_2_interval['value'], label='Engine 2 Load', color='orange')
-plt.plot(df_engine_3_interval['timestamp'], df_engine_3_interval['value'], label='Engine 3 Load', color='green')
-
-# Mark maximum load points on the plot
-plt.axhline(max_engine_1_load, color='blue', linestyle='--', linewidth=1, label=f'Max Engine 1 Load: {max_engine_1_load:.2f} kW')
-plt.axhline(max_engine_2_load, color='orange', linestyle='--', linewidth=1, label=f'Max Engine 2 Load: {max_engine_2_load:.2f} kW')
-plt.axhline(max_engine_3_load, color='green', linestyle='--', linewidth=1, label=f'Max Engine 3 Load: {max_engine_3_load:.2f} kW')
-
-# Add labels and title
-plt.xlabel('Time')
-plt.ylabel('Engine Load [kW]')
-plt.title(f'Engine Load from {start_time_tot.time()} to {stop_time_tot.time()}')
-plt.legend(loc='upper right')
-plt.grid(True)
-
-# Format the x-axis for readability
-plt.xticks(rotation=45)
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M:%S'))
-
-# Adjust layout and display the plot
-plt.tight_layout()
-plt.show()
+# Plot the interval with engine loads for Engines 1, 2, and 3, with the maximum load points marked
+# (long logs are reduced to min/max per pixel column, so the peaks are still drawn; shown, or saved to $PSM_FIGURE_DIR)
+show_or_save([figure_spec('Maximum_power_required', [
+    line(df_engine_1_interval['timestamp'], df_engine_1_interval['value'], label='Engine 1 Load', color='blue'),
+    line(df_engine_2_interval['timestamp'], df_engine_2_interval['value'], label='Engine 2 Load', color='orange'),
+    line(df_engine_3_interval['timestamp'], df_engine_3_interval['value'], label='Engine 3 Load', color='green'),
+], hlines=[
+    hline(max_engine_1_load, color='blue', linestyle='--', linewidth=1, label=f'Max Engine 1 Load: {max_engine_1_load:.2f} kW'),
+    hline(max_engine_2_load, color='orange', linestyle='--', linewidth=1, label=f'Max Engine 2 Load: {max_engine_2_load:.2f} kW'),
+    hline(max_engine_3_load, color='green', linestyle='--', linewidth=1, label=f'Max Engine 3 Load: {max_engine_3_load:.2f} kW'),
+], title=f'Engine Load from {start_time_tot.time()} to {stop_time_tot.time()}', xlabel='Time', ylabel='Engine Load [kW]',
+    legend='upper right', date_format='%Y-%m-%d %H:%M:%S', xtick_rotation=45, tight_layout=True)])
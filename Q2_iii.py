@@ -1,98 +1,42 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+from figures import figure_spec, line, show_or_save
+from route_ledger import load_routes, measured_fuel_ledger
+from signal_store import open_signals
 
-# Load data from the CSV file
-data = pd.read_csv("data.csv", sep=';')
+# Open the memory-mapped per-topic store (built from data.csv on the first run)
+signals = open_signals('data.csv')
 
-# Convert timestamp to a datetime format and sort by time for consistency
-data['timestamp'] = pd.to_datetime(data['timestamp'])
-data.sort_values(by='timestamp', inplace=True)
+# Fuel consumed at each step (union of engine load and fuel consumption timestamps, fuel flow forward filled
+# per engine, flow * time since the previous reading), summed once into cumulative liters and kilograms
+ledger = measured_fuel_ledger(signals)
 
-# Filter relevant rows: engine load and fuel consumption for each engine
-engine_load_data = data[data['var'].str.contains("engine_load")]
-fuel_data = data[data['var'].str.contains("fuel_consumption")]
-
-# Pivot data so each engine's load and fuel consumption are in separate columns
-engine_load_data = engine_load_data.pivot(index='timestamp', columns='var', values='value')
-fuel_data = fuel_data.pivot(index='timestamp', columns='var', values='value')
-
-# Merge engine load and fuel data into a single DataFrame
-merged_data = engine_load_data.join(fuel_data, how='outer').sort_index().fillna(method='ffill')
-
-# Calculate total fuel consumption at each time step by summing fuel consumption across engines
-merged_data['total_fuel_consumption'] = merged_data.filter(like='fuel_consumption').sum(axis=1)
-
-# Calculate time difference in hours between each reading
-time_diff_hours = merged_data.index.to_series().diff().dt.total_seconds().fillna(0) / 3600
-
-# Calculate fuel consumed at each step in liters and kilograms
-merged_data['fuel_consumed_step_L'] = merged_data['total_fuel_consumption'] * time_diff_hours
-merged_data['fuel_consumed_step_kg'] = merged_data['fuel_consumed_step_L'] * 0.82  # Convert to kg
-
-# Calculate cumulative fuel consumption in liters and kg over time
-merged_data['cumulative_fuel_L'] = merged_data['fuel_consumed_step_L'].cumsum()
-merged_data['cumulative_fuel_kg'] = merged_data['fuel_consumed_step_kg'].cumsum()
-
-# Define the time intervals for Route 1 and Route 2
-route1_start = pd.to_datetime('2024-09-10 06:30:26').tz_localize('UTC')
-route1_stop = pd.to_datetime('2024-09-10 06:45:30').tz_localize('UTC')
-route2_start = pd.to_datetime('2024-09-10 06:45:30').tz_localize('UTC')
-route2_stop = pd.to_datetime('2024-09-10 07:07:00').tz_localize('UTC')
-
-# Filter data for each route
-df_route1 = merged_data[(merged_data.index >= route1_start) & (merged_data.index <= route1_stop)].copy()
-df_route2 = merged_data[(merged_data.index >= route2_start) & (merged_data.index <= route2_stop)].copy()
-
-# Reset cumulative fuel consumption to start from 0 for Route 1 and Route 2
-df_route1['cumulative_fuel_L'] -= df_route1['cumulative_fuel_L'].iloc[0]
-df_route1['cumulative_fuel_kg'] -= df_route1['cumulative_fuel_kg'].iloc[0]
-df_route2['cumulative_fuel_L'] -= df_route2['cumulative_fuel_L'].iloc[0]
-df_route2['cumulative_fuel_kg'] -= df_route2['cumulative_fuel_kg'].iloc[0]
+# Routes from routes.csv (route;start;stop); the fuel of a route is the difference of the cumulative sums
+# at its first and last reading, found by binary search
+routes = load_routes('routes.csv')
+route_totals = ledger.route_totals(routes)
 
 # Print cumulative fuel consumption for the entire dataset
 print("Cumulative Fuel Consumption at End of Interval (Entire Dataset):")
-print(f"Liters: {merged_data['cumulative_fuel_L'].iloc[-1]:.2f} L")
-print(f"Kilograms: {merged_data['cumulative_fuel_kg'].iloc[-1]:.2f} kg\n")
-
-# Print cumulative fuel consumption for Route 1
-print("Cumulative Fuel Consumption at End of Route 1:")
-print(f"Liters: {df_route1['cumulative_fuel_L'].iloc[-1]:.2f} L")
-print(f"Kilograms: {df_route1['cumulative_fuel_kg'].iloc[-1]:.2f} kg\n")
-
-# Print cumulative fuel consumption for Route 2
-print("Cumulative Fuel Consumption at End of Route 2:")
-print(f"Liters: {df_route2['cumulative_fuel_L'].iloc[-1]:.2f} L")
-print(f"Kilograms: {df_route2['cumulative_fuel_kg'].iloc[-1]:.2f} kg\n")
-
-# Original plot for the entire interval
-plt.figure(figsize=(12, 6))
-plt.plot(merged_data.index, merged_data['cumulative_fuel_L'], label="Cumulative Fuel Consumption (L)", color="orange")
-plt.plot(merged_data.index, merged_data['cumulative_fuel_kg'], label="Cumulative Fuel Consumption (Kg)", color="blue")
-plt.xlabel("Time")
-plt.ylabel("Cumulative Fuel Consumption")
-plt.title("Total Cumulative Fuel Consumption Over Time (L and Kg)")
-plt.legend()
-plt.grid(True)
-plt.show()
-
-# Plot for Route 1 starting at 0
-plt.figure(figsize=(12, 6))
-plt.plot(df_route1.index, df_route1['cumulative_fuel_L'], label="Cumulative Fuel Consumption (L) - Route 1", color="orange")
-plt.plot(df_route1.index, df_route1['cumulative_fuel_kg'], label="Cumulative Fuel Consumption (Kg) - Route 1", color="blue")
-plt.xlabel("Time")
-plt.ylabel("Cumulative Fuel Consumption")
-plt.title("Cumulative Fuel Consumption Over Time - Route 1 (L and Kg)")
-plt.legend()
-plt.grid(True)
-plt.show()
-
-# Plot for Route 2 starting at 0
-plt.figure(figsize=(12, 6))
-plt.plot(df_route2.index, df_route2['cumulative_fuel_L'], label="Cumulative Fuel Consumption (L) - Route 2", color="orange")
-plt.plot(df_route2.index, df_route2['cumulative_fuel_kg'], label="Cumulative Fuel Consumption (Kg) - Route 2", color="blue")
-plt.xlabel("Time")
-plt.ylabel("Cumulative Fuel Consumption")
-plt.title("Cumulative Fuel Consumption Over Time - Route 2 (L and Kg)")
-plt.legend()
-plt.grid(True)
-plt.show()
+print(f"Liters: {ledger.total('fuel_L'):.2f} L")
+print(f"Kilograms: {ledger.total('fuel_kg'):.2f} kg\n")
+
+# Print cumulative fuel consumption for every route
+for name, totals in route_totals.items():
+    print(f"Cumulative Fuel Consumption at End of {name}:")
+    print(f"Liters: {totals['fuel_L']:.2f} L")
+    print(f"Kilograms: {totals['fuel_kg']:.2f} kg\n")
+
+# Plots of the cumulative fuel consumption for the entire interval and each route starting at 0 (shown, or saved to $PSM_FIGURE_DIR)
+def cumulative_fuel_figure(name, start, stop, suffix, title):
+    timestamps, cumulative_fuel_L = ledger.cumulative('fuel_L', start, stop)
+    cumulative_fuel_kg = ledger.cumulative('fuel_kg', start, stop)[1]
+    time = timestamps.astype('datetime64[ns]')
+    return figure_spec(name, [
+        line(time, cumulative_fuel_L, label=f"Cumulative Fuel Consumption (L){suffix}", color="orange"),
+        line(time, cumulative_fuel_kg, label=f"Cumulative Fuel Consumption (Kg){suffix}", color="blue"),
+    ], title=title, xlabel="Time", ylabel="Cumulative Fuel Consumption")
+
+show_or_save([cumulative_fuel_figure('Q2_iii_full_trip', None, None, "", "Total Cumulative Fuel Consumption Over Time (L and Kg)")] + [
+    cumulative_fuel_figure(f"Q2_iii_{name.lower().replace(' ', '')}", start, stop, f" - {name}",
+                           f"Cumulative Fuel Consumption Over Time - {name} (L and Kg)")
+    for name, start, stop in zip(*routes)
+])
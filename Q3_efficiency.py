@@ -1,7 +1,8 @@
 import pandas as pd
+from data_cache import load_data
+from powertrain import efficiency_chain
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+from figures import figure_spec, line, show_or_save
 
 
 ############################## Q1_iii #######################################
@@ -9,24 +10,9 @@ import matplotlib.dates as mdates
 #Constants for base power of motors
 BASE_POWER_PORT = 500  # kW for Port motor
 BASE_POWER_STARBOARD = 500  # kW for Starboard motor
-#Efficiency constants 
-eta_propulsion_motor = 0.97
-eta_switchboard = 0.99
-eta_VSD = 0.97
-eta_generator = 0.96
 
-genset_power = 450 #[kW]
-gensets_total_power = 900 #[kW]
-
-#Efficiency in typical combustion engine, x - Precentage of rated power
-def eta_engine(x): 
-    return -0.0024*x**2 + 0.402*x + 27.4382
-
-#Load the data
-df = pd.read_csv('data.csv', sep=';')
-
-#Convert timestamp column to datetime format with UTC timezone
-df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+#Load the data (parsed once, then read from the binary cache)
+df = load_data('data.csv')
 
 #Filter data to keep only LoadFeedback for Port and Starboard motors
 df_Port = df[df['var'] == 'gunnerus/RVG_mqtt/hcx_port_mp/LoadFeedback']
@@ -43,52 +29,11 @@ df_merged['Starboard_motor_power'] = df_merged['value_stbd'] / 100 * BASE_POWER_
 df_merged['total_propulsion_power'] = df_merged['Port_motor_power'] + df_merged['Starboard_motor_power']
 #print(df_merged[['Port_motor_power', 'Starboard_motor_power', 'total_propulsion_power']].head())
 
-#Create a new DataFrame for efficiencies: 
-
+#Power efficiency chain (propulsion motor, VSD, switchboard, generator, engine) computed in one vectorized pass
 df_efficiencies_power = df_merged[['timestamp', 'Port_motor_power', 'Starboard_motor_power', 'total_propulsion_power']].copy()
-
-#Step 1: Calculate Power out of VSD: 
-
-df_efficiencies_power['VSD_Port_Power'] = df_efficiencies_power['Port_motor_power'] / eta_propulsion_motor
-df_efficiencies_power['VSD_Stbd_Power'] = df_efficiencies_power['Starboard_motor_power'] /eta_propulsion_motor
-df_efficiencies_power['VSD_Total_Power'] = df_efficiencies_power['total_propulsion_power'] /eta_propulsion_motor
-#print(df_efficiencies_power[['VSD_Port_Power', 'VSD_Stbd_Power', 'VSD_Total_Power']].head())
-
-#Step 2: Calculate Power out of SwitchBoard: 
-df_efficiencies_power['SW_Port_Power'] = df_efficiencies_power['VSD_Port_Power'] / eta_VSD
-df_efficiencies_power['SW_Stbd_Power'] = df_efficiencies_power['VSD_Stbd_Power'] / eta_VSD
-df_efficiencies_power['SW_Total_Power'] = df_efficiencies_power['VSD_Total_Power'] / eta_VSD
-#print(df_efficiencies_power[['SW_Port_Power', 'SW_Stbd_Power', 'SW_Total_Power']].head())
-
-#Step 3: Calculate Power out of Generator: 
-df_efficiencies_power['Generator_Port_Power'] = df_efficiencies_power['SW_Port_Power'] / eta_switchboard
-df_efficiencies_power['Generator_Stbd_Power'] = df_efficiencies_power['SW_Stbd_Power'] / eta_switchboard
-df_efficiencies_power['Generator_Total_Power'] = df_efficiencies_power['SW_Total_Power'] /eta_switchboard
-#print(df_efficiencies_power[['Generator_Port_Power', 'Generator_Stbd_Power', 'Generator_Total_Power']].head())
-
-#Step 3: Calculate Power out of Engine: 
-df_efficiencies_power['Engine_Port_Power'] = df_efficiencies_power['Generator_Port_Power'] / eta_generator
-df_efficiencies_power['Engine_Stbd_Power'] = df_efficiencies_power['Generator_Stbd_Power'] / eta_generator
-df_efficiencies_power['Engine_Total_Power'] = df_efficiencies_power['Generator_Total_Power'] / eta_generator
-#print(df_efficiencies_power[['Engine_Port_Power', 'Engine_Stbd_Power', 'Engine_Total_Power']].head())
-
-#Step 4: Calculate the rate of Power as a percentage. 
-df_efficiencies_power['Engine_Port_Rated_Power'] = df_efficiencies_power['Engine_Port_Power'] / genset_power *100
-df_efficiencies_power['Engine_Stbd_Rated_Power'] = df_efficiencies_power['Engine_Stbd_Power'] / genset_power *100
-df_efficiencies_power['Engine_Total_Rated_Power'] = df_efficiencies_power['Engine_Total_Power'] / gensets_total_power *100
-#print(df_efficiencies_power[['Engine_Port_Rated_Power', 'Engine_Stbd_Rated_Power', 'Engine_Total_Rated_Power']].head())
-
-#Step 5: Calculate engine efficiency: 
-df_efficiencies_power['Engine_Port_Efficiency'] = df_efficiencies_power['Engine_Port_Rated_Power'].apply(eta_engine) /100
-df_efficiencies_power['Engine_Stbd_Efficiency'] = df_efficiencies_power['Engine_Stbd_Rated_Power'].apply(eta_engine) /100
-df_efficiencies_power['Engine_Total_Efficiency'] = df_efficiencies_power['Engine_Total_Rated_Power'].apply(eta_engine) /100
-#print(df_efficiencies_power[['Engine_Port_Efficiency', 'Engine_Stbd_Efficiency', 'Engine_Total_Efficiency']].head())
-
-
-#Step 6: Calculate Power efficiency 
-df_efficiencies_power['Power_Port_Efficiency'] = df_efficiencies_power['Engine_Port_Efficiency'] * eta_generator * eta_propulsion_motor * eta_switchboard * eta_VSD * 100
-df_efficiencies_power['Power_Stbd_Efficiency'] = df_efficiencies_power['Engine_Stbd_Efficiency'] * eta_generator * eta_propulsion_motor * eta_switchboard * eta_VSD * 100
-df_efficiencies_power['Power_Total_Efficiency'] = df_efficiencies_power['Engine_Total_Efficiency'] * eta_generator * eta_propulsion_motor * eta_switchboard * eta_VSD * 100
+chain = efficiency_chain(df_merged['Port_motor_power'], df_merged['Starboard_motor_power'], df_merged['total_propulsion_power'],
+                         columns=['Power_Total_Efficiency'])
+df_efficiencies_power['Power_Total_Efficiency'] = chain['Power_Total_Efficiency']
 
 # Define time intervals for Route 1 and Route 2
 route1_start = pd.to_datetime('2024-09-10 06:30:26').tz_localize('UTC')
@@ -107,15 +52,14 @@ df_route2 = df_efficiencies_power[(df_efficiencies_power['timestamp'] >= route2_
 BASE_POWER_PORT = 500  # kW for Port motor
 BASE_POWER_STARBOARD = 500  # kW for Starboard motor
 
+
 # Density assumed
 density = 0.82
 
 #energy content
 energy_fuel = 45.4 #[MJ/kg]
 
-# Load the data
-df = pd.read_csv('data.csv', sep=';')
-df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+# The data loaded for Q1_iii above is reused here instead of parsing data.csv a second time
 
 # Filter data for genset (engine load) and propulsion motor LoadFeedback data
 df_engine_1 = df[df['var'] == 'gunnerus/RVG_mqtt/Engine1/fuel_consumption']
@@ -183,72 +127,27 @@ df_final['efficiency'] = (df_final['total_propulsion_power'] / df_final['total_e
 #ENERGY EFFICIENCY GIVEN AS MEAN OF POWER EFFICIENCY PAGE 152 compendium
 mean = df_final['efficiency'].mean()
 
-# Combined Plot for Power Efficiency and Total Efficiency
-plt.figure(figsize=(12, 6))
-
-# Plot Power Efficiency from Genset to Propulsion Motors
-plt.plot(df_final['timestamp'], df_final['efficiency'], label='Power Efficiency Q2', color='purple')
-
-# Plot Total Efficiency
-plt.plot(df_efficiencies_power['timestamp'], df_efficiencies_power['Power_Total_Efficiency'], label='Power Efficiency Q1', color='blue')
-
-# Adding labels, title, and formatting
-plt.xlabel('Time')
-plt.ylabel('Efficiency (%)')
-plt.title('Power Efficiency Q2 and Power Efficiency Q1 Over Time')
-plt.legend(loc='upper right')
-plt.grid(True)
-plt.xticks(rotation=45)
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
-plt.tight_layout()
-
-# Show plot
-plt.show()
-
-# Plot efficiency over time
-plt.figure(figsize=(12, 6))
-plt.plot(df_final['timestamp'], df_final['efficiency'], label='Power Efficiency', color='purple')
-plt.xlabel('Time')
-plt.ylabel('Efficiency ηp [%]')
-plt.title('Power Efficiency from Genset to Propulsion Motors Over Time')
-plt.legend(loc='upper right')
-plt.grid(True)
-plt.xticks(rotation=45)
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
-plt.tight_layout()
-plt.show()
-
-#Step 7: Plot power efficiency
-plt.figure(figsize=(12, 6)) 
-plt.plot(df_efficiencies_power['timestamp'], df_efficiencies_power['Power_Total_Efficiency'], label='Total Efficiency')
-plt.title('Q1 Engine Power Efficiencies Over Time')
-plt.xlabel('Timestamp')
-plt.ylabel('Efficiency (%)')
-plt.legend()
-plt.grid(True)
-plt.show()
-
-
-# Route 1 plot
-plt.figure(figsize=(12, 6))
-#plt.plot(df_route1['timestamp'], df_route1['Power_Port_Efficiency'], label='Port Efficiency')
-#plt.plot(df_route1['timestamp'], df_route1['Power_Stbd_Efficiency'], label='Stbd Efficiency')
-plt.plot(df_route1['timestamp'], df_route1['Power_Total_Efficiency'], label='Total Efficiency')
-plt.title('Q1 Engine Power Efficiencies Over Time - Route 1')
-plt.xlabel('Timestamp')
-plt.ylabel('Efficiency (%)')
-plt.legend()
-plt.grid(True)
-plt.show()
-
-# Route 2 plot
-plt.figure(figsize=(12, 6))
-#plt.plot(df_route2['timestamp'], df_route2['Power_Port_Efficiency'], label='Port Efficiency')
-#plt.plot(df_route2['timestamp'], df_route2['Power_Stbd_Efficiency'], label='Stbd Efficiency')
-plt.plot(df_route2['timestamp'], df_route2['Power_Total_Efficiency'], label='Total Efficiency')
-plt.title(' Q1 Engine Power Efficiencies Over Time - Route 2')
-plt.xlabel('Timestamp')
-plt.ylabel('Efficiency (%)')
-plt.legend()
-plt.grid(True)
-plt.show()
\ No newline at end of file
+# Plots of both power efficiencies, the genset to propulsion efficiency and the Q1 efficiency chain for the full trip
+# and each route (shown, or saved to $PSM_FIGURE_DIR)
+def efficiency_chain_figure(name, df, title):
+    #Port and Stbd efficiency can be added with line(df['timestamp'], df['Power_Port_Efficiency'], label='Port Efficiency')
+    return figure_spec(name, [line(df['timestamp'], df['Power_Total_Efficiency'], label='Total Efficiency')],
+                       title=title, xlabel='Timestamp', ylabel='Efficiency (%)')
+
+show_or_save([
+    # Combined Plot for Power Efficiency and Total Efficiency
+    figure_spec('Q3_efficiency_q1_q2', [
+        line(df_final['timestamp'], df_final['efficiency'], label='Power Efficiency Q2', color='purple'),
+        line(df_efficiencies_power['timestamp'], df_efficiencies_power['Power_Total_Efficiency'], label='Power Efficiency Q1', color='blue'),
+    ], title='Power Efficiency Q2 and Power Efficiency Q1 Over Time', xlabel='Time', ylabel='Efficiency (%)',
+        legend='upper right', date_format='%Y-%m-%d %H:%M', xtick_rotation=45, tight_layout=True),
+    # Plot efficiency over time
+    figure_spec('Q3_efficiency_power_efficiency',
+                [line(df_final['timestamp'], df_final['efficiency'], label='Power Efficiency', color='purple')],
+                title='Power Efficiency from Genset to Propulsion Motors Over Time', xlabel='Time', ylabel='Efficiency ηp [%]',
+                legend='upper right', date_format='%Y-%m-%d %H:%M', xtick_rotation=45, tight_layout=True),
+    #Step 7: Plot power efficiency
+    efficiency_chain_figure('Q3_efficiency_chain_full_trip', df_efficiencies_power, 'Q1 Engine Power Efficiencies Over Time'),
+    efficiency_chain_figure('Q3_efficiency_chain_route1', df_route1, 'Q1 Engine Power Efficiencies Over Time - Route 1'),
+    efficiency_chain_figure('Q3_efficiency_chain_route2', df_route2, ' Q1 Engine Power Efficiencies Over Time - Route 2'),
+])
@@ -1,31 +1,18 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import numpy as np
+from data_cache import load_data
+from powertrain import efficiency_chain
+from route_ledger import load_routes, measured_fuel_ledger, RouteLedger
+from signal_store import open_signals
+from figures import figure_spec, line, show_or_save
 
 #Constants for base power of motors
 BASE_POWER_PORT = 500  # kW for Port motor
 BASE_POWER_STARBOARD = 500  # kW for Starboard motor
-#Efficiency constants 
-eta_propulsion_motor = 0.97
-eta_switchboard = 0.99
-eta_VSD = 0.97
-eta_generator = 0.96
-
-genset_power = 450 #[kW]
-gensets_total_power = 900 #[kW]
 
 gross_spesific_energy = 45.4 *(1/3.6) #[kWh/kg]
 
-#Efficiency in typical combustion engine, x - Precentage of rated power
-def eta_engine(x): 
-    return -0.0024*x**2 + 0.402*x + 27.4382
-
-#Load the data
-df = pd.read_csv('data.csv', sep=';')
-
-#Convert timestamp column to datetime format with UTC timezone
-df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+#Load the data (parsed once, then read from the binary cache)
+df = load_data('data.csv')
 
 #Filter data to keep only LoadFeedback for Port and Starboard motors
 df_Port = df[df['var'] == 'gunnerus/RVG_mqtt/hcx_port_mp/LoadFeedback']
@@ -42,62 +29,11 @@ df_merged['Starboard_motor_power'] = df_merged['value_stbd'] / 100 * BASE_POWER_
 df_merged['total_propulsion_power'] = df_merged['Port_motor_power'] + df_merged['Starboard_motor_power']
 #print(df_merged[['Port_motor_power', 'Starboard_motor_power', 'total_propulsion_power']].head())
 
-#Create a new DataFrame for efficiencies: 
-
+#Power efficiency chain (propulsion motor, VSD, switchboard, generator, engine) computed in one vectorized pass
 df_efficiencies_power = df_merged[['timestamp', 'Port_motor_power', 'Starboard_motor_power', 'total_propulsion_power']].copy()
-
-#Step 1: Calculate Power out of VSD: 
-
-df_efficiencies_power['VSD_Port_Power'] = df_efficiencies_power['Port_motor_power'] / eta_propulsion_motor
-df_efficiencies_power['VSD_Stbd_Power'] = df_efficiencies_power['Starboard_motor_power'] /eta_propulsion_motor
-df_efficiencies_power['VSD_Total_Power'] = df_efficiencies_power['total_propulsion_power'] /eta_propulsion_motor
-#print(df_efficiencies_power[['VSD_Port_Power', 'VSD_Stbd_Power', 'VSD_Total_Power']].head())
-
-#Step 2: Calculate Power out of SwitchBoard: 
-df_efficiencies_power['SW_Port_Power'] = df_efficiencies_power['VSD_Port_Power'] / eta_VSD
-df_efficiencies_power['SW_Stbd_Power'] = df_efficiencies_power['VSD_Stbd_Power'] / eta_VSD
-df_efficiencies_power['SW_Total_Power'] = df_efficiencies_power['VSD_Total_Power'] / eta_VSD
-#print(df_efficiencies_power[['SW_Port_Power', 'SW_Stbd_Power', 'SW_Total_Power']].head())
-
-#Step 3: Calculate Power out of Generator: 
-df_efficiencies_power['Generator_Port_Power'] = df_efficiencies_power['SW_Port_Power'] / eta_switchboard
-df_efficiencies_power['Generator_Stbd_Power'] = df_efficiencies_power['SW_Stbd_Power'] / eta_switchboard
-df_efficiencies_power['Generator_Total_Power'] = df_efficiencies_power['SW_Total_Power'] /eta_switchboard
-#print(df_efficiencies_power[['Generator_Port_Power', 'Generator_Stbd_Power', 'Generator_Total_Power']].head())
-
-#Step 3: Calculate Power out of Engine: 
-df_efficiencies_power['Engine_Port_Power'] = df_efficiencies_power['Generator_Port_Power'] / eta_generator
-df_efficiencies_power['Engine_Stbd_Power'] = df_efficiencies_power['Generator_Stbd_Power'] / eta_generator
-df_efficiencies_power['Engine_Total_Power'] = df_efficiencies_power['Generator_Total_Power'] / eta_generator
-#print(df_efficiencies_power[['Engine_Port_Power', 'Engine_Stbd_Power', 'Engine_Total_Power']].head())
-
-#Step 4: Calculate the rate of Power as a percentage. 
-df_efficiencies_power['Engine_Port_Rated_Power'] = df_efficiencies_power['Engine_Port_Power'] / genset_power *100
-df_efficiencies_power['Engine_Stbd_Rated_Power'] = df_efficiencies_power['Engine_Stbd_Power'] / genset_power *100
-df_efficiencies_power['Engine_Total_Rated_Power'] = df_efficiencies_power['Engine_Total_Power'] / gensets_total_power *100
-#print(df_efficiencies_power[['Engine_Port_Rated_Power', 'Engine_Stbd_Rated_Power', 'Engine_Total_Rated_Power']].head())
-
-#Step 5: Calculate engine efficiency: 
-df_efficiencies_power['Engine_Port_Efficiency'] = df_efficiencies_power['Engine_Port_Rated_Power'].apply(eta_engine) /100
-df_efficiencies_power['Engine_Stbd_Efficiency'] = df_efficiencies_power['Engine_Stbd_Rated_Power'].apply(eta_engine) /100
-df_efficiencies_power['Engine_Total_Efficiency'] = df_efficiencies_power['Engine_Total_Rated_Power'].apply(eta_engine) /100
-#print(df_efficiencies_power[['Engine_Port_Efficiency', 'Engine_Stbd_Efficiency', 'Engine_Total_Efficiency']].head())
-
-
-#Step 6: Calculate Power efficiency 
-df_efficiencies_power['Power_Port_Efficiency'] = df_efficiencies_power['Engine_Port_Efficiency'] * eta_generator * eta_propulsion_motor * eta_switchboard * eta_VSD * 100
-df_efficiencies_power['Power_Stbd_Efficiency'] = df_efficiencies_power['Engine_Stbd_Efficiency'] * eta_generator * eta_propulsion_motor * eta_switchboard * eta_VSD * 100
-df_efficiencies_power['Power_Total_Efficiency'] = df_efficiencies_power['Engine_Total_Efficiency'] * eta_generator * eta_propulsion_motor * eta_switchboard * eta_VSD * 100
-
-# Define time intervals for Route 1 and Route 2
-route1_start = pd.to_datetime('2024-09-10 06:30:26').tz_localize('UTC')
-route1_stop = pd.to_datetime('2024-09-10 06:45:30').tz_localize('UTC')
-route2_start = pd.to_datetime('2024-09-10 06:45:30').tz_localize('UTC')
-route2_stop = pd.to_datetime('2024-09-10 07:07:00').tz_localize('UTC')
-
-# Filter data for each route
-df_route1 = df_efficiencies_power[(df_efficiencies_power['timestamp'] >= route1_start) & (df_efficiencies_power['timestamp'] <= route1_stop)]
-df_route2 = df_efficiencies_power[(df_efficiencies_power['timestamp'] >= route2_start) & (df_efficiencies_power['timestamp'] <= route2_stop)]
+chain = efficiency_chain(df_merged['Port_motor_power'], df_merged['Starboard_motor_power'], df_merged['total_propulsion_power'],
+                         columns=['Power_Total_Efficiency'])
+df_efficiencies_power['Power_Total_Efficiency'] = chain['Power_Total_Efficiency']
 
 df_fuel_consumption = df_efficiencies_power[['timestamp', 'Power_Total_Efficiency', 'total_propulsion_power']].copy()
 
@@ -114,124 +50,50 @@ df_fuel_consumption['Delta_t'] = df_fuel_consumption['timestamp'].diff().dt.tota
 # Fuel_flow_rate is in units of fuel per second if it represents an instantaneous rate
 df_fuel_consumption['Fuel_Consumed'] = df_fuel_consumption['Fuel_flow_rate_per_sec'] * df_fuel_consumption['Delta_t']
 
-# Calculate cumulative fuel consumption
-df_fuel_consumption['Cumulative_Fuel_Consumption'] = df_fuel_consumption['Fuel_Consumed'].cumsum()
-
-# Filter data for each route
-df_route1 = df_fuel_consumption[(df_fuel_consumption['timestamp'] >= route1_start) & (df_fuel_consumption['timestamp'] <= route1_stop)].copy()
-df_route2 = df_fuel_consumption[(df_fuel_consumption['timestamp'] >= route2_start) & (df_fuel_consumption['timestamp'] <= route2_stop)].copy()
-
-# Calculate cumulative fuel consumption for Route 1 and Route 2 separately
-df_route1['Cumulative_Fuel_Consumption'] = df_route1['Fuel_Consumed'].cumsum()
-df_route2['Cumulative_Fuel_Consumption'] = df_route2['Fuel_Consumed'].cumsum()
-
-# Display the first few rows to verify
-##print(df_fuel_consumption[['Fuel_flow_rate_per_sec', 'Delta_t', 'Fuel_Consumed', 'Cumulative_Fuel_Consumption']].head())
-##print(df_fuel_consumption[['Fuel_flow_rate_per_sec', 'Delta_t', 'Fuel_Consumed', 'Cumulative_Fuel_Consumption']].tail())
-
-# Load data from the CSV file
-data = pd.read_csv("data.csv", sep=';')
-
-# Convert timestamp to a datetime format and sort by time for consistency
-data['timestamp'] = pd.to_datetime(data['timestamp'])
-data.sort_values(by='timestamp', inplace=True)
-
-# Filter relevant rows: engine load and fuel consumption for each engine
-engine_load_data = data[data['var'].str.contains("engine_load")]
-fuel_data = data[data['var'].str.contains("fuel_consumption")]
-
-# Pivot data so each engine's load and fuel consumption are in separate columns
-engine_load_data = engine_load_data.pivot(index='timestamp', columns='var', values='value')
-fuel_data = fuel_data.pivot(index='timestamp', columns='var', values='value')
-
-# Merge engine load and fuel data into a single DataFrame
-sync_data = engine_load_data.join(fuel_data, how='outer').sort_index().fillna(method='ffill')
-
-# Calculate total fuel consumption at each time step by summing fuel consumption across engines
-sync_data['total_fuel_consumption'] = sync_data.filter(like='fuel_consumption').sum(axis=1)
-
-# Calculate time difference in hours between each reading
-time_diff_hours = sync_data.index.to_series().diff().dt.total_seconds().fillna(0) / 3600
-
-# Calculate fuel consumed at each step in liters and kilograms
-sync_data['fuel_consumed_step_L'] = sync_data['total_fuel_consumption'] * time_diff_hours
-sync_data['fuel_consumed_step_kg'] = sync_data['fuel_consumed_step_L'] * 0.82  # Convert to kg
-
-# Calculate cumulative fuel consumption in liters and kg over time
-sync_data['cumulative_fuel_L'] = sync_data['fuel_consumed_step_L'].cumsum()
-sync_data['cumulative_fuel_kg'] = sync_data['fuel_consumed_step_kg'].cumsum()
+# Cumulative fuel consumption, summed once (a step without efficiency adds nothing, as cumsum() skips NaN)
+theoretical = RouteLedger(pd.DatetimeIndex(df_fuel_consumption['timestamp']).as_unit('ns').asi8,
+                          {'fuel_kg': df_fuel_consumption['Fuel_Consumed'].fillna(0).to_numpy()})
 
-# Filter data for each route
-df_measured_route1 = sync_data[(sync_data.index >= route1_start) & (sync_data.index <= route1_stop)].copy()
-df_measured_route2 = sync_data[(sync_data.index >= route2_start) & (sync_data.index <= route2_stop)].copy()
+# Measured fuel consumed at each step (union of engine load and fuel consumption timestamps, fuel flow forward filled
+# per engine, flow * time since the previous reading), summed once into cumulative liters and kilograms
+measured = measured_fuel_ledger(open_signals('data.csv'))
 
-# Reset cumulative fuel consumption to start from 0 for Route 1 and Route 2
-df_measured_route1['cumulative_fuel_L'] -= df_measured_route1['cumulative_fuel_L'].iloc[0]
-df_measured_route1['cumulative_fuel_kg'] -= df_measured_route1['cumulative_fuel_kg'].iloc[0]
-df_measured_route2['cumulative_fuel_L'] -= df_measured_route2['cumulative_fuel_L'].iloc[0]
-df_measured_route2['cumulative_fuel_kg'] -= df_measured_route2['cumulative_fuel_kg'].iloc[0]
+# Routes from routes.csv (route;start;stop); the fuel of a route is the difference of the cumulative sums
+# at its first and last reading, found by binary search (the theoretical route fuel is the sum of the route's
+# steps, so it also counts the step into its first reading)
+routes = load_routes('routes.csv')
+measured_routes = measured.route_totals(routes)
+theoretical_routes = theoretical.route_totals(routes, first_step=True)
 
 # Print cumulative fuel consumption for the entire dataset
 print("Cumulative Fuel Consumption at End of Interval (Entire Dataset):")
-print(f"Liters: {sync_data['cumulative_fuel_L'].iloc[-1]:.2f} L")
-print(f"Kilograms: {sync_data['cumulative_fuel_kg'].iloc[-1]:.2f} kg\n")
-
-# Print cumulative fuel consumption for Route 1
-print("Cumulative Fuel Consumption at End of Route 1:")
-print(f"Liters: {df_measured_route1['cumulative_fuel_L'].iloc[-1]:.2f} L")
-print(f"Kilograms: {df_measured_route1['cumulative_fuel_kg'].iloc[-1]:.2f} kg\n")
-
-# Print cumulative fuel consumption for Route 2
-print("Cumulative Fuel Consumption at End of Route 2:")
-print(f"Liters: {df_measured_route2['cumulative_fuel_L'].iloc[-1]:.2f} L")
-print(f"Kilograms: {df_measured_route2['cumulative_fuel_kg'].iloc[-1]:.2f} kg\n")
-
-
-print(f"Fuel consumption entire voyage: {df_fuel_consumption['Cumulative_Fuel_Consumption'].iloc[-1]:.2f} [kg]\n")
-print(f"Fuel consumption route 1: {df_route1['Cumulative_Fuel_Consumption'].iloc[-1]:.2f} [kg]\n")
-print(f"Fuel consumption route 2: {df_route2['Cumulative_Fuel_Consumption'].iloc[-1]:.2f} [kg]\n")
-
-# Plot for Total Cumulative Fuel Consumption in Kg
-plt.figure(figsize=(12, 6))
-plt.plot(df_fuel_consumption['timestamp'], df_fuel_consumption['Cumulative_Fuel_Consumption'], label="Cumulative Fuel Consumption (Kg) - Theoretical", color="blue")
-plt.plot(sync_data.index, sync_data['cumulative_fuel_kg'], label='Cumulative Fuel Consumption (Kg) - Measured', color='red')
-plt.xlabel("Time")
-plt.ylabel("Cumulative Fuel Consumption (Kg)")
-plt.title("Total Cumulative Fuel Consumption Over Time (Kg)")
-plt.legend()
-plt.grid(True)
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-plt.gca().xaxis.set_major_locator(mdates.AutoDateLocator())
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.show()
-
-# Plot for Route 1 Cumulative Fuel Consumption in Kg
-plt.figure(figsize=(12, 6))
-plt.plot(df_route1['timestamp'], df_route1['Cumulative_Fuel_Consumption'], label="Cumulative Fuel Consumption (Kg) - Theoretical", color="blue")
-plt.plot(df_measured_route1.index, df_measured_route1['cumulative_fuel_kg'], label='Cumulative Fuel Consumption (Kg) - Measured', color='red')
-plt.xlabel("Time")
-plt.ylabel("Cumulative Fuel Consumption (Kg)")
-plt.title("Cumulative Fuel Consumption Over Time - Route 1 (Kg)")
-plt.legend()
-plt.grid(True)
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-plt.gca().xaxis.set_major_locator(mdates.AutoDateLocator())
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.show()
-
-# Plot for Route 2 Cumulative Fuel Consumption in Kg
-plt.figure(figsize=(12, 6))
-plt.plot(df_route2['timestamp'], df_route2['Cumulative_Fuel_Consumption'], label="Cumulative Fuel Consumption (Kg) - Theoretical", color="blue")
-plt.plot(df_measured_route2.index, df_measured_route2['cumulative_fuel_kg'], label='Cumulative Fuel Consumption (Kg) - Measured', color='red')
-plt.xlabel("Time")
-plt.ylabel("Cumulative Fuel Consumption (Kg)")
-plt.title("Cumulative Fuel Consumption Over Time - Route 2 (Kg)")
-plt.legend()
-plt.grid(True)
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-plt.gca().xaxis.set_major_locator(mdates.AutoDateLocator())
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+print(f"Liters: {measured.total('fuel_L'):.2f} L")
+print(f"Kilograms: {measured.total('fuel_kg'):.2f} kg\n")
+
+# Print cumulative fuel consumption for every route
+for name, totals in measured_routes.items():
+    print(f"Cumulative Fuel Consumption at End of {name}:")
+    print(f"Liters: {totals['fuel_L']:.2f} L")
+    print(f"Kilograms: {totals['fuel_kg']:.2f} kg\n")
+
+
+print(f"Fuel consumption entire voyage: {theoretical.total('fuel_kg'):.2f} [kg]\n")
+for name, totals in theoretical_routes.items():
+    print(f"Fuel consumption {name.lower()}: {totals['fuel_kg']:.2f} [kg]\n")
+
+# Plots of the theoretical and measured cumulative fuel consumption in Kg for the entire voyage and each route,
+# the measured one starting at 0 for every route (shown, or saved to $PSM_FIGURE_DIR)
+def cumulative_fuel_figure(name, start, stop, title):
+    timestamps, cumulative_fuel = theoretical.cumulative('fuel_kg', start, stop, first_step=True)
+    measured_timestamps, measured_fuel = measured.cumulative('fuel_kg', start, stop)
+    return figure_spec(name, [
+        line(timestamps.astype('datetime64[ns]'), cumulative_fuel, label="Cumulative Fuel Consumption (Kg) - Theoretical", color="blue"),
+        line(measured_timestamps.astype('datetime64[ns]'), measured_fuel, label='Cumulative Fuel Consumption (Kg) - Measured', color='red'),
+    ], title=title, xlabel="Time", ylabel="Cumulative Fuel Consumption (Kg)",
+        date_format='%H:%M:%S', auto_date_locator=True, xtick_rotation=45, tight_layout=True)
+
+show_or_save([cumulative_fuel_figure('Q3_fuel_consumption_full_trip', None, None, "Total Cumulative Fuel Consumption Over Time (Kg)")] + [
+    cumulative_fuel_figure(f"Q3_fuel_consumption_{name.lower().replace(' ', '')}", start, stop,
+                           f"Cumulative Fuel Consumption Over Time - {name} (Kg)")
+    for name, start, stop in zip(*routes)
+])
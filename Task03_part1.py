@@ -1,26 +1,23 @@
 import pandas as pd
-import matplotlib.pyplot as plt
+from alignment import align_topics
+from signal_store import load_signals, ENGINE1_FUEL, ENGINE3_FUEL, ENGINE1_LOAD, ENGINE3_LOAD, ENGINE1_SPEED
+from figures import figure_spec, line, show_or_save
 import numpy as np
-from scipy.stats import zscore
-
-# Load the data
-df = pd.read_csv('data.csv', sep=';')
-
-# Convert timestamp column to datetime format with UTC timezone
-df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
-
-# Filter data for fuel consumption specific engines and motor load feedback
-df_fuel_consumption_1 = df[df['var'] == 'gunnerus/RVG_mqtt/Engine1/fuel_consumption'][['timestamp', 'value']].rename(columns={'value': 'fuel_consumption_1'})
-df_fuel_consumption_3 = df[df['var'] == 'gunnerus/RVG_mqtt/Engine3/fuel_consumption'][['timestamp', 'value']].rename(columns={'value': 'fuel_consumption_3'})
-df_engine_1 = df[df['var'] == 'gunnerus/RVG_mqtt/Engine1/engine_load'][['timestamp', 'value']].rename(columns={'value': 'engine_1'})
-df_engine_2 = df[df['var'] == 'gunnerus/RVG_mqtt/Engine3/engine_load'][['timestamp', 'value']].rename(columns={'value': 'engine_2'})
-df_rpm_1 = df[df['var'] == 'gunnerus/RVG_mqtt/Engine1/engine_speed'][['timestamp', 'value']].rename(columns={'value': 'rpm_1'})
-
-# Merge fuel consumption and motor data by timestamp
-df_merged = pd.merge(df_fuel_consumption_1, df_fuel_consumption_3, on='timestamp', how='inner')
-df_merged = pd.merge(df_merged, df_rpm_1, on='timestamp', how='inner')
-df_merged = pd.merge(df_merged, df_engine_1, on='timestamp', how='inner')
-df_merged = pd.merge(df_merged, df_engine_2, on='timestamp', how='inner')
+from thermal_efficiency import thermal_efficiency, filter_efficiency
+
+# Load the data, grouped by topic once (parsed once, then read from the binary cache)
+signals = load_signals('data.csv')
+
+# Line up fuel consumption, rpm and engine load on the Engine 1 fuel consumption timestamps in one pass.
+# Readings up to align_tolerance apart are treated as simultaneous instead of being dropped by an exact merge
+align_tolerance = '500ms'
+df_merged = align_topics(signals, {
+    'fuel_consumption_1': ENGINE1_FUEL,
+    'fuel_consumption_3': ENGINE3_FUEL,
+    'rpm_1': ENGINE1_SPEED,
+    'engine_1': ENGINE1_LOAD,
+    'engine_2': ENGINE3_LOAD,
+}, tolerance=align_tolerance)
 print(df_merged)
 
 # Convert fuel consumption from [l/h] to [kg/h] using density
@@ -34,49 +31,31 @@ print(df_merged)
 threshold = 10  # Adjust as necessary for precision, This is prpolsuion power in [kW]
 
 # Calculate Specific Fuel Consumption (SFC) and handle near-zero propulsion power cases sfc[kg/MJ] = Qf[kg/h]/(Pdg[kW]*3.6)
-#Where the total propulsion power is under "treshold" [kW] total, the values are set to zero as the values goes towards infinity in these points where the engines aren't delivering power
-specific_energy = 45.4 #[Mj/kg]
+#Where the total propulsion power is under "treshold" [kW] total, the values are set to NaN as the values goes towards infinity in these points where the engines aren't delivering power
+df_merged['eta_1'] = thermal_efficiency(df_merged['engine_1'], df_merged['fuel_consumption_1_kg_per_h'], threshold)
 
-df_merged['eta_1'] = np.where(
-    (df_merged['engine_1'] < threshold),
-    None,
-    (100*((3.6*df_merged['engine_1']) / (df_merged['fuel_consumption_1_kg_per_h']*specific_energy)))
-)
+# Smooth the thermal efficiency using a rolling mean with a window of 5 and remove outliers based on z-score filtering
+eta_1 = filter_efficiency(df_merged['eta_1'], window=5, z_limit=3)
+df_merged['eta_1_smoothed'] = eta_1['smoothed']
+df_merged['eta_1_zscore'] = eta_1['zscore']
+df_merged['eta_1_filtered'] = eta_1['filtered']
 
-# Smooth the thermal efficiency using a rolling mean with a window of 10
-df_merged['eta_1_smoothed'] = df_merged['eta_1'].rolling(window=5, min_periods=1).mean()
 
-# Remove outliers based on z-score filtering
-df_merged['eta_1_zscore'] = zscore(df_merged['eta_1_smoothed'].fillna(0))
-df_merged['eta_1_filtered'] = np.where(df_merged['eta_1_zscore'].abs() > 3, None, df_merged['eta_1_smoothed'])
+#Eta values after filtering for outliers
+print(f'Minimum filtered value for thermal efficiency of engine 1 is {eta_1["min"]}')
+print(f'Maximum filtered value for thermal efficiency of engine 1 is {eta_1["max"]}')
 
+eta_max = eta_1['max']
+eta_min = eta_1['min']
 
-#Eta values after filtering for outliers
-print(f'Minimum filtered value for thermal efficiency of engine 1 is {df_merged["eta_1_filtered"].min()}')
-print(f'Maximum filtered value for thermal efficiency of engine 1 is {df_merged["eta_1_filtered"].max()}')
-
-eta_max = df_merged["eta_1_filtered"].max()
-eta_min = df_merged["eta_1_filtered"].min()
-
-df_merged['eta_2'] = np.where(
-    (df_merged['engine_2'] < 0),
-    None,
-    (100*((3.6*df_merged['engine_2']) / (df_merged['fuel_consumption_3_kg_per_h']*specific_energy)))
-)
-
-# Plotting SFC over real timestamps
-plt.figure(figsize=(12, 6))
-plt.plot(df_merged['timestamp'], df_merged['eta_1'], label='Eta[th] engine 1',color ='red')
-plt.plot(df_merged['timestamp'], df_merged['eta_2'], label='Eta[th] engine 2', color = 'green')
-plt.plot(df_merged['timestamp'], df_merged['eta_1_filtered'], label='Smoothed & Filtered Eta[th] engine 1', color='blue')
-plt.xlabel('Time')
-plt.ylabel('Eta efficiency')
-plt.title('Thermal Efficiency Over Time')
-plt.legend()
-plt.grid(True)
-plt.xticks(rotation=45)  # Rotate timestamps for better readability
-plt.tight_layout()
-plt.show()
+df_merged['eta_2'] = thermal_efficiency(df_merged['engine_2'], df_merged['fuel_consumption_3_kg_per_h'], threshold=0)
+
+# Plotting SFC over real timestamps (shown, or saved to $PSM_FIGURE_DIR)
+show_or_save([figure_spec('Task03_part1_thermal_efficiency', [
+    line(df_merged['timestamp'], df_merged['eta_1'], label='Eta[th] engine 1', color='red'),
+    line(df_merged['timestamp'], df_merged['eta_2'], label='Eta[th] engine 2', color='green'),
+    line(df_merged['timestamp'], df_merged['eta_1_filtered'], label='Smoothed & Filtered Eta[th] engine 1', color='blue'),
+], title='Thermal Efficiency Over Time', xlabel='Time', ylabel='Eta efficiency', xtick_rotation=45, tight_layout=True)])
 
 ##############################################################################################################
 ##############################################################################################################
@@ -84,8 +63,8 @@ plt.show()
 
 #Calculating Torque
 # Find the index positions for max and min values of eta_1_filtered
-max_index = df_merged["eta_1_filtered"].idxmax()
-min_index = df_merged["eta_1_filtered"].idxmin()
+max_index = eta_1['argmax']
+min_index = eta_1['argmin']
 
 #Trying out for eta
 max_index = df_merged["eta_1"].idxmax()
@@ -118,16 +97,8 @@ df_merged['torque'] = (df_merged['engine_1'] * 60) / (2 * np.pi * df_merged['rpm
 # Convert torque to Nm (multiplied by 1000 to get torque in Nm if engine_load is in kW and rpm in RPM)
 df_merged['torque'] = df_merged['torque'] * 1000
 
-plt.figure(figsize=(12, 6))
-plt.plot(df_merged['timestamp'], df_merged['torque'], label='Torque (Nm)', color='purple')
-plt.xlabel('Time')
-plt.ylabel('Torque (Nm)')
-plt.title('Torque Over Time for Engine 1')
-plt.legend()
-plt.grid(True)
-plt.xticks(rotation=45)  # Rotate timestamps for better readability
-plt.tight_layout()
-plt.show()
+show_or_save([figure_spec('Task03_part1_torque', [line(df_merged['timestamp'], df_merged['torque'], label='Torque (Nm)', color='purple')],
+                          title='Torque Over Time for Engine 1', xlabel='Time', ylabel='Torque (Nm)', xtick_rotation=45, tight_layout=True)])
 
 #BMEP
 #####################################################################################################
@@ -1,15 +1,13 @@
 import pandas as pd
-import matplotlib.pyplot as plt
+from data_cache import load_data
+from figures import figure_spec, line, show_or_save
 
 # Define constants
 density = 0.82  # Fuel density in kg/L
 emission_factor = 3.15  # Emission factor in kg CO₂ per kg of fuel
 
-# Load the data
-df = pd.read_csv('data.csv', sep=';')
-
-# Convert timestamp column to datetime format with UTC timezone
-df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+# Load the data (parsed once, then read from the binary cache)
+df = load_data('data.csv')
 
 # Filter data for specific engines
 df_engine_1 = df[df['var'] == 'gunnerus/RVG_mqtt/Engine1/fuel_consumption']
@@ -66,16 +64,7 @@ combined_fuel_flow_df['cumulative_CO2_emitted'] = combined_fuel_flow_df['CO2_emi
 total_CO2_emitted = combined_fuel_flow_df['cumulative_CO2_emitted'].iloc[-1]
 print(f'Total CO2 emissions in kg: {total_CO2_emitted:.2f} kg')
 
-# Plot the cumulative CO2 emissions over time
-plt.figure(figsize=(12, 6))
-plt.plot(combined_fuel_flow_df['timestamp'], combined_fuel_flow_df['cumulative_CO2_emitted'], label='Cumulative CO2 Emissions', color='green')
-
-# Add labels and legend for the cumulative CO2 emissions plot
-plt.title('Cumulative CO2 Emissions Over Time')
-plt.xlabel('Timestamp')
-plt.ylabel('Cumulative CO2 Emissions (kg)')
-plt.legend()
-plt.grid(True)
-
-# Display the plot
-plt.show()
+# Plot the cumulative CO2 emissions over time (shown, or saved to $PSM_FIGURE_DIR)
+show_or_save([figure_spec('Task03_part2_measurement', [
+    line(combined_fuel_flow_df['timestamp'], combined_fuel_flow_df['cumulative_CO2_emitted'], label='Cumulative CO2 Emissions', color='green'),
+], title='Cumulative CO2 Emissions Over Time', xlabel='Timestamp', ylabel='Cumulative CO2 Emissions (kg)')])
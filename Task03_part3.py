@@ -5,7 +5,6 @@
 #1 engine half speed, ca. 50 days 
 
 import numpy as np 
-import matplotlib.pyplot as plt 
 
 #Tank capasity: 
 tank_original_liters = 50000 #[L]
@@ -0,0 +1,134 @@
+#Multi-way as-of alignment of telemetry topics
+#
+#Lines up N time sorted streams on the timestamps of the first one. For every
+#reference time the matching sample of each other stream is the nearest one
+#(or the last one before / first one after) within a tolerance, so readings a
+#few ms apart are not dropped like in an exact pd.merge on 'timestamp'.
+#
+#Each stream is matched with a single merge of two sorted runs (a stable sort of
+#two sorted arrays is a linear merge), so the cost is linear in the total number
+#of samples and nothing is re-sorted or copied per pairwise join.
+
+import numpy as np
+
+from signal_store import to_ns
+from tracing import traced
+
+DIRECTIONS = ('backward', 'forward', 'nearest')
+
+
+#Number of elements of sorted a that are <= (side='right') or < (side='left') each element of sorted b
+def _merge_rank(a, b, side):
+    if side == 'right':
+        merged = np.concatenate([a, b])
+        is_b = np.arange(len(merged)) >= len(a)
+    else:
+        merged = np.concatenate([b, a])
+        is_b = np.arange(len(merged)) < len(b)
+    order = np.argsort(merged, kind='stable')
+    position = np.flatnonzero(is_b[order])
+    return position - np.arange(len(b))
+
+
+def _to_ns(tolerance):
+    if tolerance is None:
+        return None
+    if isinstance(tolerance, (int, np.integer)):
+        return int(tolerance)
+    import pandas as pd
+
+    return pd.Timedelta(tolerance).value
+
+
+#Index into timestamps of the sample matched to each reference time, -1 where there is no match
+def _match(timestamps, reference, tolerance, direction):
+    n = len(timestamps)
+    if n == 0:
+        return np.full(len(reference), -1)
+    before = _merge_rank(timestamps, reference, 'right') - 1  #last sample <= reference
+    after = _merge_rank(timestamps, reference, 'left')  #first sample >= reference
+
+    if direction == 'backward':
+        index = before
+    elif direction == 'forward':
+        index = np.where(after < n, after, -1)
+    else:
+        after_ok = after < n
+        gap_before = np.where(before >= 0, reference - timestamps[np.maximum(before, 0)], np.iinfo(np.int64).max)
+        gap_after = np.where(after_ok, timestamps[np.minimum(after, n - 1)] - reference, np.iinfo(np.int64).max)
+        index = np.where(gap_after < gap_before, np.where(after_ok, after, -1), before)
+
+    if tolerance is not None:
+        found = index >= 0
+        gap = np.abs(timestamps[np.maximum(index, 0)] - reference)
+        index = np.where(found & (gap <= tolerance), index, -1)
+    return index
+
+
+#Align streams [(timestamps_ns, values), ...] on the timestamps of the first stream.
+#Returns (timestamps, matrix) with one column per stream. With how='inner' rows where any
+#stream has no sample within the tolerance are dropped, with how='left' they are NaN.
+@traced('align', rows_in=lambda args: sum(len(stream[0]) for stream in args[0]), rows_out=lambda result: len(result[0]))
+def asof_align(streams, tolerance=None, direction='nearest', how='inner'):
+    if direction not in DIRECTIONS:
+        raise ValueError(f'direction must be one of {DIRECTIONS}, got {direction!r}')
+    if how not in ('inner', 'left'):
+        raise ValueError(f"how must be 'inner' or 'left', got {how!r}")
+    tolerance = _to_ns(tolerance)
+
+    reference = np.asarray(streams[0][0], dtype=np.int64)
+    matrix = np.empty((len(reference), len(streams)), dtype=np.float64)
+    matrix[:, 0] = streams[0][1]
+    matched = np.ones(len(reference), dtype=bool)
+    for column, (timestamps, values) in enumerate(streams[1:], start=1):
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        index = _match(timestamps, reference, tolerance, direction)
+        found = index >= 0
+        matrix[:, column] = np.nan
+        matrix[found, column] = values[index[found]]
+        matched &= found
+
+    if how == 'inner':
+        return reference[matched], matrix[matched]
+    return reference, matrix
+
+
+def _wide_frame(names, timestamps, matrix):
+    import pandas as pd
+
+    df = pd.DataFrame(matrix, columns=names)
+    df.insert(0, 'timestamp', pd.to_datetime(timestamps, unit='ns', utc=True))
+    return df
+
+
+#Align topics of a SignalStore, {column name: topic}, into one wide DataFrame with a 'timestamp' column.
+#start/stop keep the readings of the first topic in that window (binary search, SignalStore.window); the
+#other topics are searched from tolerance before start to tolerance after stop, so a reading just outside
+#the window is matched as it is without one.
+def align_topics(store, columns, tolerance=None, direction='nearest', how='inner', start=None, stop=None):
+    topics = list(columns.values())
+    margin = _to_ns(tolerance)
+    if margin is None or (start is None and stop is None):
+        others = [store.get(topic) for topic in topics[1:]]
+    else:
+        lo = None if start is None else to_ns(start) - margin
+        hi = None if stop is None else to_ns(stop) + margin
+        others = [store.window(topic, lo, hi) for topic in topics[1:]]
+    streams = [store.window(topics[0], start, stop)] + others
+    timestamps, matrix = asof_align(streams, tolerance, direction, how)
+    return _wide_frame(list(columns), timestamps, matrix)
+
+
+#Align DataFrames that each have a 'timestamp' column and one value column into one wide DataFrame
+def align_frames(frames, tolerance=None, direction='nearest', how='inner'):
+    import pandas as pd
+
+    names, streams = [], []
+    for frame in frames:
+        frame = frame.sort_values('timestamp', kind='stable')
+        name = [column for column in frame.columns if column != 'timestamp'][0]
+        names.append(name)
+        streams.append((pd.DatetimeIndex(frame['timestamp']).as_unit('ns').asi8, frame[name].to_numpy(dtype=np.float64)))
+    timestamps, matrix = asof_align(streams, tolerance, direction, how)
+    return _wide_frame(names, timestamps, matrix)
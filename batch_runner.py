@@ -0,0 +1,142 @@
+#Batch runner for many voyage files
+#
+#Runs the per-voyage analyses on every file of a directory or glob in a process pool
+#and merges the results into one summary table (one row per voyage):
+#   fuel and CO2          - measured fuel method (same as Q2_iii.py)
+#   efficiency chain      - mean Power_Total_Efficiency of the aligned port/stbd power
+#   max load              - maximum engine load per engine and maximum propulsion power
+#Each voyage is analysed in its own worker; a file that fails only gets an error in
+#its row, the rest of the batch carries on.
+#
+#Usage: python batch_runner.py exports/ "archive/2024-*.csv" --out summary.csv --workers 8
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from alignment import asof_align
+from constants import BASE_POWER_PORT, BASE_POWER_STARBOARD
+from data_cache import load_columns
+from powertrain import efficiency_chain
+from route_ledger import measured_fuel_ledger
+from signal_store import SignalStore, open_signals, PORT_LOAD_FEEDBACK, STBD_LOAD_FEEDBACK
+
+align_tolerance = '500ms'
+
+SUMMARY_COLUMNS = ['file', 'start', 'stop', 'duration_h', 'readings', 'fuel_L', 'fuel_kg', 'CO2_kg',
+                   'mean_total_efficiency', 'max_propulsion_power', 'max_engine1_load', 'max_engine2_load',
+                   'max_engine3_load', 'seconds', 'error']
+
+
+#Voyage files from directories (*.csv inside), globs and plain paths, sorted and without duplicates;
+#files in exclude (e.g. the summary table of an earlier run in the same directory) are left out
+def find_voyage_files(patterns, exclude=()):
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(glob.glob(os.path.join(pattern, '*.csv')))
+        elif glob.has_magic(pattern):
+            files.extend(glob.glob(pattern))
+        else:
+            files.append(pattern)
+    excluded = {os.path.abspath(path) for path in exclude}
+    return sorted({path for path in files if os.path.abspath(path) not in excluded})
+
+
+#All analyses of one voyage file, as one summary row. A section the voyage has no data for
+#(no readings, no fuel readings, no port/stbd LoadFeedback, no engine load) is NaN or 0 in the
+#row, the other sections are still reported.
+def analyse_voyage(path, use_cache=True):
+    signals = open_signals(path) if use_cache else SignalStore.from_columns(*load_columns(path, use_cache=False))
+    start, stop = signals.time_range()
+    row = {
+        'file': path,
+        'start': start,
+        'stop': stop,
+        'duration_h': (stop - start).total_seconds() / 3600 if start is not None else np.nan,
+        'readings': len(signals.values),
+    }
+
+    ledger = measured_fuel_ledger(signals)
+    for quantity in ('fuel_L', 'fuel_kg', 'CO2_kg'):
+        row[quantity] = ledger.total(quantity)
+
+    row['mean_total_efficiency'] = row['max_propulsion_power'] = np.nan
+    if PORT_LOAD_FEEDBACK in signals and STBD_LOAD_FEEDBACK in signals:
+        _, power = asof_align([signals.get(PORT_LOAD_FEEDBACK), signals.get(STBD_LOAD_FEEDBACK)], tolerance=align_tolerance)
+        if len(power):
+            port_power = power[:, 0] / 100 * BASE_POWER_PORT
+            stbd_power = power[:, 1] / 100 * BASE_POWER_STARBOARD
+            chain = efficiency_chain(port_power, stbd_power, columns=['Power_Total_Efficiency'])
+            row['mean_total_efficiency'] = float(np.mean(chain['Power_Total_Efficiency']))
+            row['max_propulsion_power'] = float(np.max(port_power + stbd_power))
+
+    for engine in (1, 2, 3):
+        topic = f'gunnerus/RVG_mqtt/Engine{engine}/engine_load'
+        values = signals.get(topic)[1] if topic in signals else np.empty(0)
+        row[f'max_engine{engine}_load'] = float(values.max()) if len(values) else np.nan
+    return row
+
+
+#Worker entry point: never raises, errors end up in the row
+def _run_one(path, use_cache):
+    started = time.perf_counter()
+    try:
+        row = analyse_voyage(path, use_cache)
+        row['error'] = ''
+    except Exception as e:
+        row = {'file': path, 'error': f'{type(e).__name__}: {e}'}
+    row['seconds'] = time.perf_counter() - started
+    return row
+
+
+#Analyse all files in a process pool and return the summary DataFrame (sorted by file)
+def run_batch(files, workers=None, use_cache=True, progress=None):
+    import pandas as pd
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_run_one, path, use_cache): path for path in files}
+        for future in as_completed(futures):
+            try:
+                row = future.result()
+            except Exception as e:  #worker process died (e.g. out of memory)
+                row = {'file': futures[future], 'error': f'{type(e).__name__}: {e}'}
+            rows.append(row)
+            if progress is not None:
+                progress(row, len(rows), len(files))
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    return summary.sort_values('file', kind='stable').reset_index(drop=True)
+
+
+def _print_progress(row, done, total):
+    status = row['error'] or f"{row['fuel_L']:.1f} L fuel"
+    print(f'[{done}/{total}] {row["file"]}: {status}', file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the voyage analyses on many data files.')
+    parser.add_argument('paths', nargs='+', help='voyage files, directories or globs')
+    parser.add_argument('--out', default='summary.csv', help='summary table (semicolon separated)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: number of CPUs)')
+    parser.add_argument('--no-cache', action='store_true', help='always parse the CSV files')
+    args = parser.parse_args(argv)
+
+    files = find_voyage_files(args.paths, exclude=[args.out])
+    if not files:
+        parser.error('no voyage files found')
+    started = time.perf_counter()
+    summary = run_batch(files, args.workers, not args.no_cache, _print_progress)
+    summary.to_csv(args.out, sep=';', index=False)
+    failed = (summary['error'] != '').sum()
+    print(f'{len(files)} voyages ({failed} failed) in {time.perf_counter() - started:.1f} s, summary written to {args.out}')
+    return 1 if failed == len(files) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,254 @@
+#Benchmark of the analysis pipeline on synthetic voyages
+#
+#generate writes a semicolon separated data.csv with the real schema (timestamp;var;value)
+#and topic set, one reading per topic per second, in chunks so 10^9 rows need no more
+#memory than 10^6. The voyage alternates harbour, manoeuvring and transit; engine load,
+#speed and fuel consumption follow the propulsion power.
+#
+#run times every stage of the pipeline on files of the requested sizes and writes the
+#timings to a JSON file:
+#   parse        - CSV to columnar arrays (no cache)
+#   cache_load   - the same from the binary cache
+#   topic_split  - SignalStore.from_columns
+#   merge        - as-of alignment of port and starboard LoadFeedback
+#   efficiency   - efficiency chain of the merged propulsion power
+#   integration  - measured fuel ledger (fuel, energy, CO2 prefix sums)
+#   plot_prep    - figure spec with downsampled propulsion power
+#
+#startup times the headless fuel/CO2 entry points as whole processes (warm caches) against
+#an import-time budget, and fails when one of them is over it.
+#
+#Usage: python benchmark.py run --rows 100000 1000000 --out benchmark.json
+#       python benchmark.py generate data.csv --rows 1000000
+#       python benchmark.py startup data.csv --budget-ms 200
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from constants import density
+from data_cache import cache_path
+
+TOPICS = [
+    'gunnerus/RVG_mqtt/Engine1/engine_load',
+    'gunnerus/RVG_mqtt/Engine2/engine_load',
+    'gunnerus/RVG_mqtt/Engine3/engine_load',
+    'gunnerus/RVG_mqtt/Engine1/engine_speed',
+    'gunnerus/RVG_mqtt/Engine1/fuel_consumption',
+    'gunnerus/RVG_mqtt/Engine3/fuel_consumption',
+    'gunnerus/RVG_mqtt/hcx_port_mp/LoadFeedback',
+    'gunnerus/RVG_mqtt/hcx_stbd_mp/LoadFeedback',
+]
+
+START = '2024-09-10 06:20:00'
+CHUNK_ROWS = 1_000_000
+VOYAGE_PERIOD_S = 3 * 3600  #harbour -> transit -> harbour
+SFC = 0.21 #[kg/kWh] specific fuel consumption for the synthetic fuel flow
+
+STARTUP_BUDGET_MS = 200
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+#Readings of all topics for the seconds in seconds (array), as (timestamp strings, var, value) columns
+def _chunk(seconds, start_ns, rng):
+    phase = (seconds % VOYAGE_PERIOD_S) / VOYAGE_PERIOD_S
+    #Propulsion load [%]: harbour (low), manoeuvring (ramps) and transit (high), plus noise
+    profile = np.clip(np.sin(np.pi * phase) * 1.6 - 0.15, 0, 1) * 70 + 1
+    port = profile + rng.normal(0, 1.5, len(seconds))
+    stbd = profile + rng.normal(0, 1.5, len(seconds))
+    propulsion = (port + stbd) / 100 * 500
+    engine_total = propulsion / 0.87 + 60  #chain losses and hotel load [kW]
+    share = np.clip(rng.normal(0.5, 0.05, len(seconds)), 0.3, 0.7)
+    engine1 = engine_total * share
+    engine3 = engine_total * (1 - share)
+    engine2 = np.abs(rng.normal(0, 2, len(seconds)))
+    speed = 1800 + rng.normal(0, 3, len(seconds))
+    fuel1 = engine1 * SFC / density + rng.normal(0, 0.5, len(seconds))
+    fuel3 = engine3 * SFC / density + rng.normal(0, 0.5, len(seconds))
+
+    values = np.column_stack([engine1, engine2, engine3, speed, fuel1, fuel3, port, stbd]).ravel()
+    timestamps = (start_ns + seconds * 10**9).astype('datetime64[ns]')
+    text = np.char.add(np.char.replace(np.datetime_as_string(timestamps, unit='us'), 'T', ' '), '+00:00')
+    return np.repeat(text, len(TOPICS)), np.tile(np.array(TOPICS), len(seconds)), values
+
+
+#Write a synthetic data.csv with about rows readings (rounded up to whole seconds of all topics)
+def generate(path, rows, seed=0, start=START, chunk_rows=CHUNK_ROWS):
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    start_ns = pd.Timestamp(start, tz='UTC').value
+    n_seconds = -(-rows // len(TOPICS))
+    step = max(1, chunk_rows // len(TOPICS))
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', newline='') as f:
+        f.write('timestamp;var;value\n')
+        for first in range(0, n_seconds, step):
+            timestamps, topics, values = _chunk(np.arange(first, min(first + step, n_seconds)), start_ns, rng)
+            pd.DataFrame({'timestamp': timestamps, 'var': topics, 'value': values}).to_csv(
+                f, sep=';', index=False, header=False)
+    os.replace(tmp, path)
+    return n_seconds * len(TOPICS)
+
+
+def _timed(timings, name, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    timings[name] = min(elapsed, timings.get(name, elapsed))
+    return result
+
+
+#Time every pipeline stage on one file; best of repeat runs per stage
+def run_stages(path, repeat=1):
+    from alignment import asof_align
+    from data_cache import _parse_csv, build_cache, load_columns
+    from figures import figure_spec, line
+    from powertrain import efficiency_chain
+    from route_ledger import measured_fuel_ledger
+    from signal_store import SignalStore, PORT_LOAD_FEEDBACK, STBD_LOAD_FEEDBACK
+
+    timings = {}
+    build_cache(path)
+    for _ in range(repeat):
+        _timed(timings, 'parse', _parse_csv, path)
+        columns = _timed(timings, 'cache_load', load_columns, path)
+        store = _timed(timings, 'topic_split', SignalStore.from_columns, *columns)
+        timestamps, power = _timed(timings, 'merge', asof_align,
+                                   [store.get(PORT_LOAD_FEEDBACK), store.get(STBD_LOAD_FEEDBACK)], tolerance='500ms')
+        port_power = power[:, 0] / 100 * 500
+        stbd_power = power[:, 1] / 100 * 500
+        _timed(timings, 'efficiency', efficiency_chain, port_power, stbd_power)
+        _timed(timings, 'integration', measured_fuel_ledger, store)
+        _timed(timings, 'plot_prep', figure_spec, 'benchmark', [
+            line(timestamps.astype('datetime64[ns]'), port_power), line(timestamps.astype('datetime64[ns]'), stbd_power),
+            line(timestamps.astype('datetime64[ns]'), port_power + stbd_power)])
+    return timings
+
+
+def _environment():
+    import pandas as pd
+
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+#Generate (or reuse) a file per size in directory, time the stages and write the results as JSON
+def run(sizes, out='benchmark.json', directory='benchmark_data', repeat=1, keep=False, seed=0):
+    os.makedirs(directory, exist_ok=True)
+    results = []
+    for rows in sizes:
+        path = os.path.join(directory, f'data_{rows}.csv')
+        started = time.perf_counter()
+        existed = os.path.exists(path)
+        if not existed:
+            generate(path, rows, seed)
+        generate_s = None if existed else time.perf_counter() - started
+        timings = run_stages(path, repeat)
+        results.append({
+            'rows': rows,
+            'file_bytes': os.path.getsize(path),
+            'generate_s': generate_s,
+            'stages_s': timings,
+            'total_s': sum(timings.values()),
+        })
+        print(f'{rows:>12} rows: ' + ', '.join(f'{name} {seconds:.3f} s' for name, seconds in timings.items()))
+        if not keep and not existed:
+            os.remove(cache_path(path))
+            os.remove(path)
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'repeat': repeat, 'environment': _environment(), 'results': results}
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+#Entry points of the numbers-only path, run in the directory of the data file
+def _startup_commands(path):
+    return {
+        'psm fuel co2 --no-plots': [sys.executable, os.path.join(HERE, 'psm.py'), 'fuel', 'co2', '--no-plots',
+                                    '--data', os.path.basename(path)],
+        'Avg_fuel_consumption.py': [sys.executable, os.path.join(HERE, 'Avg_fuel_consumption.py')],
+    }
+
+
+#Import time [ms] of a module in a fresh interpreter, from -X importtime (cumulative, top level)
+def _import_ms(module, cwd):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=cwd,
+                            env=dict(os.environ, PYTHONPATH=HERE), capture_output=True, text=True, check=True)
+    for row in result.stderr.splitlines():
+        parts = row.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    return None
+
+
+#Best wall time [ms] of each headless entry point over repeat runs (after one warm-up run that builds the caches)
+def startup(path, repeat=5, budget_ms=STARTUP_BUDGET_MS):
+    cwd = os.path.dirname(os.path.abspath(path))
+    env = dict(os.environ, PYTHONPATH=HERE, PSM_NO_PLOTS='1')
+    env.pop('PSM_TRACE', None)
+    results = {}
+    for name, command in _startup_commands(path).items():
+        subprocess.run(command, cwd=cwd, env=env, capture_output=True, check=True)
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            subprocess.run(command, cwd=cwd, env=env, capture_output=True, check=True)
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+    imports = {module: _import_ms(module, cwd) for module in ('numpy', 'derived', 'psm')}
+    return {'budget_ms': budget_ms, 'run_ms': results, 'import_ms': imports,
+            'within_budget': all(ms <= budget_ms for ms in results.values())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Synthetic data.csv generator and pipeline benchmark.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    gen = commands.add_parser('generate', help='write a synthetic data.csv')
+    gen.add_argument('path')
+    gen.add_argument('--rows', type=int, default=100_000)
+    gen.add_argument('--seed', type=int, default=0)
+
+    bench = commands.add_parser('run', help='time the pipeline stages')
+    bench.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    bench.add_argument('--out', default='benchmark.json')
+    bench.add_argument('--dir', default='benchmark_data', help='where the generated files are kept')
+    bench.add_argument('--repeat', type=int, default=3, help='runs per stage, the best one is reported')
+    bench.add_argument('--keep', action='store_true', help='keep the generated files for the next run')
+    bench.add_argument('--seed', type=int, default=0)
+
+    start = commands.add_parser('startup', help='time the headless fuel/CO2 entry points against a budget')
+    start.add_argument('path', nargs='?', default='data.csv')
+    start.add_argument('--repeat', type=int, default=5)
+    start.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        rows = generate(args.path, args.rows, args.seed)
+        print(f'{rows} rows written to {args.path}')
+    elif args.command == 'startup':
+        report = startup(args.path, args.repeat, args.budget_ms)
+        for name, ms in report['run_ms'].items():
+            print(f"{name:<28}{ms:8.1f} ms {'ok' if ms <= args.budget_ms else 'OVER BUDGET'}")
+        print('import ' + ', '.join(f'{module} {ms:.1f} ms' for module, ms in report['import_ms'].items() if ms is not None))
+        return 0 if report['within_budget'] else 1
+    else:
+        run(args.rows, args.out, args.dir, args.repeat, args.keep, args.seed)
+        print(f'Results written to {args.out}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,20 @@
+#Physical constants and ratings shared by the modules
+#
+#The analysis scripts keep their own copies, as in the original assignments; everything
+#else (streaming, ledger, resampling, derived graph, ...) imports them from here so a
+#changed value is used everywhere.
+
+density = 0.82  #[kg/L]
+emission_factor = 3.15  #[kg CO2 / kg fuel]
+energy_fuel = 45.4  #[MJ/kg] marine diesel, given in engine data
+conversion_ratio_megajoule_to_kilowatt = 3.6  #[MJ/kWh]
+
+BASE_POWER_PORT = 500  # kW for Port motor
+BASE_POWER_STARBOARD = 500  # kW for Starboard motor
+genset_power = 450  #[kW] one genset
+gensets_total_power = 900  #[kW]
+
+
+#Energy of fuel_kg [kg] of fuel in kWh (or power [kW] of a flow in kg/h)
+def fuel_energy(fuel_kg, energy_fuel=energy_fuel):
+    return fuel_kg * energy_fuel / conversion_ratio_megajoule_to_kilowatt
@@ -0,0 +1,111 @@
+#Persistent columnar cache for the semicolon separated data.csv exports
+#
+#The first time a file is loaded it is parsed once and written as a binary
+#.npz next to it (in .psm_cache/), holding:
+#   timestamps - int64, epoch nanoseconds (UTC)
+#   values     - float64
+#   codes      - int32, index into topics
+#   topics     - the distinct 'var' strings (MQTT topic names)
+#The cache file name contains a fingerprint of the source file, so when
+#data.csv changes the old cache is ignored and rebuilt automatically.
+
+import hashlib
+import os
+
+import numpy as np
+
+from timestamps import parse_timestamps
+from tracing import traced
+
+CACHE_DIR_NAME = '.psm_cache'
+CACHE_VERSION = 1
+
+#Number of bytes hashed from the start and the end of the source file
+FINGERPRINT_BLOCK = 1 << 16
+
+
+#Fingerprint of the source file: size, modification time and a hash of the first and last block
+def file_fingerprint(path):
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(f'{CACHE_VERSION}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BLOCK))
+        if stat.st_size > 2 * FINGERPRINT_BLOCK:
+            f.seek(-FINGERPRINT_BLOCK, os.SEEK_END)
+            digest.update(f.read(FINGERPRINT_BLOCK))
+    return digest.hexdigest()
+
+
+def cache_path(path, cache_dir=None):
+    path = os.path.abspath(path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(path), CACHE_DIR_NAME)
+    name = os.path.basename(path)
+    return os.path.join(cache_dir, f'{name}.{file_fingerprint(path)}.npz')
+
+
+#Parse the csv with pandas and return the columnar arrays
+@traced('parse', rows_out=lambda columns: len(columns[0]))
+def _parse_csv(path):
+    import pandas as pd
+
+    df = pd.read_csv(path, sep=';', dtype={'var': 'category'})
+    timestamps = parse_timestamps(df['timestamp'])
+    values = df['value'].to_numpy(dtype=np.float64)
+    codes = df['var'].cat.codes.to_numpy().astype(np.int32)
+    topics = np.array(df['var'].cat.categories, dtype=str)
+    return timestamps, values, codes, topics
+
+
+def _remove_stale(target):
+    cache_dir = os.path.dirname(target)
+    prefix = os.path.basename(target).rsplit('.', 2)[0] + '.'
+    for name in os.listdir(cache_dir):
+        full = os.path.join(cache_dir, name)
+        if name.startswith(prefix) and name.endswith('.npz') and full != target:
+            try:
+                os.remove(full)
+            except OSError:
+                pass
+
+
+def build_cache(path, cache_dir=None):
+    target = cache_path(path, cache_dir)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    timestamps, values, codes, topics = _parse_csv(path)
+
+    #Write to a temporary file first so a concurrent reader never sees a half written cache
+    tmp = f'{target}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, timestamps=timestamps, values=values, codes=codes, topics=topics)
+    os.replace(tmp, target)
+    _remove_stale(target)
+    return timestamps, values, codes, topics
+
+
+#Load data.csv as columnar arrays (timestamps, values, codes, topics), using the cache when it is valid
+@traced('load', rows_out=lambda columns: len(columns[0]))
+def load_columns(path='data.csv', cache_dir=None, use_cache=True):
+    if not use_cache:
+        return _parse_csv(path)
+    target = cache_path(path, cache_dir)
+    if os.path.exists(target):
+        try:
+            with np.load(target) as cached:
+                return cached['timestamps'], cached['values'], cached['codes'], cached['topics']
+        except (OSError, ValueError, KeyError):
+            pass  #Corrupt or incompatible cache, rebuild below
+    return build_cache(path, cache_dir)
+
+
+#Load data.csv as the usual long format DataFrame: timestamp (UTC), var, value
+def load_data(path='data.csv', cache_dir=None, use_cache=True):
+    import pandas as pd
+
+    timestamps, values, codes, topics = load_columns(path, cache_dir, use_cache)
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(timestamps, unit='ns', utc=True),
+        'var': pd.Categorical.from_codes(codes, categories=topics),
+        'value': values,
+    })
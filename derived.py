@@ -0,0 +1,275 @@
+#Lazy graph of derived signals over the raw topics
+#
+#Every derived quantity the scripts rebuild (fuel kg/h and fuel power, motor and total
+#propulsion power, the efficiency chain, cumulative fuel and CO2, ...) is a named node
+#with the nodes it is computed from. SignalGraph.get(name) computes only the upstream
+#nodes that name needs, each once, and keeps them, so analyses sharing a graph share
+#the work. graph_for(path) keeps one graph per data file for the whole process.
+#
+#Series nodes are (timestamps [epoch ns], values) pairs like SignalStore.get().
+#
+#Nodes name the constants they use (CONSTANTS, overridable per graph). With a result
+#cache the values are also kept on disk under a key built from the data fingerprint,
+#the node, its constants and the keys of its inputs, so a rerun reads them back and a
+#changed constant recomputes only the nodes downstream of it.
+#
+#   graph = graph_for('data.csv')
+#   timestamps, co2 = graph.get('co2_cumulative')
+#   graph_for('data.csv', constants={'density': 0.84}).get('co2_cumulative')
+
+import os
+
+import numpy as np
+
+from alignment import asof_align
+from constants import BASE_POWER_PORT, BASE_POWER_STARBOARD, density, emission_factor, energy_fuel, fuel_energy
+from data_cache import file_fingerprint, load_columns
+from powertrain import efficiency_chain, ETAS
+from result_cache import cache_for, result_key
+from route_ledger import measured_fuel_ledger
+from signal_store import (open_signals, SignalStore, ENGINE1_FUEL, ENGINE1_LOAD, ENGINE1_SPEED, ENGINE2_LOAD, ENGINE3_FUEL,
+                          ENGINE3_LOAD, PORT_LOAD_FEEDBACK, STBD_LOAD_FEEDBACK)
+from thermal_efficiency import thermal_efficiency, threshold as thermal_threshold
+from tracing import stage
+
+align_tolerance = '500ms'
+
+#Constants the nodes can take (by these names)
+CONSTANTS = {
+    'density': density,  #[kg/L]
+    'energy_fuel': energy_fuel,
+    'emission_factor': emission_factor,  #[kg CO2/kg fuel]
+    'base_power_port': BASE_POWER_PORT,
+    'base_power_stbd': BASE_POWER_STARBOARD,
+    'align_tolerance': align_tolerance,
+    'etas': ETAS,  #eta_* of the efficiency chain (powertrain.py)
+    'thermal_threshold': thermal_threshold,  #[kW] engine load below which eta_th is NaN
+    'fuel_max_hold': None,  #[ns] longest a fuel reading is held in the fuel ledger (None: no limit, as the scripts)
+}
+
+#Columns of the engine_readings node (as in Task03_part1.py)
+ENGINE_READINGS = ('fuel_consumption_1', 'fuel_consumption_3', 'rpm_1', 'engine_1', 'engine_2')
+
+#Raw topics by node name
+RAW = {
+    'engine1_load': ENGINE1_LOAD,
+    'engine2_load': ENGINE2_LOAD,
+    'engine3_load': ENGINE3_LOAD,
+    'engine1_speed': ENGINE1_SPEED,
+    'engine1_fuel': ENGINE1_FUEL,  #[L/h]
+    'engine3_fuel': ENGINE3_FUEL,
+    'port_load_feedback': PORT_LOAD_FEEDBACK,  #[% of 500 kW]
+    'stbd_load_feedback': STBD_LOAD_FEEDBACK,
+}
+
+NODES = {}  #name -> (function, names of the nodes it takes, constants it takes, kept in the result cache)
+
+
+#Register a derived node; the function gets the values of deps in order ('store' is the SignalStore itself)
+#and the constants as keyword arguments. Nodes whose value is not arrays are registered with persist=False.
+def node(name, *deps, constants=(), persist=True):
+    def register(func):
+        NODES[name] = (func, deps, constants, persist)
+        return func
+    return register
+
+
+#Values of two series at the timestamps they share exactly (like pd.merge on 'timestamp')
+def _join(a, b):
+    timestamps, ia, ib = np.intersect1d(a[0], b[0], assume_unique=False, return_indices=True)
+    return timestamps, a[1][ia], b[1][ib]
+
+
+@node('load_feedback', 'port_load_feedback', 'stbd_load_feedback', constants=('align_tolerance',))
+def _load_feedback(port, stbd, align_tolerance):
+    return asof_align([port, stbd], tolerance=align_tolerance)
+
+
+@node('port_motor_power', 'load_feedback', constants=('base_power_port',))
+def _port_motor_power(load_feedback, base_power_port):
+    timestamps, matrix = load_feedback
+    return timestamps, matrix[:, 0] / 100 * base_power_port
+
+
+@node('stbd_motor_power', 'load_feedback', constants=('base_power_stbd',))
+def _stbd_motor_power(load_feedback, base_power_stbd):
+    timestamps, matrix = load_feedback
+    return timestamps, matrix[:, 1] / 100 * base_power_stbd
+
+
+@node('total_propulsion_power', 'port_motor_power', 'stbd_motor_power')
+def _total_propulsion_power(port, stbd):
+    return port[0], port[1] + stbd[1]
+
+
+@node('Power_Total_Efficiency', 'port_motor_power', 'stbd_motor_power', 'total_propulsion_power', constants=('etas',))
+def _power_total_efficiency(port, stbd, total, etas):
+    chain = efficiency_chain(port[1], stbd[1], total[1], columns=['Power_Total_Efficiency'], etas=etas)
+    return total[0], chain['Power_Total_Efficiency']
+
+
+#Fuel needed for the propulsion power at the chain efficiency [kg/h] (Q1_iv.py)
+@node('estimated_fuel_kg_per_h', 'total_propulsion_power', 'Power_Total_Efficiency', constants=('energy_fuel',))
+def _estimated_fuel(total, efficiency, energy_fuel):
+    gross_spesific_energy = fuel_energy(1, energy_fuel) #[kWh/kg]
+    return total[0], total[1] / ((efficiency[1] / 100) * gross_spesific_energy)
+
+
+def _fuel_kg_per_h(fuel, density):
+    return fuel[0], fuel[1] * density
+
+
+def _fuel_power(fuel_kg_per_h, energy_fuel):
+    return fuel_kg_per_h[0], fuel_energy(fuel_kg_per_h[1], energy_fuel)
+
+
+for _engine in ('engine1', 'engine3'):
+    node(f'{_engine}_fuel_kg_per_h', f'{_engine}_fuel', constants=('density',))(_fuel_kg_per_h)
+    node(f'{_engine}_fuel_power', f'{_engine}_fuel_kg_per_h', constants=('energy_fuel',))(_fuel_power)  #[kW]
+
+
+@node('total_fuel_power', 'engine1_fuel_power', 'engine3_fuel_power')
+def _total_fuel_power(engine1, engine3):
+    timestamps, power1, power3 = _join(engine1, engine3)
+    return timestamps, power1 + power3
+
+
+#Propulsion power over fuel power [%] where the fuel power is positive (Q2_iv_v.py)
+@node('power_efficiency', 'total_propulsion_power', 'total_fuel_power')
+def _power_efficiency(propulsion, fuel_power):
+    timestamps, propulsion, fuel_power = _join(propulsion, fuel_power)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return timestamps, np.where(fuel_power > 0, propulsion / fuel_power * 100, np.nan)
+
+
+#Engine 1 and 3 fuel [L/h], Engine 1 rpm and Engine 1 and 3 load lined up on the Engine 1 fuel timestamps
+@node('engine_readings', 'engine1_fuel', 'engine3_fuel', 'engine1_speed', 'engine1_load', 'engine3_load',
+      constants=('align_tolerance',))
+def _engine_readings(*streams, align_tolerance):
+    return asof_align(list(streams), tolerance=align_tolerance)
+
+
+@node('engine1_thermal_efficiency', 'engine_readings', constants=('density', 'thermal_threshold'))
+def _engine1_thermal_efficiency(readings, density, thermal_threshold):
+    timestamps, matrix = readings
+    return timestamps, thermal_efficiency(matrix[:, 3], matrix[:, 0] * density, thermal_threshold)
+
+
+@node('fuel_ledger', 'store', constants=('density', 'energy_fuel', 'emission_factor', 'fuel_max_hold'), persist=False)
+def _fuel_ledger(store, density, energy_fuel, emission_factor, fuel_max_hold):
+    return measured_fuel_ledger(store, density, energy_fuel, emission_factor, fuel_max_hold)
+
+
+@node('cumulative_fuel_L', 'fuel_ledger')
+def _cumulative_fuel_L(ledger):
+    return ledger.timestamps, ledger.prefix['fuel_L']
+
+
+@node('cumulative_fuel_kg', 'fuel_ledger')
+def _cumulative_fuel_kg(ledger):
+    return ledger.timestamps, ledger.prefix['fuel_kg']
+
+
+@node('co2_cumulative', 'fuel_ledger')
+def _co2_cumulative(ledger):
+    return ledger.timestamps, ledger.prefix['CO2_kg']
+
+
+class SignalGraph:
+
+    #fingerprint of the data file and a ResultCache to keep the node values on disk (both or neither);
+    #constants overrides CONSTANTS for this graph
+    def __init__(self, store, fingerprint=None, cache=None, constants=None):
+        self.store = store
+        self.fingerprint = fingerprint
+        self.cache = cache if fingerprint is not None else None
+        self.constants = dict(CONSTANTS, **(constants or {}))
+        self._values = {'store': store}
+        self._keys = {'store': fingerprint}
+
+    def __contains__(self, name):
+        return name in self._values
+
+    #Result cache key of a node: data fingerprint, node, its constants and the keys of its inputs
+    def key(self, name):
+        key = self._keys.get(name)
+        if key is None:
+            if name in RAW:
+                key = result_key(self.fingerprint, name, {'topic': RAW[name]})
+            else:
+                func, deps, constants, persist = NODES[name]
+                key = result_key(self.fingerprint, name, {c: self.constants[c] for c in constants},
+                                 [self.key(dep) for dep in deps])
+            self._keys[name] = key
+        return key
+
+    def get(self, name):
+        value = self._values.get(name)
+        if value is not None:
+            return value
+        if name in RAW:
+            value = self.store.get(RAW[name])
+        elif name in NODES:
+            func, deps, constants, persist = NODES[name]
+            if persist and self.cache is not None:
+                value = self.cache.get(self.key(name))
+            if value is None:
+                inputs = [self.get(dep) for dep in deps]
+                with stage('derive', node=name):
+                    value = func(*inputs, **{c: self.constants[c] for c in constants})
+                if persist and self.cache is not None:
+                    self.cache.put(self.key(name), value)
+        else:
+            raise KeyError(f'Unknown signal: {name}')
+        self._values[name] = value
+        return value
+
+    #Names of all nodes name depends on (directly or not), in computation order
+    def requires(self, name, _seen=None):
+        seen = [] if _seen is None else _seen
+        for dep in NODES.get(name, (None, ()))[1]:
+            if dep != 'store' and dep not in seen:
+                self.requires(dep, seen)
+                seen.append(dep)
+        return seen
+
+    #Series node as a DataFrame with 'timestamp' (UTC) and a column named after the node
+    def frame(self, name):
+        import pandas as pd
+
+        timestamps, values = self.get(name)
+        return pd.DataFrame({'timestamp': pd.to_datetime(timestamps, unit='ns', utc=True), name: values})
+
+    #Measured fuel, energy and CO2 per route, {route: {quantity: total}}; routes as from route_ledger.load_routes
+    def route_totals(self, routes):
+        names, starts, stops = routes
+        compute = lambda: self.get('fuel_ledger').route_totals(routes)
+        if self.cache is None:
+            return compute()
+        key = result_key(self.fingerprint, 'route_totals', {'names': list(names), 'starts': starts, 'stops': stops},
+                         [self.key('fuel_ledger')])
+        return self.cache.get_or_compute(key, compute)
+
+    #Drop computed nodes from memory (all of them, or the given ones)
+    def clear(self, *names):
+        for name in names or [name for name in self._values if name != 'store']:
+            self._values.pop(name, None)
+
+
+_graphs = {}
+
+
+#Graph over a data file, shared by everything in this process until the file changes.
+#Node values are kept in the result cache and the parsed log in the signal store cache next to the file;
+#with use_cache False neither cache is read or written and the file is parsed in memory.
+def graph_for(path='data.csv', constants=None, use_cache=True):
+    fingerprint = file_fingerprint(path)
+    key = (os.path.abspath(path), result_key(None, 'constants', constants), use_cache)
+    cached = _graphs.get(key)
+    if cached is None or cached[0] != fingerprint:
+        if use_cache:
+            cache, store = cache_for(path), open_signals(path)
+        else:
+            cache, store = None, SignalStore.from_columns(*load_columns(path, use_cache=False))
+        cached = _graphs[key] = (fingerprint, SignalGraph(store, fingerprint, cache, constants))
+    return cached[1]
@@ -0,0 +1,83 @@
+#Visual downsampling of long time series before plotting
+#
+#A line plot can not show more than about two points per pixel column, so a series of
+#millions of samples is reduced to that many points in O(n):
+#   minmax - the minimum and maximum sample of equally sized buckets (every peak
+#            and dip is kept, the drawn envelope is the same as with all samples)
+#   lttb   - largest-triangle-three-buckets, one sample per bucket chosen to keep the
+#            visual shape (smoother look, single-sample spikes may be dropped)
+#Both return indices into the original arrays, so x can be datetime64 or numbers.
+
+import numpy as np
+
+METHODS = ('minmax', 'lttb')
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64) or np.issubdtype(x.dtype, np.timedelta64):
+        return x.view(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+#Indices of the min and max sample of each of n_buckets equally sized buckets, plus the first and last sample
+def minmax_indices(y, n_buckets):
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    n_buckets = -(-n // size)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    #NaN never wins; an all-NaN bucket gives its first sample, so the gap is still drawn
+    high = np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1) + offsets
+    low = np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1) + offsets
+    index = np.unique(np.concatenate([[0], high, low, [n - 1]]))
+    return index[index < n]
+
+
+#Indices of n_out samples chosen with largest-triangle-three-buckets (first and last always kept)
+def lttb_indices(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _as_float(x)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    #Mean point of every bucket, for the third corner of the triangles
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    mean_x = np.append(mean_x, x[-1])
+    mean_y = np.append(mean_y, y[-1])
+
+    index = np.empty(n_out, dtype=np.int64)
+    index[0] = 0
+    index[-1] = n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        cx, cy = mean_x[bucket + 1], mean_y[bucket + 1]
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        previous = lo + int(np.argmax(area))
+        index[bucket + 1] = previous
+    return index
+
+
+#Reduce (x, y) to about n_points samples for drawing; returns the selected (x, y)
+def downsample(x, y, n_points, method='minmax'):
+    if method not in METHODS:
+        raise ValueError(f'method must be one of {METHODS}, got {method!r}')
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) <= n_points:
+        return x, y
+    if method == 'minmax':
+        index = minmax_indices(y, max(1, n_points // 2))
+    else:
+        index = lttb_indices(x, y, n_points)
+    return x[index], y[index]
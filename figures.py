@@ -0,0 +1,166 @@
+#Declarative figures, shown on screen or rendered to files in parallel
+#
+#A figure is described by a plain dict (see figure_spec and line) holding the data
+#arrays and the labels, so it can be sent to a worker process. show_or_save() either
+#opens the figures one after another with pyplot as before, or, when the PSM_FIGURE_DIR
+#environment variable is set, renders them with the Agg backend in a process pool
+#straight to PNG/SVG files (formats from PSM_FIGURE_FORMATS, default png) without
+#any window. Rendering uses matplotlib.figure.Figure directly, not pyplot, so no GUI
+#backend is ever loaded in the workers. With PSM_NO_PLOTS=1 the figures are skipped and
+#matplotlib is never imported (numbers-only runs, cron jobs).
+#
+#Long series are downsampled (downsample.py) to about two points per pixel column of
+#the figure when the spec is made, so neither the workers nor matplotlib see millions
+#of samples; minmax keeps every peak.
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from downsample import downsample as _downsample
+from tracing import traced
+
+FIGURE_DIR_ENV = 'PSM_FIGURE_DIR'
+FIGURE_FORMATS_ENV = 'PSM_FIGURE_FORMATS'
+NO_PLOTS_ENV = 'PSM_NO_PLOTS'
+DEFAULT_FORMATS = ('png',)
+DPI = 100
+
+
+#Plain numpy array; timezone aware timestamps become naive UTC datetime64 (plotted the same),
+#object columns holding None (e.g. np.where(..., None, ...)) become float with NaN
+def _to_numpy(values):
+    if hasattr(values, 'dt') and getattr(values.dt, 'tz', None) is not None:
+        values = values.dt.tz_convert(None)
+    elif getattr(values, 'tz', None) is not None:
+        values = values.tz_convert(None)
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = values.astype(np.float64)
+    return values
+
+
+#One plotted series; style is passed on to Axes.plot (e.g. linestyle, linewidth)
+def line(x, y, label=None, color=None, **style):
+    return {'x': _to_numpy(x), 'y': _to_numpy(y), 'label': label, 'color': color, 'style': style}
+
+
+def _reduce(series, max_points, method):
+    x, y = _downsample(series['x'], series['y'], max_points, method)
+    return dict(series, x=x, y=y)
+
+
+#Horizontal reference line (like plt.axhline)
+def hline(y, label=None, color=None, **style):
+    return {'y': float(y), 'label': label, 'color': color, 'style': style}
+
+
+#name is the file name without extension; legend is the legend loc, or None for no legend.
+#date_format sets a DateFormatter on the x axis, auto_date_locator an AutoDateLocator.
+#Lines longer than max_points (default two per pixel column) are reduced with the downsample
+#method ('minmax' or 'lttb'), downsample=None draws every sample.
+def figure_spec(name, lines, title='', xlabel='', ylabel='', figsize=(12, 6), hlines=(), legend='best', grid=True,
+                date_format=None, auto_date_locator=False, xtick_rotation=None, tight_layout=False,
+                downsample='minmax', max_points=None):
+    if downsample is not None:
+        if max_points is None:
+            max_points = 2 * int(figsize[0] * DPI)
+        lines = [_reduce(series, max_points, downsample) for series in lines]
+    return {
+        'name': name,
+        'lines': list(lines),
+        'hlines': list(hlines),
+        'title': title,
+        'xlabel': xlabel,
+        'ylabel': ylabel,
+        'figsize': figsize,
+        'legend': legend,
+        'grid': grid,
+        'date_format': date_format,
+        'auto_date_locator': auto_date_locator,
+        'xtick_rotation': xtick_rotation,
+        'tight_layout': tight_layout,
+    }
+
+
+def _draw(fig, spec):
+    import matplotlib.dates as mdates
+
+    ax = fig.add_subplot()
+    for series in spec['lines']:
+        ax.plot(series['x'], series['y'], label=series['label'], color=series['color'], **series['style'])
+    for reference in spec['hlines']:
+        ax.axhline(reference['y'], label=reference['label'], color=reference['color'], **reference['style'])
+    ax.set_xlabel(spec['xlabel'])
+    ax.set_ylabel(spec['ylabel'])
+    ax.set_title(spec['title'])
+    if spec['legend'] is not None:
+        ax.legend(loc=spec['legend'])
+    ax.grid(spec['grid'])
+    if spec['xtick_rotation'] is not None:
+        ax.tick_params(axis='x', labelrotation=spec['xtick_rotation'])
+    if spec['date_format'] is not None:
+        ax.xaxis.set_major_formatter(mdates.DateFormatter(spec['date_format']))
+    if spec['auto_date_locator']:
+        ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+    if spec['tight_layout']:
+        fig.tight_layout()
+
+
+#Render one spec to directory/<name>.<format> for each format, returns the written paths
+def render(spec, directory, formats=DEFAULT_FORMATS, dpi=DPI):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=spec['figsize'])
+    _draw(fig, spec)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(directory, f"{spec['name']}.{fmt}")
+        fig.savefig(path, format=fmt, dpi=dpi)
+        paths.append(path)
+    return paths
+
+
+#Render all specs in a process pool (one figure per task), returns the written paths.
+#The workers are forked: the scripts have no __main__ guard, so spawned workers would re-run them.
+#Where fork is not available the figures are rendered one by one.
+def render_all(specs, directory, formats=DEFAULT_FORMATS, workers=None, dpi=DPI):
+    os.makedirs(directory, exist_ok=True)
+    if len(specs) <= 1 or workers == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return [path for spec in specs for path in render(spec, directory, formats, dpi)]
+    workers = min(len(specs), workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+        futures = [executor.submit(render, spec, directory, formats, dpi) for spec in specs]
+        return [path for future in futures for path in future.result()]
+
+
+#Show the figures with pyplot, one window after the other
+def show(specs):
+    import matplotlib.pyplot as plt
+
+    for spec in specs:
+        _draw(plt.figure(figsize=spec['figsize']), spec)
+        plt.show()
+
+
+#Directory and formats from the environment, or None when figures should be shown
+def figure_output():
+    directory = os.environ.get(FIGURE_DIR_ENV)
+    if not directory:
+        return None
+    formats = os.environ.get(FIGURE_FORMATS_ENV)
+    formats = tuple(fmt.strip() for fmt in formats.split(',') if fmt.strip()) if formats else DEFAULT_FORMATS
+    return directory, formats
+
+
+@traced('report', rows_in=lambda args: len(args[0]))
+def show_or_save(specs):
+    if os.environ.get(NO_PLOTS_ENV, '') not in ('', '0'):
+        return []
+    output = figure_output()
+    if output is None:
+        show(specs)
+        return []
+    return render_all(specs, *output)
@@ -0,0 +1,113 @@
+#Online fuel and CO2 integrator for live feeds
+#
+#Each (timestamp, fuel flow [L/h]) reading of an engine adds the trapezoid between
+#it and the previous reading of the same engine to the running totals, so an update
+#costs O(1) instead of a diff() + cumsum() over the whole history. Totals are kept
+#for the whole voyage and for the current route. snapshot()/restore() let a long
+#running process save its state and continue after a restart.
+
+import json
+import os
+
+from constants import density, emission_factor
+
+SNAPSHOT_VERSION = 1
+
+
+class FuelIntegrator:
+
+    #max_gap_s: readings further apart than this are not integrated (data gap), None to always integrate
+    def __init__(self, density=density, emission_factor=emission_factor, max_gap_s=None):
+        self.density = density
+        self.emission_factor = emission_factor
+        self.max_gap_s = max_gap_s
+        self.last = {}  #engine -> (timestamp [s], fuel flow [L/h])
+        self.voyage_L = 0.0
+        self.route_name = None
+        self.route_L = 0.0
+        self.routes = {}  #finished routes, name -> litres
+
+    #Add one reading; timestamp in seconds (epoch), value in L/h. Returns the litres added.
+    def update(self, engine, timestamp, value):
+        timestamp = float(timestamp)
+        value = float(value)
+        previous = self.last.get(engine)
+        if previous is not None and timestamp <= previous[0]:
+            return 0.0  #Late or repeated reading, already covered
+        self.last[engine] = (timestamp, value)
+        if previous is None:
+            return 0.0
+
+        dt = timestamp - previous[0]
+        if self.max_gap_s is not None and dt > self.max_gap_s:
+            return 0.0
+        litres = (previous[1] + value) / 2 * dt / 3600
+        self.voyage_L += litres
+        if self.route_name is not None:
+            self.route_L += litres
+        return litres
+
+    def start_route(self, name):
+        if self.route_name is not None:
+            self.end_route()
+        self.route_name = name
+        self.route_L = 0.0
+
+    #Close the current route and return its totals
+    def end_route(self):
+        if self.route_name is None:
+            return None
+        self.routes[self.route_name] = self.route_L
+        totals = self._totals(self.route_L)
+        self.route_name = None
+        self.route_L = 0.0
+        return totals
+
+    def _totals(self, litres):
+        kg = litres * self.density
+        return {'fuel_L': litres, 'fuel_kg': kg, 'CO2_kg': kg * self.emission_factor}
+
+    def voyage_totals(self):
+        return self._totals(self.voyage_L)
+
+    def route_totals(self, name=None):
+        if name is None or name == self.route_name:
+            return self._totals(self.route_L)
+        return self._totals(self.routes[name])
+
+    def snapshot(self):
+        return {
+            'version': SNAPSHOT_VERSION,
+            'density': self.density,
+            'emission_factor': self.emission_factor,
+            'max_gap_s': self.max_gap_s,
+            'last': {engine: list(reading) for engine, reading in self.last.items()},
+            'voyage_L': self.voyage_L,
+            'route_name': self.route_name,
+            'route_L': self.route_L,
+            'routes': dict(self.routes),
+        }
+
+    @classmethod
+    def restore(cls, snapshot):
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported integrator snapshot version: {snapshot.get('version')}")
+        integrator = cls(snapshot['density'], snapshot['emission_factor'], snapshot['max_gap_s'])
+        integrator.last = {engine: tuple(reading) for engine, reading in snapshot['last'].items()}
+        integrator.voyage_L = snapshot['voyage_L']
+        integrator.route_name = snapshot['route_name']
+        integrator.route_L = snapshot['route_L']
+        integrator.routes = dict(snapshot['routes'])
+        return integrator
+
+    #Write the snapshot as JSON (atomically, a crash never leaves a half written file)
+    def save(self, path):
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.restore(json.load(f))
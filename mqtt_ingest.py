@@ -0,0 +1,231 @@
+#Asyncio ingestion of the gunnerus/RVG_mqtt topics
+#
+#Messages are taken from a bounded asyncio.Queue (publishers wait when it is full,
+#which is the backpressure) and handled in batches. Every reading is appended to
+#per-topic timestamp/value arrays (the same representation as signal_store), and the
+#live metrics are updated as they arrive:
+#   propulsion power - from the latest port and starboard LoadFeedback [% of 500 kW]
+#   engine load      - latest engine_load per engine [kW]
+#   fuel and CO2     - FuelIntegrator over the fuel_consumption topics [L/h]
+#
+#With a TopicRingBuffers as windows, only the last readings per topic are kept.
+#
+#LocalBroker is an in-process stand-in for the MQTT broker so the service can be run
+#and tested without network access. ingest_from_broker connects to a real broker with
+#aiomqtt (optional dependency, only imported there).
+#
+#Payloads are either a plain number or JSON {"value": ..., "timestamp": ...} with the
+#timestamp in epoch seconds; plain numbers get the time they were received. Messages
+#with any other payload are counted as rejected and skipped.
+
+import asyncio
+import json
+import sys
+import time
+
+import numpy as np
+
+from constants import BASE_POWER_PORT, BASE_POWER_STARBOARD
+from integrator import FuelIntegrator
+from signal_store import (SignalStore, ENGINE1_FUEL, ENGINE1_LOAD, ENGINE2_LOAD, ENGINE3_FUEL, ENGINE3_LOAD,
+                          PORT_LOAD_FEEDBACK, STBD_LOAD_FEEDBACK)
+
+TOPIC_FILTER = 'gunnerus/RVG_mqtt/#'
+
+QUEUE_SIZE = 10_000
+BATCH_SIZE = 1_000
+
+
+#MQTT topic filter matching with the + (one level) and # (rest of the levels) wildcards
+def topic_matches(topic_filter, topic):
+    filter_levels = topic_filter.split('/')
+    topic_levels = topic.split('/')
+    for i, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if i >= len(topic_levels) or (level != '+' and level != topic_levels[i]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class LocalBroker:
+
+    def __init__(self):
+        self._subscriptions = []
+
+    def subscribe(self, topic_filter=TOPIC_FILTER, maxsize=QUEUE_SIZE):
+        queue = asyncio.Queue(maxsize=maxsize)
+        self._subscriptions.append((topic_filter, queue))
+        return queue
+
+    #Waits while a subscriber's queue is full
+    async def publish(self, topic, payload):
+        for topic_filter, queue in self._subscriptions:
+            if topic_matches(topic_filter, topic):
+                await queue.put((topic, payload))
+
+    #Tell the subscribers that no more messages will come
+    async def close(self):
+        for _, queue in self._subscriptions:
+            await queue.put(None)
+
+
+#(timestamp [s], value) of a payload; raises ValueError, KeyError or TypeError when it is neither format
+def parse_payload(payload, received):
+    try:
+        return received, float(payload)
+    except ValueError:
+        message = json.loads(payload)
+        if not isinstance(message, dict):
+            raise TypeError(f'Payload is not a number or a JSON object: {payload!r}') from None
+        return float(message.get('timestamp', received)), float(message['value'])
+
+
+class _TopicBuffer:
+
+    def __init__(self):
+        self.timestamps = []  #list of int64 epoch ns arrays, one per batch
+        self.values = []
+
+    def extend(self, timestamps, values):
+        self.timestamps.append((np.asarray(timestamps, dtype=np.float64) * 1e9).astype(np.int64))
+        self.values.append(np.asarray(values, dtype=np.float64))
+
+    def arrays(self):
+        if not self.timestamps:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        if len(self.timestamps) > 1:
+            self.timestamps = [np.concatenate(self.timestamps)]
+            self.values = [np.concatenate(self.values)]
+        return self.timestamps[0], self.values[0]
+
+
+class TelemetryIngestor:
+
+    #windows: optional TopicRingBuffers; when given only the last readings per topic are kept (fixed memory)
+    def __init__(self, batch_size=BATCH_SIZE, integrator=None, windows=None):
+        self.batch_size = batch_size
+        self.integrator = integrator or FuelIntegrator()
+        self.windows = windows
+        self.buffers = {}
+        self.latest = {}  #topic -> (timestamp [s], value)
+        self.messages = 0
+        self.rejected = 0  #messages with a payload parse_payload doesn't accept
+
+    #Consume messages from the queue until None is received
+    async def run(self, queue):
+        while True:
+            message = await queue.get()
+            batch = []
+            while message is not None:
+                batch.append(message)
+                if len(batch) >= self.batch_size or queue.empty():
+                    break
+                message = queue.get_nowait()
+            if batch:
+                self.process_batch(batch)
+            if message is None:
+                return
+            #Give publishers a chance to run between batches
+            await asyncio.sleep(0)
+
+    def process_batch(self, batch, received=None):
+        if received is None:
+            received = time.time()
+        by_topic = {}
+        accepted = 0
+        for topic, payload in batch:
+            try:
+                timestamp, value = parse_payload(payload, received)
+            except (ValueError, KeyError, TypeError):
+                #One bad message must not stop the consumer (the publishers would wait on the full queue forever)
+                self.rejected += 1
+                continue
+            accepted += 1
+            readings = by_topic.setdefault(topic, ([], []))
+            readings[0].append(timestamp)
+            readings[1].append(value)
+
+        for topic, (timestamps, values) in by_topic.items():
+            if self.windows is not None:
+                self.windows.extend(topic, (np.asarray(timestamps) * 1e9).astype(np.int64), values)
+            else:
+                self.buffers.setdefault(topic, _TopicBuffer()).extend(timestamps, values)
+            self.latest[topic] = (timestamps[-1], values[-1])
+            if topic.endswith('/fuel_consumption'):
+                for timestamp, value in zip(timestamps, values):
+                    self.integrator.update(topic, timestamp, value)
+        self.messages += accepted
+
+    def _latest_value(self, topic):
+        reading = self.latest.get(topic)
+        return None if reading is None else reading[1]
+
+    def metrics(self):
+        port = self._latest_value(PORT_LOAD_FEEDBACK)
+        stbd = self._latest_value(STBD_LOAD_FEEDBACK)
+        propulsion = None
+        if port is not None and stbd is not None:
+            propulsion = port / 100 * BASE_POWER_PORT + stbd / 100 * BASE_POWER_STARBOARD
+        return {
+            'messages': self.messages,
+            'rejected': self.rejected,
+            'total_propulsion_power': propulsion,
+            'engine_load': {topic: self._latest_value(topic) for topic in (ENGINE1_LOAD, ENGINE2_LOAD, ENGINE3_LOAD)},
+            'fuel_flow': {topic: self._latest_value(topic) for topic in (ENGINE1_FUEL, ENGINE3_FUEL)},
+            'voyage': self.integrator.voyage_totals(),
+        }
+
+    #Everything received so far (or still in the ring buffers) as a SignalStore, for the usual analyses
+    def to_store(self):
+        if self.windows is not None:
+            return self.windows.to_store()
+        topics = sorted(self.buffers)
+        timestamps, values, offsets = [], [], [0]
+        for topic in topics:
+            topic_timestamps, topic_values = self.buffers[topic].arrays()
+            order = np.argsort(topic_timestamps, kind='stable')
+            timestamps.append(topic_timestamps[order])
+            values.append(topic_values[order])
+            offsets.append(offsets[-1] + len(order))
+        if not topics:
+            return SignalStore(np.empty(0, dtype=np.int64), np.empty(0), np.zeros(1, dtype=np.int64), [])
+        return SignalStore(np.concatenate(timestamps), np.concatenate(values), np.array(offsets, dtype=np.int64), topics)
+
+
+#Subscribe to a real MQTT broker and feed the ingestor until cancelled
+async def ingest_from_broker(host, port=1883, topic_filter=TOPIC_FILTER, ingestor=None, queue_size=QUEUE_SIZE):
+    import aiomqtt
+
+    ingestor = ingestor or TelemetryIngestor()
+    queue = asyncio.Queue(maxsize=queue_size)
+    consumer = asyncio.create_task(ingestor.run(queue))
+    try:
+        async with aiomqtt.Client(host, port) as client:
+            await client.subscribe(topic_filter)
+            async for message in client.messages:
+                await queue.put((str(message.topic), message.payload))
+    finally:
+        await queue.put(None)
+        await consumer
+    return ingestor
+
+
+#Publish n synthetic readings through LocalBroker and report the ingestion rate
+async def _selftest(n):
+    broker = LocalBroker()
+    ingestor = TelemetryIngestor()
+    consumer = asyncio.create_task(ingestor.run(broker.subscribe()))
+    topics = [ENGINE1_FUEL, ENGINE3_FUEL, ENGINE1_LOAD, ENGINE3_LOAD, PORT_LOAD_FEEDBACK, STBD_LOAD_FEEDBACK]
+    start = time.perf_counter()
+    for i in range(n):
+        await broker.publish(topics[i % len(topics)], f'{{"timestamp": {1725949200 + i // len(topics)}, "value": {40 + i % 7}}}')
+    await broker.close()
+    await consumer
+    elapsed = time.perf_counter() - start
+    print(f'{ingestor.messages} messages in {elapsed:.2f} s ({ingestor.messages / elapsed:.0f} messages/s)')
+    print(ingestor.metrics())
+
+
+if __name__ == '__main__':
+    asyncio.run(_selftest(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
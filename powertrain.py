@@ -0,0 +1,92 @@
+#Vectorized powertrain efficiency chain
+#
+#Propulsion motor power is traced back through the chain
+#   propulsion motor -> VSD -> switchboard -> generator -> engine
+#and the engine efficiency is evaluated at the resulting percentage of rated power.
+#Column names are the same as the ones built step by step in Q1_iii.py, and only
+#the requested columns are computed, each in one NumPy expression.
+
+import numpy as np
+
+from constants import genset_power, gensets_total_power
+from tracing import traced
+
+#Efficiency constants
+eta_propulsion_motor = 0.97
+eta_switchboard = 0.99
+eta_VSD = 0.97
+eta_generator = 0.96
+
+SIDES = ('Port', 'Stbd', 'Total')
+
+ETAS = {
+    'eta_propulsion_motor': eta_propulsion_motor,
+    'eta_VSD': eta_VSD,
+    'eta_switchboard': eta_switchboard,
+    'eta_generator': eta_generator,
+}
+
+
+#Divisor from propulsion motor power to the power at each stage
+def _stage_efficiency(eta_propulsion_motor, eta_VSD, eta_switchboard, eta_generator):
+    return {
+        'VSD': eta_propulsion_motor,
+        'SW': eta_propulsion_motor * eta_VSD,
+        'Generator': eta_propulsion_motor * eta_VSD * eta_switchboard,
+        'Engine': eta_propulsion_motor * eta_VSD * eta_switchboard * eta_generator,
+    }
+
+
+_STAGE_EFFICIENCY = _stage_efficiency(**ETAS)
+_RATED_POWER = {'Port': genset_power, 'Stbd': genset_power, 'Total': gensets_total_power}
+
+CHAIN_COLUMNS = (
+    [f'{stage}_{side}_Power' for stage in _STAGE_EFFICIENCY for side in SIDES]
+    + [f'Engine_{side}_Rated_Power' for side in SIDES]
+    + [f'Engine_{side}_Efficiency' for side in SIDES]
+    + [f'Power_{side}_Efficiency' for side in SIDES]
+)
+
+
+#Efficiency in typical combustion engine [%], x - Percentage of rated power (works on scalars and arrays)
+def eta_engine(x):
+    x = np.asarray(x, dtype=np.float64)
+    return (-0.0024 * x + 0.402) * x + 27.4382
+
+
+def _rated_power(power, side, chain_efficiency):
+    return power * (100 / (chain_efficiency * _RATED_POWER[side]))
+
+
+def _column(name, power, side, percent, stage_efficiency):
+    stage, _, kind = name.split('_', 2)
+    chain_efficiency = stage_efficiency['Engine']
+    if kind == 'Rated_Power':
+        return _rated_power(power, side, chain_efficiency)
+    if stage == 'Engine' and kind == 'Efficiency':
+        return eta_engine(_rated_power(power, side, chain_efficiency)) / 100
+    if stage == 'Power':
+        return eta_engine(_rated_power(power, side, chain_efficiency)) * (chain_efficiency * (1 if percent else 0.01))
+    return power / stage_efficiency[stage]
+
+
+#Efficiency chain for port, starboard and total propulsion power [kW].
+#Returns a dict of arrays for the requested columns (all of CHAIN_COLUMNS by default).
+#Power_*_Efficiency is in percent, or as a fraction with percent=False (as in Q1_v.py).
+#etas overrides some of the eta_* constants, e.g. {'eta_VSD': 0.98} (keys as in ETAS).
+@traced('derive', rows_in=lambda args: len(args[0]))
+def efficiency_chain(port_power, stbd_power, total_power=None, columns=None, percent=True, etas=None):
+    powers = {
+        'Port': np.asarray(port_power, dtype=np.float64),
+        'Stbd': np.asarray(stbd_power, dtype=np.float64),
+    }
+    powers['Total'] = powers['Port'] + powers['Stbd'] if total_power is None else np.asarray(total_power, dtype=np.float64)
+
+    stage_efficiency = _STAGE_EFFICIENCY if not etas else _stage_efficiency(**dict(ETAS, **etas))
+    result = {}
+    for name in CHAIN_COLUMNS if columns is None else columns:
+        if name not in CHAIN_COLUMNS:
+            raise KeyError(f'Unknown efficiency chain column: {name}')
+        side = name.split('_')[1]
+        result[name] = _column(name, powers[side], side, percent, stage_efficiency)
+    return result
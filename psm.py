@@ -0,0 +1,393 @@
+#Command line entry point running the analyses in one process over one loaded dataset
+#
+#   python psm.py fuel co2 max-load --data data.csv --routes routes.csv
+#   python psm.py all --out report/          (figures and report.json written to report/)
+#   python psm.py fuel co2 --no-plots
+#
+#Analyses (any combination, or all):
+#   propulsion-power   - port, starboard and total propulsion power (Q1_ii.py)
+#   efficiency         - efficiency chain and genset to propulsion power efficiency (Q1_iii.py, Q2_iv_v.py)
+#   fuel               - measured and estimated fuel, average consumption (Q2_iii.py, Q1_iv.py, Avg_fuel_consumption.py)
+#   co2                - CO2 emitted (Task03_part2_measurement_used_method.py)
+#   max-load           - maximum engine load and when it occurred (Maximum_power_required.py)
+#   thermal-efficiency - engine 1 thermal efficiency, torque and BMEP (Task03_part1.py)
+#   tank-sizing        - methanol tank and fuel flow, range on a full tank (Task03_part3.py)
+#
+#All analyses read from one derived signal graph (derived.py): data.csv is opened once
+#and shared intermediates (aligned LoadFeedback, the fuel ledger, ...) are computed once,
+#and kept in the result cache for the next run. Results are printed per route (routes.csv)
+#and for the full trip; the figures of all analyses are collected and shown at the end,
+#or rendered in parallel to --out. --no-plots skips the figures and matplotlib altogether.
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from constants import energy_fuel as energy_marine_diesel, genset_power
+from tracing import stage
+
+ANALYSES = {}
+
+#Task03_part1.py
+displaced_volume = 0.0156 #[m^3] From data engine
+k = 2 #For 4 stroke engines
+pascal_to_bar_conversion = 1e-5
+
+#Task03_part3.py
+tank_original_liters = 50000 #[L]
+energy_methanol = 19.7 #[MJ/kg] given in lecture
+density_marine_diesel = 820 #[kg/m^3]
+density_methanol = 792 #[kg/m^3]
+total_power_required = genset_power*3 #[kW]
+eta_thermal_methanol_engine = 0.4129
+eta_energy_diesel = 0.41761
+
+
+#Register an analysis; the function takes a Context and returns (results, figure specs)
+def analysis(name):
+    def register(func):
+        ANALYSES[name] = func
+        return func
+    return register
+
+
+class Context:
+
+    #routes as from route_ledger.load_routes
+    def __init__(self, graph, routes, plots=True):
+        self.graph = graph
+        self.routes = routes
+        self.plots = plots
+
+    #(name, start, stop) of the full trip and every route; None for open ends
+    def intervals(self):
+        names, starts, stops = self.routes
+        return [('Full trip', None, None)] + list(zip(names, starts.tolist(), stops.tolist()))
+
+
+def _bounds(timestamps, start, stop):
+    lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+    hi = len(timestamps) if stop is None else int(np.searchsorted(timestamps, stop, side='right'))
+    return lo, hi
+
+
+def _slug(name):
+    return name.lower().replace(' ', '_')
+
+
+def _time(ns):
+    import pandas as pd
+
+    return pd.Timestamp(ns, tz='UTC')
+
+
+def _dates(timestamps):
+    return np.asarray(timestamps).astype('datetime64[ns]')
+
+
+#Results as plain JSON values: numpy scalars as Python numbers, NaN and infinities as null
+def _json_value(value):
+    if isinstance(value, dict):
+        return {key: _json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value) if np.isfinite(value) else None
+    return value
+
+
+def _mean(values):
+    return float(np.nanmean(values)) if len(values) and not np.isnan(values).all() else float('nan')
+
+
+@analysis('propulsion-power')
+def propulsion_power(ctx):
+    from figures import figure_spec, line
+
+    g = ctx.graph
+    timestamps, total = g.get('total_propulsion_power')
+    port, stbd = g.get('port_motor_power')[1], g.get('stbd_motor_power')[1]
+    results, specs = {}, []
+    for name, start, stop in ctx.intervals():
+        lo, hi = _bounds(timestamps, start, stop)
+        results[name] = {'mean_kW': _mean(total[lo:hi]), 'max_kW': float(np.nanmax(total[lo:hi])) if hi > lo else float('nan')}
+        print(f"{name}: total propulsion power mean {results[name]['mean_kW']:.2f} kW, max {results[name]['max_kW']:.2f} kW")
+        if ctx.plots and hi > lo:
+            x = _dates(timestamps[lo:hi])
+            specs.append(figure_spec(f'propulsion_power_{_slug(name)}', [
+                line(x, port[lo:hi], label='Port-side propulsion motor', color='blue'),
+                line(x, stbd[lo:hi], label='Starboard-side propulsion motor', color='red'),
+                line(x, total[lo:hi], label='Total propulsion power', color='green'),
+            ], title=f'Propulsion Power - {name}', xlabel='Time', ylabel='Propulsion Power [kW]', figsize=(12, 8),
+                legend='upper right', date_format='%Y-%m-%d %H:%M:%S', xtick_rotation=45, tight_layout=True))
+    return results, specs
+
+
+@analysis('efficiency')
+def efficiency(ctx):
+    from figures import figure_spec, hline, line
+
+    g = ctx.graph
+    chain_timestamps, chain = g.get('Power_Total_Efficiency')
+    timestamps, power_efficiency = g.get('power_efficiency')
+    results, specs = {}, []
+    for name, start, stop in ctx.intervals():
+        lo, hi = _bounds(chain_timestamps, start, stop)
+        plo, phi = _bounds(timestamps, start, stop)
+        results[name] = {'power_total_efficiency_pct': _mean(chain[lo:hi]), 'energy_efficiency_pct': _mean(power_efficiency[plo:phi])}
+        print(f"{name}: efficiency chain {results[name]['power_total_efficiency_pct']:.2f} %, "
+              f"genset to propulsion (energy efficiency) {results[name]['energy_efficiency_pct']:.2f} %")
+        if ctx.plots and hi > lo:
+            specs.append(figure_spec(f'efficiency_chain_{_slug(name)}',
+                                     [line(_dates(chain_timestamps[lo:hi]), chain[lo:hi], label='Total Efficiency')],
+                                     title=f'Engine Power Efficiencies Over Time - {name}', xlabel='Timestamp', ylabel='Efficiency (%)'))
+    if ctx.plots and len(timestamps):
+        mean = results['Full trip']['energy_efficiency_pct']
+        specs.append(figure_spec(
+            'power_efficiency', [line(_dates(timestamps), power_efficiency, label='Power Efficiency', color='purple')],
+            title='Power Efficiency from Genset to Propulsion Motors Over Time', xlabel='Time', ylabel='Efficiency ηp [%]',
+            hlines=[hline(mean, label=f'Energy Efficiency: {mean:.2f}%', color='orange', linestyle='--')],
+            legend='upper right', date_format='%Y-%m-%d %H:%M', xtick_rotation=45, tight_layout=True))
+    return results, specs
+
+
+#Measured total of quantity per interval from the fuel ledger ({interval: total})
+def _ledger_totals(ctx, quantity):
+    ledger = ctx.graph.get('fuel_ledger')
+    totals = {'Full trip': float(ledger.prefix[quantity][-1]) if len(ledger.timestamps) else 0.0}
+    for name, route in ctx.graph.route_totals(ctx.routes).items():
+        totals[name] = route[quantity]
+    return totals
+
+
+#Cumulative figures per interval, starting at 0 for every route (as in Q2_iii.py)
+def _cumulative_figures(ctx, prefix, nodes, ylabel, title):
+    from figures import figure_spec, line
+
+    g = ctx.graph
+    specs = []
+    for name, start, stop in ctx.intervals():
+        lines = []
+        for node, label, color in nodes:
+            timestamps, cumulative = g.get(node)
+            lo, hi = _bounds(timestamps, start, stop)
+            if hi > lo:
+                lines.append(line(_dates(timestamps[lo:hi]), cumulative[lo:hi] - cumulative[lo], label=label, color=color))
+        if lines:
+            specs.append(figure_spec(f'{prefix}_{_slug(name)}', lines, title=f'{title} - {name}', xlabel='Time', ylabel=ylabel))
+    return specs
+
+
+@analysis('fuel')
+def fuel(ctx):
+    g = ctx.graph
+    litres = _ledger_totals(ctx, 'fuel_L')
+    kilograms = _ledger_totals(ctx, 'fuel_kg')
+    ledger_timestamps = g.get('fuel_ledger').timestamps
+    hours = (ledger_timestamps[-1] - ledger_timestamps[0]) / 3.6e12 if len(ledger_timestamps) else float('nan')
+
+    #Estimated from the propulsion power and the efficiency chain, totalled per route as Q1_iv.py does (step into
+    #the route's first reading included)
+    from route_ledger import RouteLedger
+
+    timestamps, flow = g.get('estimated_fuel_kg_per_h')
+    steps = flow / 3600 * np.diff(timestamps, prepend=timestamps[:1]) / 1e9
+    estimated = RouteLedger(timestamps, {'fuel_kg': np.nan_to_num(steps)})
+    names, starts, stops = ctx.routes
+    estimated_kg = dict(zip(['Full trip'] + list(names),
+                            [estimated.total('fuel_kg')] + estimated.totals(starts, stops, first_step=True)['fuel_kg'].tolist()))
+
+    results = {}
+    for name, _, _ in ctx.intervals():
+        results[name] = {'fuel_L': litres[name], 'fuel_kg': kilograms[name], 'estimated_fuel_kg': estimated_kg[name]}
+        print(f"{name}: measured {litres[name]:.2f} L, {kilograms[name]:.2f} kg, "
+              f"estimated from propulsion power {results[name]['estimated_fuel_kg']:.2f} kg")
+    results['Full trip'].update(hours=hours, average_L_per_h=litres['Full trip'] / hours, average_kg_per_h=kilograms['Full trip'] / hours)
+    print(f"Average fuel consumption over {hours:.2f} hours: {results['Full trip']['average_L_per_h']:.2f} L/hour, "
+          f"{results['Full trip']['average_kg_per_h']:.2f} kg/hour")
+
+    specs = []
+    if ctx.plots:
+        specs = _cumulative_figures(ctx, 'cumulative_fuel', [
+            ('cumulative_fuel_L', 'Cumulative Fuel Consumption (L)', 'orange'),
+            ('cumulative_fuel_kg', 'Cumulative Fuel Consumption (Kg)', 'blue'),
+        ], 'Cumulative Fuel Consumption', 'Cumulative Fuel Consumption Over Time (L and Kg)')
+    return results, specs
+
+
+@analysis('co2')
+def co2(ctx):
+    totals = _ledger_totals(ctx, 'CO2_kg')
+    results = {}
+    for name, _, _ in ctx.intervals():
+        results[name] = {'CO2_kg': totals[name]}
+        print(f'{name}: {totals[name]:.2f} kg CO2')
+    specs = []
+    if ctx.plots:
+        specs = _cumulative_figures(ctx, 'cumulative_co2', [('co2_cumulative', 'Cumulative CO2 Emissions (kg)', 'green')],
+                                    'Cumulative CO2 Emissions (kg)', 'Cumulative CO2 Emissions Over Time')
+    return results, specs
+
+
+@analysis('max-load')
+def max_load(ctx):
+    from derived import RAW
+    from range_index import RangeIndex
+
+    engines = [('Engine 1', 'engine1_load', 'blue'), ('Engine 2', 'engine2_load', 'orange'), ('Engine 3', 'engine3_load', 'green')]
+    #An engine whose load topic is not in the log has no readings (max NaN, no time)
+    series = {engine: ctx.graph.get(node) if RAW[node] in ctx.graph.store else (np.empty(0, dtype=np.int64), np.empty(0))
+              for engine, node, _ in engines}
+    indexes = {engine: RangeIndex(*series[engine]) for engine, _, _ in engines}
+    results = {}
+    for name, start, stop in ctx.intervals():
+        results[name] = {}
+        for engine, _, _ in engines:
+            peak, at = indexes[engine].max(start, stop)
+            results[name][engine] = {'max_kW': peak, 'at': None if at is None else str(_time(at))}
+            if at is not None:
+                print(f'{name}: {engine} max load {peak:.2f} kW at {_time(at).time()} ({peak / genset_power * 100:.1f} % of {genset_power} kW)')
+
+    specs = []
+    if ctx.plots:
+        from figures import figure_spec, hline, line
+
+        lines, hlines = [], []
+        for engine, _, color in engines:
+            timestamps, load = series[engine]
+            if len(timestamps) == 0:
+                continue
+            peak = results['Full trip'][engine]['max_kW']
+            lines.append(line(_dates(timestamps), load, label=f'{engine} Load', color=color))
+            hlines.append(hline(peak, color=color, linestyle='--', linewidth=1, label=f'Max {engine} Load: {peak:.2f} kW'))
+        specs.append(figure_spec('max_load', lines, hlines=hlines, title='Engine Load', xlabel='Time', ylabel='Engine Load [kW]',
+                                 legend='upper right', date_format='%Y-%m-%d %H:%M:%S', xtick_rotation=45, tight_layout=True))
+    return results, specs
+
+
+@analysis('thermal-efficiency')
+def thermal_efficiency_analysis(ctx):
+    from thermal_efficiency import filter_efficiency, thermal_efficiency
+
+    g = ctx.graph
+    timestamps, readings = g.get('engine_readings')
+    eta_1 = g.get('engine1_thermal_efficiency')[1]
+    filtered = filter_efficiency(eta_1, window=5, z_limit=3)
+    print(f"Engine 1 thermal efficiency (smoothed, outliers removed): min {filtered['min']:.2f} %, max {filtered['max']:.2f} %")
+
+    #Torque T = P/omega [Nm] and BMEP [bar] where the (unfiltered) efficiency is highest and lowest
+    rpm, load = readings[:, 2], readings[:, 3]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        torque = (load * 60) / (2 * np.pi * rpm) * 1000
+    results = {'Full trip': {'eta_min_pct': filtered['min'], 'eta_max_pct': filtered['max']}}
+    if not np.isnan(eta_1).all():
+        for label, index in (('max', int(np.nanargmax(eta_1))), ('min', int(np.nanargmin(eta_1)))):
+            bmep = ((2 * np.pi * k * torque[index]) / displaced_volume) * pascal_to_bar_conversion
+            results['Full trip'].update({f'torque_at_{label}_eff_Nm': torque[index], f'BMEP_at_{label}_eff_bar': bmep})
+            print(f'At {label} efficiency ({_time(timestamps[index]).time()}): torque {torque[index]:.2f} Nm, BMEP {bmep:.2f} bar')
+
+    specs = []
+    if ctx.plots:
+        from figures import figure_spec, line
+
+        eta_2 = thermal_efficiency(readings[:, 4], readings[:, 1] * g.constants['density'], threshold=0)
+        x = _dates(timestamps)
+        specs = [
+            figure_spec('thermal_efficiency', [
+                line(x, eta_1, label='Eta[th] engine 1', color='red'),
+                line(x, eta_2, label='Eta[th] engine 2', color='green'),
+                line(x, filtered['filtered'], label='Smoothed & Filtered Eta[th] engine 1', color='blue'),
+            ], title='Thermal Efficiency Over Time', xlabel='Time', ylabel='Eta efficiency', xtick_rotation=45, tight_layout=True),
+            figure_spec('torque', [line(x, torque, label='Torque (Nm)', color='purple')],
+                        title='Torque Over Time for Engine 1', xlabel='Time', ylabel='Torque (Nm)', xtick_rotation=45, tight_layout=True),
+        ]
+    return results, specs
+
+
+@analysis('tank-sizing')
+def tank_sizing(ctx):
+    #Methanol tank holding the same energy as the diesel tank
+    tank_original_cubic = tank_original_liters * 0.001
+    methanol_full_tank_kg = density_marine_diesel * tank_original_cubic * energy_marine_diesel / energy_methanol
+    tank_methanol_cubic = methanol_full_tank_kg / density_methanol #[m^3]
+    print(f'Required tank capacity for diesel: {tank_original_cubic:.3f} [m^3], methanol: {tank_methanol_cubic:.3f} [m^3]')
+
+    #Fuel flow to the engines at maximum load
+    tot_energy_output = total_power_required / 1000 #[MJ/s]
+    diesel_per_sec_kg = tot_energy_output / eta_energy_diesel / energy_marine_diesel
+    methanol_per_sec_kg = tot_energy_output / eta_thermal_methanol_engine / energy_methanol
+    print(f'The max flow rate to the engines: marine diesel {diesel_per_sec_kg * 3600:.2f} [kg/h], '
+          f'methanol {methanol_per_sec_kg * 3600:.2f} [kg/h]')
+
+    #Range on a full tank at the measured average consumption
+    litres = _ledger_totals(ctx, 'fuel_L')['Full trip']
+    ledger_timestamps = ctx.graph.get('fuel_ledger').timestamps
+    hours = (ledger_timestamps[-1] - ledger_timestamps[0]) / 3.6e12 if len(ledger_timestamps) else float('nan')
+    range_hours = tank_original_liters / (litres / hours) if litres > 0 else float('nan')
+    print(f'Range on a full diesel tank at the measured {litres / hours:.2f} L/h: {range_hours:.0f} hours ({range_hours / 24:.1f} days)')
+
+    return {'Full trip': {
+        'tank_diesel_m3': tank_original_cubic,
+        'tank_methanol_m3': tank_methanol_cubic,
+        'max_flow_diesel_kg_per_h': diesel_per_sec_kg * 3600,
+        'max_flow_methanol_kg_per_h': methanol_per_sec_kg * 3600,
+        'range_full_tank_h': range_hours,
+    }}, []
+
+
+#Run the analyses by name in the given order; returns ({analysis: results}, figure specs)
+def run(names, ctx):
+    results, specs = {}, []
+    for name in names:
+        print(f'== {name} ==')
+        with stage(name, 'analysis'):
+            results[name], figures = ANALYSES[name](ctx)
+        specs.extend(figures)
+        print()
+    return results, specs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run PSM analyses over one dataset in one process.')
+    parser.add_argument('analyses', nargs='+', choices=list(ANALYSES) + ['all'], metavar='analysis',
+                        help=f"one or more of {', '.join(ANALYSES)}, or all")
+    parser.add_argument('--data', default='data.csv')
+    parser.add_argument('--routes', default='routes.csv', help='route;start;stop file (ignored when missing)')
+    parser.add_argument('--out', help='directory for the figures and report.json (figures are shown otherwise)')
+    parser.add_argument('--no-plots', action='store_true', help='no figures')
+    parser.add_argument('--no-cache', action='store_true', help='do not read or write the result and signal store caches')
+    args = parser.parse_args(argv)
+
+    from derived import graph_for
+    from route_ledger import load_routes
+
+    names = list(ANALYSES) if 'all' in args.analyses else list(dict.fromkeys(args.analyses))
+    if os.path.exists(args.routes):
+        routes = load_routes(args.routes)
+    else:
+        routes = ([], np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+    ctx = Context(graph_for(args.data, use_cache=not args.no_cache), routes, plots=not args.no_plots)
+    results, specs = run(names, ctx)
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        with open(os.path.join(args.out, 'report.json'), 'w') as f:
+            json.dump(_json_value(results), f, indent=2, allow_nan=False)
+    if specs:
+        from figures import figure_output, render_all, show_or_save, DEFAULT_FORMATS
+
+        if args.out:
+            output = figure_output()
+            paths = render_all(specs, args.out, output[1] if output else DEFAULT_FORMATS)
+            print(f'{len(paths)} figures and report.json written to {args.out}')
+        else:
+            show_or_save(specs)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#Multi-resolution pre-aggregated pyramids for interval statistics
+#
+#For one time sorted series the samples are grouped into buckets aligned to the epoch
+#at 1 s, 10 s, 1 min, 10 min and 1 h, and every bucket keeps min, max, sum, count and
+#the trapezoidal integral [value * s] of its samples. Each bucket is a contiguous range
+#of the raw samples and every level nests in the next coarser one, so the samples of
+#any interval are covered by a few whole coarse buckets in the middle, finer buckets
+#towards the ends and raw samples only at the very edges. A query over a year of
+#1 Hz data touches a few thousand numbers instead of millions, and the result is the
+#same as a scan of the raw samples:
+#   min/max/sum/count/mean - of the samples with start <= timestamp <= stop (min/max skip NaN
+#                            samples as np.nanmin/np.nanmax, NaN when all of them are NaN)
+#   integral               - trapezoids between consecutive samples inside the interval
+#                            (as np.trapz over the same samples)
+
+import numpy as np
+
+from signal_store import to_ns
+
+LEVELS = ('1s', '10s', '1min', '10min', '1h')
+_LEVEL_NS = {'1s': 10**9, '10s': 10 * 10**9, '1min': 60 * 10**9, '10min': 600 * 10**9, '1h': 3600 * 10**9}
+STATS = ('min', 'max', 'sum', 'count', 'integral')
+
+
+#Aggregate consecutive groups of rows starting at starts (reduceat keeps it one pass per statistic;
+#fmin/fmax skip NaN, so a bucket's min/max is NaN only when all its samples are)
+def _reduce(aggregates, starts):
+    return {
+        'min': np.fmin.reduceat(aggregates['min'], starts),
+        'max': np.fmax.reduceat(aggregates['max'], starts),
+        'sum': np.add.reduceat(aggregates['sum'], starts),
+        'count': np.add.reduceat(aggregates['count'], starts),
+        'integral': np.add.reduceat(aggregates['integral'], starts),
+    }
+
+
+def _group_starts(keys):
+    return np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+
+
+class Pyramid:
+
+    #timestamps: sorted epoch ns, values: float
+    def __init__(self, timestamps, values):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        n = len(self.values)
+        #Trapezoid from each sample to the next one; belongs to the bucket of its first sample
+        self.trapezoids = np.zeros(n)
+        if n > 1:
+            self.trapezoids[:-1] = (self.values[1:] + self.values[:-1]) / 2 * np.diff(self.timestamps) / 1e9
+
+        aggregates = {'min': self.values, 'max': self.values, 'sum': self.values,
+                      'count': np.ones(n, dtype=np.int64), 'integral': self.trapezoids}
+        first = np.arange(n)
+        bucket = self.timestamps
+        step = 1
+        self.levels = {}
+        for level in LEVELS:
+            bucket = bucket * step // _LEVEL_NS[level]
+            step = _LEVEL_NS[level]
+            starts = _group_starts(bucket) if n else first
+            aggregates = _reduce(aggregates, starts) if n else aggregates
+            first = first[starts]
+            bucket = bucket[starts]
+            self.levels[level] = dict(aggregates, bucket=bucket, first=first, end=np.append(first[1:], n))
+
+    def __len__(self):
+        return len(self.values)
+
+    #Start times (epoch ns) and aggregates of the buckets of one level between start and stop, for dashboards
+    def buckets(self, level='1min', start=None, stop=None):
+        data = self.levels[level]
+        times = data['bucket'] * _LEVEL_NS[level]
+        lo = 0 if start is None else np.searchsorted(times, to_ns(start) - _LEVEL_NS[level] + 1, side='left')
+        hi = len(times) if stop is None else np.searchsorted(times, to_ns(stop), side='right')
+        result = {stat: data[stat][lo:hi] for stat in STATS}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result['mean'] = result['sum'] / result['count']
+        result['time'] = times[lo:hi]
+        return result
+
+    #Add the raw samples lo..hi to the accumulated statistics
+    def _add_raw(self, acc, lo, hi):
+        if hi <= lo:
+            return
+        values = self.values[lo:hi]
+        acc['min'] = np.fmin(acc['min'], np.fmin.reduce(values))
+        acc['max'] = np.fmax(acc['max'], np.fmax.reduce(values))
+        acc['sum'] += values.sum()
+        acc['count'] += hi - lo
+        acc['integral'] += self.trapezoids[lo:hi].sum()
+
+    def _add_buckets(self, acc, data, ka, kb):
+        if kb <= ka:
+            return
+        acc['min'] = np.fmin(acc['min'], np.fmin.reduce(data['min'][ka:kb]))
+        acc['max'] = np.fmax(acc['max'], np.fmax.reduce(data['max'][ka:kb]))
+        acc['sum'] += data['sum'][ka:kb].sum()
+        acc['count'] += int(data['count'][ka:kb].sum())
+        acc['integral'] += data['integral'][ka:kb].sum()
+
+    #Cover raw samples lo..hi with whole buckets of the levels from level_index down, raw samples at the edges
+    def _cover(self, acc, lo, hi, level_index):
+        if hi <= lo:
+            return
+        if level_index < 0:
+            self._add_raw(acc, lo, hi)
+            return
+        data = self.levels[LEVELS[level_index]]
+        ka = np.searchsorted(data['first'], lo, side='left')
+        kb = np.searchsorted(data['end'], hi, side='right')
+        if kb <= ka:
+            self._cover(acc, lo, hi, level_index - 1)
+            return
+        self._add_buckets(acc, data, ka, kb)
+        self._cover(acc, lo, data['first'][ka], level_index - 1)
+        self._cover(acc, data['end'][kb - 1], hi, level_index - 1)
+
+    #Statistics of the samples with start <= timestamp <= stop (None for open ends)
+    def stats(self, start=None, stop=None):
+        lo = 0 if start is None else int(np.searchsorted(self.timestamps, to_ns(start), side='left'))
+        hi = len(self.values) if stop is None else int(np.searchsorted(self.timestamps, to_ns(stop), side='right'))
+        #min/max start at NaN, which fmin/fmax replace with the first sample that is not NaN
+        acc = {'min': np.nan, 'max': np.nan, 'sum': 0.0, 'count': 0, 'integral': 0.0}
+        #The trapezoid of the last sample reaches outside the interval
+        self._cover(acc, lo, hi, len(LEVELS) - 1)
+        if hi > lo:
+            acc['integral'] -= self.trapezoids[hi - 1]
+        acc['mean'] = acc['sum'] / acc['count'] if acc['count'] else np.nan
+        return acc
+
+
+#Pyramids for topics of a SignalStore (all topics by default), {topic: Pyramid}
+def build_pyramids(store, topics=None):
+    return {topic: Pyramid(*store.get(topic)) for topic in (store.topics if topics is None else topics)}
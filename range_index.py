@@ -0,0 +1,161 @@
+#Sparse-table index for O(1) range max/min queries on a topic
+#
+#After an O(n log n) build, the position of the maximum (or minimum) of any range of
+#samples is the better one of two overlapping power-of-two blocks, so a query costs
+#two lookups and many windows are answered at once with array indexing. The index
+#keeps positions, not only values, so the timestamp of the peak comes for free.
+#
+#sustained_peaks() uses it for genset sizing: for each window length the highest load
+#that was held for the whole window (max over windows of the window minimum), next to
+#the highest single reading.
+#
+#Memory is n * log2(n) positions (int32 below 2**31 samples), so build it per topic and
+#per voyage or month rather than over years of 1 Hz data at once.
+
+import sys
+
+import numpy as np
+
+from constants import genset_power
+from signal_store import to_ns, load_signals, ENGINE1_LOAD, ENGINE2_LOAD, ENGINE3_LOAD
+
+SWEEP_DURATIONS = ('1s', '10s', '30s', '1min', '5min', '10min', '30min', '1h')
+
+
+#Epoch ns for one time or an array of times
+def _to_ns_array(t):
+    if np.ndim(t) == 0:
+        return to_ns(t)
+    t = np.asarray(t)
+    if t.dtype.kind in 'iu':
+        return t.astype(np.int64)
+    return np.array([to_ns(x.item() if isinstance(x, np.generic) else x) for x in t.ravel()], dtype=np.int64).reshape(t.shape)
+
+
+class SparseTable:
+
+    #op: 'max' or 'min'; NaN never wins, ties go to the earliest sample
+    def __init__(self, values, op='max'):
+        if op not in ('max', 'min'):
+            raise ValueError(f"op must be 'max' or 'min', got {op!r}")
+        values = np.asarray(values, dtype=np.float64)
+        self.op = op
+        self.values = values
+        self.keys = np.where(np.isnan(values), -np.inf if op == 'max' else np.inf, values)
+        if op == 'min':
+            self.keys = -self.keys
+        n = len(values)
+        dtype = np.int32 if n < 2**31 else np.int64
+        levels = max(1, int(n).bit_length())
+        self.table = np.zeros((levels, n), dtype=dtype)
+        self.table[0] = np.arange(n, dtype=dtype)
+        width = 1
+        for level in range(1, levels):
+            count = n - 2 * width + 1
+            a = self.table[level - 1, :count]
+            b = self.table[level - 1, width:width + count]
+            self.table[level, :count] = np.where(self.keys[a] >= self.keys[b], a, b)
+            width *= 2
+
+    #Position of the max (min) of values[lo:hi] for arrays of ranges; -1 for empty ranges
+    def argquery(self, lo, hi):
+        lo = np.asarray(lo, dtype=np.int64)
+        hi = np.asarray(hi, dtype=np.int64)
+        empty = hi <= lo
+        if len(self.values) == 0:
+            return np.full(empty.shape, -1, dtype=np.int64) if empty.ndim else np.int64(-1)
+        length = np.where(empty, 1, hi - lo)
+        level = np.frexp(length)[1] - 1  #floor(log2(length)), exact for integers
+        lo = np.where(empty, 0, lo)
+        a = self.table[level, lo]
+        b = self.table[level, np.where(empty, 0, hi - (1 << level))]
+        index = np.where(self.keys[a] >= self.keys[b], a, b)
+        return np.where(empty, -1, index)
+
+    def query(self, lo, hi):
+        index = self.argquery(lo, hi)
+        return np.where(index >= 0, self.values[np.maximum(index, 0)], np.nan)
+
+
+class RangeIndex:
+
+    #timestamps: sorted epoch ns, values: float; the max and min tables are built on first use
+    def __init__(self, timestamps, values):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self._tables = {}
+
+    def _table(self, op):
+        table = self._tables.get(op)
+        if table is None:
+            table = self._tables[op] = SparseTable(self.values, op)
+        return table
+
+    #Sample index range [lo, hi) of start <= timestamp <= stop, for scalars or arrays of windows
+    def _bounds(self, start, stop):
+        lo = 0 if start is None else np.searchsorted(self.timestamps, _to_ns_array(start), side='left')
+        hi = len(self.timestamps) if stop is None else np.searchsorted(self.timestamps, _to_ns_array(stop), side='right')
+        return lo, hi
+
+    #Max (min) value and its timestamp [epoch ns] for start <= timestamp <= stop.
+    #start/stop may be arrays of windows; then arrays are returned (NaN and -1 for empty windows).
+    def _extreme(self, op, start, stop):
+        lo, hi = self._bounds(start, stop)
+        index = self._table(op).argquery(lo, hi)
+        found = index >= 0
+        if len(self.values) == 0:  #no readings at all: every window is empty
+            if np.ndim(index) == 0:
+                return np.nan, None
+            return np.full(np.shape(index), np.nan), np.full(np.shape(index), -1, dtype=np.int64)
+        values = np.where(found, self.values[np.maximum(index, 0)], np.nan)
+        timestamps = np.where(found, self.timestamps[np.maximum(index, 0)], -1)
+        if np.ndim(index) == 0:
+            return float(values), (int(timestamps) if found else None)
+        return values, timestamps
+
+    def max(self, start=None, stop=None):
+        return self._extreme('max', start, stop)
+
+    def min(self, start=None, stop=None):
+        return self._extreme('min', start, stop)
+
+    #For each window duration, the highest load held for the whole window: max over all windows
+    #[t_i, t_i + duration] starting at a sample of the minimum inside the window.
+    #Returns a list of dicts with duration, sustained (value) and start/stop [epoch ns] of that window.
+    def sustained_peaks(self, durations=SWEEP_DURATIONS):
+        import pandas as pd
+
+        minimum = self._table('min')
+        lo = np.arange(len(self.values))
+        result = []
+        for duration in durations:
+            length = pd.Timedelta(duration).value
+            hi = np.searchsorted(self.timestamps, self.timestamps + length, side='right')
+            #Only windows that are fully covered by data
+            complete = self.timestamps + length <= self.timestamps[-1] if len(self.timestamps) else lo[:0]
+            held = np.where(complete, minimum.query(lo, hi), np.nan)
+            if np.isnan(held).all():
+                result.append({'duration': duration, 'sustained': np.nan, 'start': None, 'stop': None})
+                continue
+            best = int(np.nanargmax(held))
+            result.append({'duration': duration, 'sustained': held[best], 'start': int(self.timestamps[best]),
+                           'stop': int(self.timestamps[best]) + length})
+        return result
+
+
+#Range indexes for topics of a SignalStore (all topics by default), {topic: RangeIndex}
+def build_range_indexes(store, topics=None):
+    return {topic: RangeIndex(*store.get(topic)) for topic in (store.topics if topics is None else topics)}
+
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    signals = load_signals(sys.argv[1] if len(sys.argv) > 1 else 'data.csv')
+    for name, topic in (('Engine 1', ENGINE1_LOAD), ('Engine 2', ENGINE2_LOAD), ('Engine 3', ENGINE3_LOAD)):
+        index = RangeIndex(*signals.get(topic))
+        peak, at = index.max()
+        print(f'{name}: max load {peak:.2f} kW at {pd.Timestamp(at, tz="UTC")} ({peak / genset_power * 100:.1f} % of {genset_power} kW)')
+        for row in index.sustained_peaks():
+            if row['start'] is not None:
+                print(f"    held for {row['duration']:>6}: {row['sustained']:7.2f} kW from {pd.Timestamp(row['start'], tz='UTC').time()}")
@@ -0,0 +1,152 @@
+#Uniform-grid resampling of topics with gap-aware hold limits
+#
+#Puts selected topics of a SignalStore on a fixed time grid (e.g. 1 s or 10 s) as
+#one dense float matrix, one column per topic. Per topic the value in a grid cell is
+#   'hold'   - last reading at or before the grid time
+#   'linear' - linear interpolation between the readings around the grid time
+#   'mean'   - mean of the readings inside the grid cell
+#A reading is never carried over a gap longer than max_hold: those cells are NaN,
+#so a sensor that stops reporting does not keep burning fuel in the integrations.
+
+import numpy as np
+
+from constants import density, emission_factor
+from signal_store import to_ns
+from tracing import traced
+
+METHODS = ('hold', 'linear', 'mean')
+
+
+#Duration (ns integer, or anything pd.Timedelta accepts, e.g. '10s') to ns
+def to_duration_ns(d):
+    if isinstance(d, (int, np.integer)):
+        return int(d)
+    import pandas as pd
+
+    return pd.Timedelta(d).value
+
+
+#Last reading at or before each grid time, NaN before the first reading and where it is older than max_hold [ns]
+def hold(timestamps, values, grid, max_hold=None):
+    if len(timestamps) == 0:
+        return np.full(len(grid), np.nan)
+    index = np.searchsorted(timestamps, grid, side='right') - 1
+    valid = index >= 0
+    index = np.maximum(index, 0)
+    if max_hold is not None:
+        valid &= grid - timestamps[index] <= max_hold
+    return np.where(valid, values[index], np.nan)
+
+
+#Times the measured fuel is integrated over: union of the engine_load and fuel_consumption readings
+def fuel_times(store, fuel_topics=None):
+    if fuel_topics is None:
+        fuel_topics = [topic for topic in store.topics if 'fuel_consumption' in topic]
+    topics = [topic for topic in store.topics if 'engine_load' in topic] + list(fuel_topics)
+    readings = [store.get(topic)[0] for topic in topics]
+    return np.unique(np.concatenate(readings)) if readings else np.empty(0, dtype=np.int64)
+
+
+#Fuel flow [L/h] and length [ns] of the steps into each of the sorted times: the flow of a step is the
+#sum over the engines of the reading held at its end (missing values keep the previous reading), like
+#the forward filled columns of the scripts. readings are (timestamps, values) per fuel topic.
+#This is the one gap rule of the fuel totals (route_ledger, streaming and grid_fuel_totals): with
+#max_hold [ns] a reading is held for at most max_hold and a step longer than max_hold adds nothing;
+#max_hold=None holds without limit, as the scripts do. previous is the time before times[0] (carried
+#between chunks when streaming), without it the first step is 0.
+def fuel_steps(times, readings, max_hold=None, previous=None):
+    flow = np.zeros(len(times))
+    for timestamps, values in readings:
+        read = ~np.isnan(values)
+        flow += np.nan_to_num(hold(timestamps[read], values[read], times, max_hold))
+    dt = np.diff(times, prepend=times[:1] if previous is None else [previous])
+    if max_hold is not None:
+        dt[dt > max_hold] = 0
+    return flow, dt
+
+
+def _linear(timestamps, values, grid, max_hold):
+    if len(timestamps) < 2:
+        return np.where(grid == timestamps[0], values[0], np.nan)
+    result = np.interp(grid, timestamps, values, left=np.nan, right=np.nan)
+    if max_hold is not None:
+        right = np.clip(np.searchsorted(timestamps, grid, side='left'), 1, len(timestamps) - 1)
+        exact = timestamps[np.minimum(right, len(timestamps) - 1)] == grid
+        gap = timestamps[right] - timestamps[right - 1]
+        result[(gap > max_hold) & ~exact] = np.nan
+    return result
+
+
+def _mean(timestamps, values, grid, step):
+    cell = (timestamps - grid[0]) // step
+    inside = (cell >= 0) & (cell < len(grid))
+    counts = np.bincount(cell[inside], minlength=len(grid))
+    sums = np.bincount(cell[inside], weights=values[inside], minlength=len(grid))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+#Resample topics onto a grid with the given step.
+#how is one method for all topics or a dict {topic: method}; start/stop default to the data range.
+#Returns (grid timestamps in epoch ns, matrix of shape (len(grid), len(topics))).
+@traced('resample', rows_out=lambda result: len(result[0]))
+def resample(store, topics, step='1s', how='hold', max_hold='30s', start=None, stop=None):
+    step = to_duration_ns(step)
+    max_hold = None if max_hold is None else to_duration_ns(max_hold)
+    methods = how if isinstance(how, dict) else {topic: how for topic in topics}
+    for topic in topics:
+        if methods.get(topic, 'hold') not in METHODS:
+            raise ValueError(f'Unknown resampling method for {topic}: {methods[topic]!r}')
+
+    series = [store.get(topic) for topic in topics]
+    if start is None:
+        start = min(int(timestamps[0]) for timestamps, _ in series if len(timestamps))
+    if stop is None:
+        stop = max(int(timestamps[-1]) for timestamps, _ in series if len(timestamps))
+    start, stop = to_ns(start), to_ns(stop)
+    grid = np.arange(start - start % step, stop + 1, step, dtype=np.int64)
+
+    matrix = np.full((len(grid), len(topics)), np.nan)
+    for column, (topic, (timestamps, values)) in enumerate(zip(topics, series)):
+        if len(timestamps) == 0:
+            continue
+        method = methods.get(topic, 'hold')
+        if method == 'hold':
+            matrix[:, column] = hold(timestamps, values, grid, max_hold)
+        elif method == 'linear':
+            matrix[:, column] = _linear(timestamps, values, grid, max_hold)
+        else:
+            matrix[:, column] = _mean(timestamps, values, grid, step)
+    return grid, matrix
+
+
+#Fuel and CO2 totals on a grid with the given step. Each grid cell (t - step, t] gets the flow of the
+#fuel step (fuel_steps over fuel_times) that t falls in, so the totals follow the same gap rule as the
+#fuel ledger and equal it when the readings are on the grid. time_hours is the time spanned by the
+#grid, gap_hours the part of it in steps longer than max_hold.
+def grid_fuel_totals(store, fuel_topics=None, step='1s', max_hold=None, start=None, stop=None):
+    if fuel_topics is None:
+        fuel_topics = [topic for topic in store.topics if 'fuel_consumption' in topic]
+    step = to_duration_ns(step)
+    max_hold = None if max_hold is None else to_duration_ns(max_hold)
+    times = fuel_times(store, fuel_topics)
+    if len(times) == 0:
+        return {'fuel_L': 0.0, 'fuel_kg': 0.0, 'CO2_kg': 0.0, 'time_hours': 0.0, 'gap_hours': 0.0}
+    flow, dt = fuel_steps(times, [store.get(topic) for topic in fuel_topics], max_hold)
+    start, stop = to_ns(times[0] if start is None else start), to_ns(times[-1] if stop is None else stop)
+    grid = np.arange(start - start % step, stop + 1, step, dtype=np.int64)
+
+    index = np.searchsorted(times, grid, side='left')
+    inside = (index > 0) & (index < len(times))  #cells before the first or after the last reading add nothing
+    index = np.minimum(index, len(times) - 1)
+    counted = inside & (dt[index] > 0)
+    step_hours = step / 3.6e12
+    fuel_L = float(flow[index][counted].sum()) * step_hours
+    fuel_kg = fuel_L * density
+    return {
+        'fuel_L': fuel_L,
+        'fuel_kg': fuel_kg,
+        'CO2_kg': fuel_kg * emission_factor,
+        'time_hours': (grid[-1] - grid[0]) / 3.6e12 if len(grid) else 0.0,
+        'gap_hours': float((inside & ~counted).sum()) * step_hours,
+    }
@@ -0,0 +1,187 @@
+#Content addressed on-disk cache for derived arrays and route summaries
+#
+#An entry is stored under a hash of everything its value depends on:
+#   - the fingerprint of the source data file (data_cache.file_fingerprint)
+#   - the name of the computation
+#   - its parameters, physical constants included (density, energy_fuel, eta_* ...)
+#   - the keys of the entries it was computed from
+#so a rerun with the same data and constants reads the result back, and changing one
+#constant only misses for the computations that depend on it (derived.SignalGraph
+#builds its keys this way). Bump RESULT_VERSION when a computation itself changes.
+#
+#Entries are files in .psm_cache/results/ next to the data: .npz for arrays, a tuple or
+#a dict of arrays, .json for everything else (route summaries). They are written to a
+#temporary file (one per process and thread) and renamed, so readers see a whole entry or none.
+#A hit touches the file, and after a write the least recently used entries are removed
+#until the directory is below max_bytes; eviction holds an exclusive lock on a lock
+#file (where fcntl exists) so concurrent processes don't evict at the same time.
+
+import contextlib
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from data_cache import CACHE_DIR_NAME
+
+RESULT_VERSION = 1
+RESULTS_DIR_NAME = 'results'
+DEFAULT_MAX_BYTES = 1 << 30
+
+_TUPLE = '__tuple__'
+_LOCK_NAME = '.lock'
+
+
+def _canonical(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return repr(value)
+
+
+#Key of a result: source fingerprint, computation name, parameters and the keys of its inputs
+def result_key(fingerprint, computation, params=None, inputs=()):
+    text = json.dumps([RESULT_VERSION, fingerprint, computation, params or {}, list(inputs)],
+                      sort_keys=True, default=_canonical)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def _is_arrays(value):
+    if isinstance(value, dict):
+        return bool(value) and all(isinstance(v, np.ndarray) for v in value.values())
+    if isinstance(value, tuple):
+        return all(isinstance(v, np.ndarray) for v in value)
+    return isinstance(value, np.ndarray)
+
+
+class ResultCache:
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, f'{key}.{extension}')
+
+    #Cached value of key, or default when there is none
+    def get(self, key, default=None):
+        for extension in ('npz', 'json'):
+            path = self._path(key, extension)
+            try:
+                if extension == 'npz':
+                    with np.load(path) as stored:
+                        value = {name: stored[name] for name in stored.files}
+                    if _TUPLE in value:
+                        value = tuple(value[f'arr_{i}'] for i in range(int(value[_TUPLE])))
+                    elif list(value) == ['arr_0']:
+                        value = value['arr_0']
+                else:
+                    with open(path) as f:
+                        value = json.load(f)
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError, KeyError):
+                return default  #Corrupt entry, it is rewritten by the next put
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return value
+        return default
+
+    def put(self, key, value):
+        if _is_arrays(value):
+            target = self._path(key, 'npz')
+            if isinstance(value, dict):
+                arrays = value
+            elif isinstance(value, tuple):
+                arrays = dict({f'arr_{i}': v for i, v in enumerate(value)}, **{_TUPLE: np.array(len(value))})
+            else:
+                arrays = {'arr_0': value}
+            tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as f:
+                np.savez(f, **arrays)
+        else:
+            target = self._path(key, 'json')
+            tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(value, f, default=_canonical)
+        os.replace(tmp, target)
+        self.evict()
+        return value
+
+    #Cached value of key, computed with func() and stored when missing
+    def get_or_compute(self, key, func):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.put(key, func())
+        return value
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(('.npz', '.json')):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  #Evicted by another process
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    @contextlib.contextmanager
+    def _lock(self):
+        with open(os.path.join(self.directory, _LOCK_NAME), 'a') as f:
+            try:
+                import fcntl
+            except ImportError:
+                fcntl = None  #No file locks (Windows); eviction still only removes whole files
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    #Remove the least recently used entries until the cache is below max_bytes
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        with self._lock():
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def clear(self):
+        with self._lock():
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+#Result cache next to a data file (.psm_cache/results/)
+def cache_for(path, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    return ResultCache(os.path.join(cache_dir, RESULTS_DIR_NAME), max_bytes)
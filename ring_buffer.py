@@ -0,0 +1,156 @@
+#Fixed-capacity ring buffers per topic for "last N minutes" windows on live data
+#
+#Each topic gets preallocated int64 timestamp and float64 value arrays of a fixed
+#capacity; when full the oldest readings are overwritten. Readings are appended in
+#time order, so a time window is found with a binary search and is at most two
+#contiguous views (before and after the wrap point). The reductions (max, min,
+#mean, integral) work on those views directly, nothing is reallocated.
+
+import numpy as np
+
+from signal_store import SignalStore, to_ns
+
+DEFAULT_CAPACITY = 3600 * 10  #one hour of 10 Hz data
+
+
+class RingBuffer:
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.start = 0  #index of the oldest reading
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, timestamp, value):
+        end = (self.start + self.size) % self.capacity
+        self.timestamps[end] = timestamp
+        self.values[end] = value
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    #Append arrays of readings (timestamps in epoch ns) in at most two slice copies
+    def extend(self, timestamps, values):
+        timestamps = np.asarray(timestamps, dtype=np.int64)[-self.capacity:]
+        values = np.asarray(values, dtype=np.float64)[-self.capacity:]
+        n = len(timestamps)
+        end = (self.start + self.size) % self.capacity
+        first = min(n, self.capacity - end)
+        self.timestamps[end:end + first] = timestamps[:first]
+        self.values[end:end + first] = values[:first]
+        self.timestamps[:n - first] = timestamps[first:]
+        self.values[:n - first] = values[first:]
+        overflow = max(0, self.size + n - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.capacity, self.size + n)
+
+    #The stored readings, oldest first, as one or two (timestamps, values) views
+    def segments(self):
+        end = self.start + self.size
+        if end <= self.capacity:
+            return [(self.timestamps[self.start:end], self.values[self.start:end])]
+        end -= self.capacity
+        return [(self.timestamps[self.start:], self.values[self.start:]),
+                (self.timestamps[:end], self.values[:end])]
+
+    #Views of the readings with start <= timestamp <= stop (None for open ends)
+    def window(self, start=None, stop=None):
+        result = []
+        for timestamps, values in self.segments():
+            lo = 0 if start is None else np.searchsorted(timestamps, to_ns(start), side='left')
+            hi = len(timestamps) if stop is None else np.searchsorted(timestamps, to_ns(stop), side='right')
+            if hi > lo:
+                result.append((timestamps[lo:hi], values[lo:hi]))
+        return result
+
+    #Window covering the last duration (e.g. '10min') up to the newest reading
+    def last(self, duration):
+        import pandas as pd
+
+        if self.size == 0:
+            return []
+        newest = self.timestamps[(self.start + self.size - 1) % self.capacity]
+        return self.window(newest - pd.Timedelta(duration).value, None)
+
+    #Copy of a window as two contiguous arrays
+    def arrays(self, start=None, stop=None):
+        segments = self.window(start, stop)
+        if not segments:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return np.concatenate([t for t, _ in segments]), np.concatenate([v for _, v in segments])
+
+
+def window_max(segments):
+    return max((values.max() for _, values in segments), default=np.nan)
+
+
+def window_min(segments):
+    return min((values.min() for _, values in segments), default=np.nan)
+
+
+def window_mean(segments):
+    count = sum(len(values) for _, values in segments)
+    return sum(values.sum() for _, values in segments) / count if count else np.nan
+
+
+#Trapezoidal integral over time in value * seconds (e.g. kW -> kJ, L/h * s)
+def window_integral(segments):
+    total = 0.0
+    previous = None
+    for timestamps, values in segments:
+        if previous is not None:
+            total += (previous[1] + values[0]) / 2 * (timestamps[0] - previous[0]) / 1e9
+        total += np.sum((values[1:] + values[:-1]) / 2 * np.diff(timestamps)) / 1e9
+        previous = timestamps[-1], values[-1]
+    return total
+
+
+class TopicRingBuffers:
+
+    #capacity: readings kept for each topic, or a dict {topic: capacity} with default_capacity for other topics
+    def __init__(self, capacity=DEFAULT_CAPACITY, default_capacity=DEFAULT_CAPACITY):
+        self.capacities = capacity if isinstance(capacity, dict) else {}
+        self.default_capacity = default_capacity if isinstance(capacity, dict) else capacity
+        self.buffers = {topic: RingBuffer(size) for topic, size in self.capacities.items()}
+
+    def __getitem__(self, topic):
+        return self.buffers[topic]
+
+    def __contains__(self, topic):
+        return topic in self.buffers
+
+    def _buffer(self, topic):
+        buffer = self.buffers.get(topic)
+        if buffer is None:
+            buffer = self.buffers[topic] = RingBuffer(self.default_capacity)
+        return buffer
+
+    def append(self, topic, timestamp, value):
+        self._buffer(topic).append(timestamp, value)
+
+    def extend(self, topic, timestamps, values):
+        self._buffer(topic).extend(timestamps, values)
+
+    def window(self, topic, start=None, stop=None):
+        return self.buffers[topic].window(start, stop)
+
+    def last(self, topic, duration):
+        return self.buffers[topic].last(duration)
+
+    #Copy of the current contents as a SignalStore, for the usual analyses
+    def to_store(self):
+        topics = sorted(self.buffers)
+        timestamps, values, offsets = [], [], [0]
+        for topic in topics:
+            topic_timestamps, topic_values = self.buffers[topic].arrays()
+            timestamps.append(topic_timestamps)
+            values.append(topic_values)
+            offsets.append(offsets[-1] + len(topic_timestamps))
+        if not topics:
+            return SignalStore(np.empty(0, dtype=np.int64), np.empty(0), np.zeros(1, dtype=np.int64), [])
+        return SignalStore(np.concatenate(timestamps), np.concatenate(values), np.array(offsets, dtype=np.int64), topics)
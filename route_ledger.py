@@ -0,0 +1,112 @@
+#Prefix-sum route ledger for per-route fuel, energy and CO2 totals
+#
+#The per-step increments of a voyage are summed once into prefix sums. The total of
+#a route is then the difference of two prefix sums at indices found with a binary
+#search, so N routes cost O(N log n) instead of N slices, copies and cumsums.
+#
+#Routes are read from a semicolon separated file (routes.csv):
+#   route;start;stop
+#   Route 1;2024-09-10 06:30:26;2024-09-10 06:45:30
+#Times without a timezone are taken as UTC.
+
+import csv
+import sys
+
+import numpy as np
+
+from constants import density, emission_factor, energy_fuel, fuel_energy
+from resample import fuel_steps, fuel_times
+from signal_store import load_signals, to_ns
+from tracing import traced
+
+
+#Route table as (names, start ns array, stop ns array)
+def load_routes(path='routes.csv'):
+    names, starts, stops = [], [], []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f, delimiter=';'):
+            names.append(row['route'])
+            starts.append(to_ns(row['start']))
+            stops.append(to_ns(row['stop']))
+    return names, np.array(starts, dtype=np.int64), np.array(stops, dtype=np.int64)
+
+
+class RouteLedger:
+
+    #timestamps: sorted epoch ns; quantities: {name: increment at each timestamp}
+    def __init__(self, timestamps, quantities):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.prefix = {name: np.cumsum(steps) for name, steps in quantities.items()}
+
+    #Totals between start and stop (inclusive) for every route, like cumulative[last] - cumulative[first] in the scripts
+    #that reset the route's cumulative sum at its first reading (Q2_iii.py). first_step=True also counts the step
+    #into the first reading, like the scripts that sum the route's own steps (df_route['Fuel_Consumed'].cumsum(), Q1_iv.py).
+    def totals(self, starts, stops, first_step=False):
+        starts, stops = np.asarray(starts, dtype=np.int64), np.asarray(stops, dtype=np.int64)
+        if len(self.timestamps) == 0:
+            return {name: np.zeros(len(starts)) for name in self.prefix}
+        first = np.searchsorted(self.timestamps, starts, side='left')
+        last = np.searchsorted(self.timestamps, stops, side='right') - 1
+        empty = last < first
+        first = np.minimum(first, len(self.timestamps) - 1)
+        last = np.maximum(last, 0)
+        return {name: np.where(empty, 0.0, prefix[last] - self._base(prefix, first, first_step))
+                for name, prefix in self.prefix.items()}
+
+    #Cumulative sum the totals of routes starting at index first are taken from
+    @staticmethod
+    def _base(prefix, first, first_step):
+        if not first_step:
+            return prefix[first]
+        return np.where(first > 0, prefix[np.maximum(first - 1, 0)], 0.0)
+
+    #Total of one quantity over all readings
+    def total(self, quantity):
+        prefix = self.prefix[quantity]
+        return float(prefix[-1]) if len(prefix) else 0.0
+
+    #(timestamps, cumulative quantity) between start and stop (inclusive, None for open ends), starting at 0
+    #at the first reading, like df_route['cumulative'] -= df_route['cumulative'].iloc[0] in the scripts
+    #(first_step=True: starting at the step into the first reading, as in totals)
+    def cumulative(self, quantity, start=None, stop=None, first_step=False):
+        first = 0 if start is None else np.searchsorted(self.timestamps, to_ns(start), side='left')
+        last = len(self.timestamps) if stop is None else np.searchsorted(self.timestamps, to_ns(stop), side='right')
+        prefix = self.prefix[quantity]
+        if first >= last:
+            return self.timestamps[first:last], prefix[first:last]
+        return self.timestamps[first:last], prefix[first:last] - self._base(prefix, first, first_step)
+
+    def route_totals(self, routes, first_step=False):
+        names, starts, stops = routes
+        totals = self.totals(starts, stops, first_step)
+        return {name: {quantity: float(values[i]) for quantity, values in totals.items()} for i, name in enumerate(names)}
+
+
+#Ledger of the measured fuel (same method as Q2_iii.py: union of engine_load and fuel_consumption
+#timestamps, fuel flow forward filled per engine, flow * time since the previous reading). With
+#max_hold [ns] a fuel reading is held for at most max_hold and steps longer than max_hold add nothing
+#(resample.fuel_steps, the gap rule shared with streaming and grid_fuel_totals); None holds without limit.
+#A store without engine_load and fuel_consumption topics gives an empty ledger (all totals 0).
+@traced('integrate', rows_out=lambda ledger: len(ledger.timestamps))
+def measured_fuel_ledger(store, density=density, energy_fuel=energy_fuel, emission_factor=emission_factor,
+                         max_hold=None):
+    fuel_topics = [topic for topic in store.topics if 'fuel_consumption' in topic]
+    times = fuel_times(store, fuel_topics)
+    flow, dt = fuel_steps(times, [store.get(topic) for topic in fuel_topics], max_hold)
+    fuel_L = flow * (dt / 3.6e12)
+    fuel_kg = fuel_L * density
+    return RouteLedger(times, {
+        'fuel_L': fuel_L,
+        'fuel_kg': fuel_kg,
+        'fuel_energy_kWh': fuel_energy(fuel_kg, energy_fuel),
+        'CO2_kg': fuel_kg * emission_factor,
+    })
+
+
+if __name__ == '__main__':
+    data_path = sys.argv[1] if len(sys.argv) > 1 else 'data.csv'
+    routes_path = sys.argv[2] if len(sys.argv) > 2 else 'routes.csv'
+    ledger = measured_fuel_ledger(load_signals(data_path))
+    for name, totals in ledger.route_totals(load_routes(routes_path)).items():
+        print(f"{name}: {totals['fuel_L']:.2f} L, {totals['fuel_kg']:.2f} kg fuel, "
+              f"{totals['fuel_energy_kWh']:.2f} kWh, {totals['CO2_kg']:.2f} kg CO2")
@@ -0,0 +1,176 @@
+#Automatic voyage segmentation from propulsion power and engine load
+#
+#total_propulsion_power (port + starboard LoadFeedback [%] * 500 kW) and the total engine
+#load of all engines are put on a 1 s grid, smoothed with a moving mean and labelled per sample:
+#   harbour     - smoothed propulsion power below HARBOUR_POWER_KW while the engines carry
+#                 no more than the hotel load (total engine load up to HARBOUR_ENGINE_LOAD_KW)
+#   transit     - steady power above TRANSIT_POWER_KW (moving std below TRANSIT_STD_KW)
+#   manoeuvring - everything else, including low propulsion power with the engines working
+#                 harder than the hotel load (thrusters, holding station)
+#Where there are no engine load readings the propulsion power decides alone.
+#The labels are run-length encoded into segments, segments shorter than MIN_SEGMENT
+#are merged into the one before them, and every stretch between two harbour segments
+#becomes a route. Everything is array operations on the grid; the only Python loop is
+#over segments, not samples.
+#
+#The route table has the same form as route_ledger.load_routes: (names, starts, stops).
+
+import sys
+
+import numpy as np
+
+from constants import BASE_POWER_PORT, BASE_POWER_STARBOARD
+from resample import resample, to_duration_ns
+from signal_store import PORT_LOAD_FEEDBACK, STBD_LOAD_FEEDBACK, load_signals
+
+HARBOUR = 0
+MANOEUVRING = 1
+TRANSIT = 2
+STATES = ('harbour', 'manoeuvring', 'transit')
+
+HARBOUR_POWER_KW = 20
+HARBOUR_ENGINE_LOAD_KW = 150  #hotel load of the vessel alongside, all engines together
+TRANSIT_POWER_KW = 150
+TRANSIT_STD_KW = 40
+SMOOTHING = '30s'
+MIN_SEGMENT = '60s'
+
+
+#Moving mean and std over a centred window of n samples (NaN samples are left out)
+def _moving_stats(values, n):
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    csum = np.concatenate([[0.0], np.cumsum(filled)])
+    csq = np.concatenate([[0.0], np.cumsum(filled * filled)])
+    ccount = np.concatenate([[0], np.cumsum(valid)])
+    lo = np.clip(np.arange(len(values)) - n // 2, 0, len(values))
+    hi = np.clip(lo + n, 0, len(values))
+    count = ccount[hi] - ccount[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (csum[hi] - csum[lo]) / count
+        var = (csq[hi] - csq[lo]) / count - mean * mean
+    return mean, np.sqrt(np.maximum(var, 0.0))
+
+
+#Total propulsion power [kW] and total engine load [kW] on a uniform grid
+def power_grid(store, step='1s', max_hold='30s'):
+    load_topics = [topic for topic in store.topics if 'engine_load' in topic]
+    grid, matrix = resample(store, [PORT_LOAD_FEEDBACK, STBD_LOAD_FEEDBACK] + load_topics, step, 'hold', max_hold)
+    propulsion = matrix[:, 0] / 100 * BASE_POWER_PORT + matrix[:, 1] / 100 * BASE_POWER_STARBOARD
+    engine_load = np.full(len(grid), np.nan)
+    if load_topics:
+        loads = matrix[:, 2:]
+        engine_load = np.where(np.isnan(loads).all(axis=1), np.nan, np.nansum(loads, axis=1))
+    return grid, propulsion, engine_load
+
+
+#State label per grid sample from the smoothed propulsion power and total engine load (NaN where unknown)
+def classify(propulsion, engine_load, step_ns, smoothing=SMOOTHING, harbour_engine_load=HARBOUR_ENGINE_LOAD_KW):
+    n = max(1, to_duration_ns(smoothing) // step_ns)
+    mean, std = _moving_stats(propulsion, n)
+    load = _moving_stats(engine_load, n)[0]
+    labels = np.full(len(propulsion), MANOEUVRING, dtype=np.int8)
+    labels[(mean < HARBOUR_POWER_KW) & ~(load > harbour_engine_load)] = HARBOUR
+    labels[(mean >= TRANSIT_POWER_KW) & (std < TRANSIT_STD_KW)] = TRANSIT
+    #Gaps in the data continue the previous state
+    gap = np.isnan(mean)
+    if gap.any():
+        index = np.where(~gap, np.arange(len(labels)), 0)
+        np.maximum.accumulate(index, out=index)
+        labels = labels[index]
+    return labels
+
+
+#Run-length encoding: (start index, stop index exclusive, label) arrays
+def run_lengths(labels):
+    if len(labels) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), labels[:0]
+    starts = np.concatenate([[0], np.flatnonzero(labels[1:] != labels[:-1]) + 1])
+    stops = np.concatenate([starts[1:], [len(labels)]])
+    return starts, stops, labels[starts]
+
+
+#Relabel runs shorter than min_samples with the label of the run before them. A short run after
+#other short runs ends up in the same run as they do, so every short run takes the label of the
+#last run before it that is kept (long enough, or the first run) - one pass over the runs.
+def _merge_short(labels, min_samples):
+    starts, stops, states = run_lengths(labels)
+    kept = stops - starts >= min_samples
+    kept[:1] = True
+    source = np.where(kept, np.arange(len(states)), 0)
+    np.maximum.accumulate(source, out=source)
+    return np.repeat(states[source], stops - starts)
+
+
+#Segments as a list of dicts with state, start/stop [epoch ns], duration [s] and mean power/load [kW]
+def segment(store, step='1s', max_hold='30s', smoothing=SMOOTHING, min_segment=MIN_SEGMENT,
+            harbour_engine_load=HARBOUR_ENGINE_LOAD_KW):
+    step_ns = to_duration_ns(step)
+    grid, propulsion, engine_load = power_grid(store, step, max_hold)
+    labels = classify(propulsion, engine_load, step_ns, smoothing, harbour_engine_load)
+    labels = _merge_short(labels, max(1, to_duration_ns(min_segment) // step_ns))
+    starts, stops, states = run_lengths(labels)
+
+    csum = np.concatenate([[0.0], np.cumsum(np.nan_to_num(propulsion))])
+    csum_load = np.concatenate([[0.0], np.cumsum(np.nan_to_num(engine_load))])
+    segments = []
+    for start, stop, state in zip(starts, stops, states):
+        segments.append({
+            'state': STATES[state],
+            'start': int(grid[start]),
+            'stop': int(grid[stop - 1]),
+            'duration_s': (stop - start) * step_ns / 1e9,
+            'mean_propulsion_power': (csum[stop] - csum[start]) / (stop - start),
+            'mean_engine_load': (csum_load[stop] - csum_load[start]) / (stop - start),
+        })
+    return segments
+
+
+#Route table (names, starts, stops) with one route per stretch between two harbour segments
+def routes_from_segments(segments, prefix='Route'):
+    names, starts, stops = [], [], []
+    route_start = None
+    for i, seg in enumerate(segments):
+        if seg['state'] != 'harbour':
+            if route_start is None:
+                route_start = seg['start']
+            route_stop = seg['stop']
+            if i + 1 < len(segments):
+                route_stop = segments[i + 1]['start']
+        elif route_start is not None:
+            names.append(f'{prefix} {len(names) + 1}')
+            starts.append(route_start)
+            stops.append(route_stop)
+            route_start = None
+    if route_start is not None:
+        names.append(f'{prefix} {len(names) + 1}')
+        starts.append(route_start)
+        stops.append(route_stop)
+    return names, np.array(starts, dtype=np.int64), np.array(stops, dtype=np.int64)
+
+
+#Write a route table in the routes.csv format
+def write_routes(path, routes):
+    import pandas as pd
+
+    names, starts, stops = routes
+    with open(path, 'w') as f:
+        f.write('route;start;stop\n')
+        for name, start, stop in zip(names, starts, stops):
+            f.write(f"{name};{pd.Timestamp(int(start), tz='UTC').strftime('%Y-%m-%d %H:%M:%S')};"
+                    f"{pd.Timestamp(int(stop), tz='UTC').strftime('%Y-%m-%d %H:%M:%S')}\n")
+
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    data_path = sys.argv[1] if len(sys.argv) > 1 else 'data.csv'
+    segments = segment(load_signals(data_path))
+    for seg in segments:
+        print(f"{seg['state']:<12} {pd.Timestamp(seg['start'], tz='UTC').time()} - {pd.Timestamp(seg['stop'], tz='UTC').time()} "
+              f"{seg['duration_s']:>7.0f} s  {seg['mean_propulsion_power']:6.1f} kW propulsion  {seg['mean_engine_load']:6.1f} kW engine load")
+    routes = routes_from_segments(segments)
+    if len(sys.argv) > 2:
+        write_routes(sys.argv[2], routes)
+    for name, start, stop in zip(*routes):
+        print(f"{name}: {pd.Timestamp(int(start), tz='UTC')} - {pd.Timestamp(int(stop), tz='UTC')}")
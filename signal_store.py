@@ -0,0 +1,181 @@
+#Per-topic signal store
+#
+#The long format table (timestamp;var;value) is grouped by topic once: the rows
+#are ordered by topic code and time, and offsets[code]:offsets[code + 1] marks
+#the rows of each topic. Looking up a topic is then a dictionary lookup and two
+#array views, instead of a boolean scan of the whole 'var' column per topic.
+#
+#A store can be saved as a directory of .npy files and opened again memory-mapped.
+#Time windows are found with a binary search in the topic's sorted timestamps and
+#returned as views, so slicing a route only touches the pages of that route.
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from data_cache import CACHE_DIR_NAME, file_fingerprint, load_columns
+from timestamps import parse_timestamp
+from tracing import traced
+
+#MQTT topics used in the analyses
+ENGINE1_LOAD = 'gunnerus/RVG_mqtt/Engine1/engine_load'
+ENGINE2_LOAD = 'gunnerus/RVG_mqtt/Engine2/engine_load'
+ENGINE3_LOAD = 'gunnerus/RVG_mqtt/Engine3/engine_load'
+ENGINE1_SPEED = 'gunnerus/RVG_mqtt/Engine1/engine_speed'
+ENGINE1_FUEL = 'gunnerus/RVG_mqtt/Engine1/fuel_consumption'
+ENGINE3_FUEL = 'gunnerus/RVG_mqtt/Engine3/fuel_consumption'
+PORT_LOAD_FEEDBACK = 'gunnerus/RVG_mqtt/hcx_port_mp/LoadFeedback'
+STBD_LOAD_FEEDBACK = 'gunnerus/RVG_mqtt/hcx_stbd_mp/LoadFeedback'
+
+
+class SignalStore:
+
+    def __init__(self, timestamps, values, offsets, topics):
+        self.timestamps = timestamps  #int64 epoch ns, grouped by topic and sorted by time within a topic
+        self.values = values
+        self.offsets = offsets  #len(topics) + 1 row offsets
+        self.topics = [str(topic) for topic in topics]
+        self._index = {topic: code for code, topic in enumerate(self.topics)}
+
+    #Group the columnar arrays from data_cache by topic code (stable, so equal timestamps keep file order)
+    @classmethod
+    @traced('topic_split', rows_in=lambda args: len(args[1]), rows_out=lambda store: len(store.values))
+    def from_columns(cls, timestamps, values, codes, topics):
+        order = np.lexsort((timestamps, codes))
+        counts = np.bincount(codes, minlength=len(topics))
+        offsets = np.zeros(len(topics) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(timestamps[order], values[order], offsets, topics)
+
+    #Build the store from a long format DataFrame with timestamp, var and value columns
+    @classmethod
+    def from_frame(cls, df):
+        import pandas as pd
+
+        var = df['var'].astype('category')
+        timestamps = pd.DatetimeIndex(df['timestamp']).as_unit('ns').asi8
+        return cls.from_columns(timestamps, df['value'].to_numpy(dtype=np.float64),
+                                var.cat.codes.to_numpy().astype(np.int32), var.cat.categories)
+
+    def __contains__(self, topic):
+        return topic in self._index
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def _bounds(self, topic):
+        try:
+            code = self._index[topic]
+        except KeyError:
+            raise KeyError(f'Topic not found in data: {topic}') from None
+        return self.offsets[code], self.offsets[code + 1]
+
+    #Contiguous (timestamps, values) arrays of one topic, returned as views
+    def get(self, topic):
+        lo, hi = self._bounds(topic)
+        return self.timestamps[lo:hi], self.values[lo:hi]
+
+    #(timestamps, values) views of one topic with start <= timestamp <= stop, found by binary search
+    def window(self, topic, start=None, stop=None):
+        lo, hi = self._bounds(topic)
+        timestamps = self.timestamps[lo:hi]
+        first = 0 if start is None else np.searchsorted(timestamps, to_ns(start), side='left')
+        last = len(timestamps) if stop is None else np.searchsorted(timestamps, to_ns(stop), side='right')
+        return timestamps[first:last], self.values[lo + first:lo + last]
+
+    #One topic as a DataFrame with 'timestamp' (UTC) and a value column, like df[df['var'] == topic][['timestamp', 'value']]
+    @traced('filter', rows_out=len)
+    def frame(self, topic, name='value', start=None, stop=None):
+        import pandas as pd
+
+        timestamps, values = self.window(topic, start, stop)
+        return pd.DataFrame({'timestamp': pd.to_datetime(timestamps, unit='ns', utc=True), name: values})
+
+    #First and last timestamp over all topics (only reads the ends of each topic), (None, None) without readings
+    def time_range(self):
+        import pandas as pd
+
+        starts, stops = self.offsets[:-1], self.offsets[1:]
+        present = stops > starts
+        if not present.any():
+            return None, None
+        first = self.timestamps[starts[present]].min()
+        last = self.timestamps[stops[present] - 1].max()
+        return pd.Timestamp(int(first), tz='UTC'), pd.Timestamp(int(last), tz='UTC')
+
+    #Write the store as .npy files that can be opened memory-mapped with open_store.
+    #The files are written to a temporary directory that is renamed into place, so
+    #processes saving the same store at the same time never leave a mix of both.
+    def save(self, directory):
+        directory = os.path.abspath(directory)
+        tmp = f'{directory}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        np.save(os.path.join(tmp, 'timestamps.npy'), np.ascontiguousarray(self.timestamps, dtype=np.int64))
+        np.save(os.path.join(tmp, 'values.npy'), np.ascontiguousarray(self.values, dtype=np.float64))
+        np.save(os.path.join(tmp, 'offsets.npy'), np.asarray(self.offsets, dtype=np.int64))
+        with open(os.path.join(tmp, 'topics.json'), 'w') as f:
+            json.dump(self.topics, f)
+        try:
+            os.replace(tmp, directory)
+        except OSError:
+            #directory exists: move it aside and put the new store in its place
+            #(open memory maps of the old files stay valid until they are closed)
+            old = f'{directory}.{os.getpid()}.old'
+            shutil.rmtree(old, ignore_errors=True)
+            try:
+                os.replace(directory, old)
+            except FileNotFoundError:
+                pass  #Moved aside by another process saving it as well
+            os.replace(tmp, directory)
+            shutil.rmtree(old, ignore_errors=True)
+
+
+#Timestamp (or anything pd.Timestamp accepts, naive values are taken as UTC) to epoch ns
+def to_ns(t):
+    if isinstance(t, (int, np.integer)):
+        return int(t)
+    if isinstance(t, str):
+        ns = parse_timestamp(t)  #e.g. routes.csv, without importing pandas
+        if ns is not None:
+            return ns
+    import pandas as pd
+
+    t = pd.Timestamp(t)
+    if t.tz is None:
+        t = t.tz_localize('UTC')
+    return t.value
+
+
+#Open a saved store with the arrays memory-mapped read only
+def open_store(directory):
+    with open(os.path.join(directory, 'topics.json')) as f:
+        topics = json.load(f)
+    timestamps = np.load(os.path.join(directory, 'timestamps.npy'), mmap_mode='r')
+    values = np.load(os.path.join(directory, 'values.npy'), mmap_mode='r')
+    offsets = np.load(os.path.join(directory, 'offsets.npy'))
+    return SignalStore(timestamps, values, offsets, topics)
+
+
+#Load data.csv (through the binary cache) straight into a SignalStore
+def load_signals(path='data.csv', cache_dir=None):
+    return SignalStore.from_columns(*load_columns(path, cache_dir))
+
+
+#Memory-mapped store for data.csv, built next to the columnar cache the first time (and when data.csv changes)
+def open_signals(path='data.csv', cache_dir=None):
+    path = os.path.abspath(path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(path), CACHE_DIR_NAME)
+    directory = os.path.join(cache_dir, f'{os.path.basename(path)}.{file_fingerprint(path)}.store')
+    if not os.path.exists(os.path.join(directory, 'topics.json')):
+        load_signals(path, cache_dir).save(directory)
+        #Remove stores built from older versions of the same file
+        prefix = os.path.basename(path) + '.'
+        for name in os.listdir(cache_dir):
+            full = os.path.join(cache_dir, name)
+            if name.startswith(prefix) and name.endswith('.store') and full != directory:
+                shutil.rmtree(full, ignore_errors=True)
+    return open_store(directory)
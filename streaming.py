@@ -0,0 +1,141 @@
+#Bounded-memory fuel and CO2 totals for long logs
+#
+#Same method as Avg_fuel_consumption.py, Q2_iii.py and Task03_part2_measurement_used_method.py
+#(union of engine_load/fuel_consumption timestamps, forward filled fuel flow per engine,
+#flow * time since previous reading, with the gap rule of resample.fuel_steps), but
+#data.csv is read in chunks. Only the last fuel reading per engine and the last timestamp
+#are carried between chunks, so the memory use depends on the chunk size and not on the
+#size of the file.
+#
+#The file must be ordered by time (rows with equal timestamps may be in any order).
+
+import sys
+
+import numpy as np
+
+from constants import density, emission_factor
+from resample import fuel_steps
+from signal_store import to_ns
+from timestamps import parse_timestamps
+from tracing import traced
+
+CHUNK_ROWS = 1_000_000
+
+#Same route intervals as the analysis scripts (UTC)
+route1_start = '2024-09-10 06:30:26'
+route1_stop = '2024-09-10 06:45:30'
+route2_start = '2024-09-10 06:45:30'
+route2_stop = '2024-09-10 07:07:00'
+
+ROUTES = {'Route 1': (route1_start, route1_stop), 'Route 2': (route2_start, route2_stop)}
+
+
+class _Totals:
+
+    def __init__(self, routes, max_hold=None):
+        self.max_hold = max_hold
+        self.engines = {}  #fuel topic -> (timestamp, value) of its last reading [L/h]
+        self.last_ns = None
+        self.fuel_L = 0.0
+        self.time_hours = 0.0
+        self.routes = {name: [to_ns(start), to_ns(stop), False, 0.0]
+                       for name, (start, stop) in (routes or {}).items()}
+
+    def add(self, timestamps, var, value):
+        times = np.unique(timestamps)
+        if self.last_ns is not None and times[0] <= self.last_ns:
+            raise ValueError('data.csv must be sorted by timestamp for streaming')
+
+        #Fuel readings per engine, after the last reading of the previous chunks (resample.fuel_steps holds them)
+        is_fuel = (np.char.find(var.astype(str), 'fuel_consumption') >= 0) & ~np.isnan(value)
+        for topic in np.unique(var[is_fuel]):
+            self.engines.setdefault(topic, None)
+        readings = []
+        for topic, last in self.engines.items():
+            rows = np.flatnonzero(is_fuel & (var == topic))
+            rows = rows[np.argsort(timestamps[rows], kind='stable')]
+            engine_times, engine_values = timestamps[rows], value[rows]
+            if last is not None:
+                engine_times = np.concatenate([[last[0]], engine_times])
+                engine_values = np.concatenate([[last[1]], engine_values])
+            if len(engine_times):
+                self.engines[topic] = engine_times[-1], engine_values[-1]
+            readings.append((engine_times, engine_values))
+
+        flow, dt = fuel_steps(times, readings, self.max_hold, self.last_ns)
+        step_L = flow * (dt / 3.6e12)
+        self.fuel_L += step_L.sum()
+        self.time_hours += (times[-1] - (times[0] if self.last_ns is None else self.last_ns)) / 3.6e12
+        self.last_ns = times[-1]
+
+        #Route totals: the step into the first reading of a route is not counted, like the route resets in the scripts
+        for route in self.routes.values():
+            start, stop, started, _ = route
+            inside = (times >= start) & (times <= stop)
+            if not inside.any():
+                continue
+            if not started:
+                inside[np.argmax(inside)] = False
+                route[2] = True
+            route[3] += step_L[inside].sum()
+
+
+#Stream data.csv in chunks and return fuel and CO2 totals for the file (and for each route in routes);
+#max_hold [ns] as in resample.fuel_steps
+@traced('integrate')
+def stream_fuel_totals(path='data.csv', routes=None, chunk_rows=CHUNK_ROWS, max_hold=None):
+    import pandas as pd
+
+    totals = _Totals(routes, max_hold)
+    held = None
+    reader = pd.read_csv(path, sep=';', chunksize=chunk_rows)
+    for chunk in reader:
+        chunk = chunk[chunk['var'].str.contains('engine_load|fuel_consumption')]
+        timestamps = parse_timestamps(chunk['timestamp'])
+        var = chunk['var'].to_numpy(dtype=object)
+        value = chunk['value'].to_numpy(dtype=np.float64)
+        if held is not None:
+            timestamps = np.concatenate([held[0], timestamps])
+            var = np.concatenate([held[1], var])
+            value = np.concatenate([held[2], value])
+        if len(timestamps) == 0:
+            continue
+
+        #Hold back the rows of the last timestamp, the next chunk may have more readings at that time
+        last = timestamps == timestamps.max()
+        held = timestamps[last], var[last], value[last]
+        if (~last).any():
+            totals.add(timestamps[~last], var[~last], value[~last])
+    if held is not None:
+        totals.add(*held)
+
+    fuel_kg = float(totals.fuel_L) * density
+    result = {
+        'fuel_L': float(totals.fuel_L),
+        'fuel_kg': fuel_kg,
+        'CO2_kg': fuel_kg * emission_factor,
+        'time_hours': float(totals.time_hours),
+        'routes': {},
+    }
+    for name, (_, _, _, route_L) in totals.routes.items():
+        route_L = float(route_L)
+        result['routes'][name] = {
+            'fuel_L': route_L,
+            'fuel_kg': route_L * density,
+            'CO2_kg': route_L * density * emission_factor,
+        }
+    return result
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else 'data.csv'
+    totals = stream_fuel_totals(path, routes=ROUTES)
+
+    print(f"Total fuel consumed (kg): {totals['fuel_kg']:.2f} kg")
+    print(f"Total fuel consumed (L): {totals['fuel_L']:.2f} L")
+    print(f"Total time (hours): {totals['time_hours']:.2f} hours")
+    print(f"Average fuel consumption (kg/hour): {totals['fuel_kg'] / totals['time_hours']:.2f} kg/hour")
+    print(f"Average fuel consumption (L/hour): {totals['fuel_L'] / totals['time_hours']:.2f} L/hour")
+    print(f"Total CO2 emissions for the entire interval: {totals['CO2_kg']:.2f} kg")
+    for name, route in totals['routes'].items():
+        print(f"{name}: {route['fuel_L']:.2f} L, {route['fuel_kg']:.2f} kg fuel, {route['CO2_kg']:.2f} kg CO2")
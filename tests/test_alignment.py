@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from alignment import align_topics, asof_align
+from signal_store import SignalStore
+
+MS = 1_000_000
+
+
+def _store():
+    port = np.arange(0, 10_000, 1000) * MS
+    stbd = port + 400 * MS  #Starboard reported 400 ms after Port
+    return SignalStore.from_columns(np.concatenate([port, stbd]), np.concatenate([np.arange(10.0), np.arange(10.0) + 100]),
+                                    np.repeat(np.array([0, 1], dtype=np.int32), 10), ['port', 'stbd'])
+
+
+#A window on the reference topic still matches readings just outside it
+def test_window_matches_like_whole_series():
+    store = _store()
+    full = align_topics(store, {'port': 'port', 'stbd': 'stbd'}, tolerance=500 * MS)
+    window = align_topics(store, {'port': 'port', 'stbd': 'stbd'}, tolerance=500 * MS, start=3000 * MS, stop=5200 * MS)
+    assert window['port'].tolist() == [3.0, 4.0, 5.0]
+    assert window['stbd'].tolist() == [103.0, 104.0, 105.0]
+    assert window.equals(full.iloc[3:6].reset_index(drop=True))
+
+
+#Same matches as pd.merge_asof for every direction, with and without a tolerance (ties and repeated times included)
+@pytest.mark.parametrize('direction', ['backward', 'forward', 'nearest'])
+@pytest.mark.parametrize('tolerance', [None, 300 * MS])
+def test_asof_align_matches_merge_asof(direction, tolerance):
+    rng = np.random.default_rng(0)
+    reference = np.sort(rng.integers(0, 100, 400)) * 10 * MS
+    other = np.sort(rng.integers(0, 100, 150)) * 10 * MS
+    values = rng.normal(size=len(other))
+    timestamps, matrix = asof_align([(reference, np.arange(len(reference), dtype=np.float64)), (other, values)],
+                                    tolerance, direction, how='left')
+    expected = pd.merge_asof(pd.DataFrame({'t': reference}), pd.DataFrame({'t': other, 'value': values}),
+                             on='t', direction=direction, tolerance=tolerance)
+    assert np.array_equal(timestamps, reference)
+    assert np.array_equal(matrix[:, 1], expected['value'].to_numpy(), equal_nan=True)
+
+    inner_timestamps, inner = asof_align([(reference, np.zeros(len(reference))), (other, values)], tolerance, direction)
+    assert np.array_equal(inner_timestamps, reference[expected['value'].notna().to_numpy()])
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from batch_runner import analyse_voyage, find_voyage_files, main
+
+HEADER = 'timestamp;var;value\n'
+LOAD = 'gunnerus/RVG_mqtt/Engine1/engine_load'
+
+
+def test_voyage_without_fuel_and_propulsion_topics(tmp_path):
+    path = tmp_path / 'voyage.csv'
+    path.write_text(HEADER + f'2024-09-10 06:20:00+00:00;{LOAD};100.0\n2024-09-10 07:20:00+00:00;{LOAD};250.0\n')
+    row = analyse_voyage(str(path), use_cache=False)
+    assert row['duration_h'] == pytest.approx(1.0)
+    assert row['fuel_L'] == 0.0 and row['CO2_kg'] == 0.0
+    assert np.isnan(row['mean_total_efficiency']) and np.isnan(row['max_propulsion_power'])
+    assert row['max_engine1_load'] == 250.0 and np.isnan(row['max_engine2_load'])
+
+
+def test_voyage_without_readings(tmp_path):
+    path = tmp_path / 'voyage.csv'
+    path.write_text(HEADER)
+    row = analyse_voyage(str(path), use_cache=False)
+    assert row['start'] is None and np.isnan(row['duration_h'])
+    assert row['readings'] == 0 and row['fuel_kg'] == 0.0
+
+
+def test_summary_is_not_a_voyage(tmp_path, capsys):
+    for name in ('a.csv', 'b.csv'):
+        (tmp_path / name).write_text(HEADER + f'2024-09-10 06:20:00+00:00;{LOAD};100.0\n')
+    out = str(tmp_path / 'summary.csv')
+    assert main([str(tmp_path), '--out', out, '--workers', '1', '--no-cache']) == 0
+    assert main([str(tmp_path), '--out', out, '--workers', '1', '--no-cache']) == 0
+    assert '2 voyages (0 failed)' in capsys.readouterr().out
+    assert find_voyage_files([str(tmp_path)], exclude=[out]) == [str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')]
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pytest
+
+import data_cache
+from data_cache import CACHE_DIR_NAME, load_columns
+
+HEADER = 'timestamp;var;value\n'
+ROWS = [
+    '2024-09-10 06:20:00+00:00;gunnerus/RVG_mqtt/Engine1/engine_load;100.0',
+    '2024-09-10 06:20:01+00:00;gunnerus/RVG_mqtt/Engine1/fuel_consumption;36.0',
+]
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    calls = []
+    parse = data_cache._parse_csv
+
+    def counting(path):
+        calls.append(path)
+        return parse(path)
+
+    monkeypatch.setattr(data_cache, '_parse_csv', counting)
+    return calls
+
+
+def _write(path, rows, mtime_ns=None):
+    path.write_text(HEADER + '\n'.join(rows) + '\n')
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _cache_files(tmp_path):
+    return sorted(os.listdir(tmp_path / CACHE_DIR_NAME))
+
+
+def test_parsed_once_then_read_from_cache(tmp_path, parses):
+    path = tmp_path / 'data.csv'
+    _write(path, ROWS)
+    first = load_columns(str(path))
+    second = load_columns(str(path))
+    assert len(parses) == 1
+    for a, b in zip(first, second):
+        assert np.array_equal(a, b)
+    assert len(_cache_files(tmp_path)) == 1
+
+
+#An edit of the same size and modification time is still seen (hash of the first block)
+@pytest.mark.parametrize('same_stat', [False, True])
+def test_changed_file_rebuilds_cache(tmp_path, parses, same_stat):
+    path = tmp_path / 'data.csv'
+    _write(path, ROWS, 1_700_000_000 * 10**9)
+    load_columns(str(path))
+    stale = _cache_files(tmp_path)
+
+    edited = [ROWS[0].replace('100.0', '200.0' if same_stat else '250.5'), ROWS[1]]
+    _write(path, edited, 1_700_000_000 * 10**9 if same_stat else 1_700_000_100 * 10**9)
+    timestamps, values, codes, topics = load_columns(str(path))
+    assert len(parses) == 2
+    assert values.tolist() == [200.0 if same_stat else 250.5, 36.0]
+    assert len(_cache_files(tmp_path)) == 1 and _cache_files(tmp_path) != stale  #the old cache is removed
+
+
+def test_corrupt_cache_is_rebuilt(tmp_path, parses):
+    path = tmp_path / 'data.csv'
+    _write(path, ROWS)
+    load_columns(str(path))
+    with open(data_cache.cache_path(str(path)), 'wb') as f:
+        f.write(b'not an npz file')
+    assert load_columns(str(path))[1].tolist() == [100.0, 36.0]
+    assert len(parses) == 2
+
+
+def test_no_cache_writes_nothing(tmp_path, parses):
+    path = tmp_path / 'data.csv'
+    _write(path, ROWS)
+    assert load_columns(str(path), use_cache=False)[1].tolist() == [100.0, 36.0]
+    assert not (tmp_path / CACHE_DIR_NAME).exists()
@@ -0,0 +1,69 @@
+import contextlib
+
+import numpy as np
+import pytest
+
+import derived
+from derived import RAW, SignalGraph
+from result_cache import ResultCache
+from signal_store import SignalStore
+
+S = 1_000_000_000
+
+
+def _store():
+    topics = [RAW[name] for name in ('port_load_feedback', 'stbd_load_feedback', 'engine1_fuel', 'engine3_fuel')]
+    timestamps = np.tile(np.arange(4) * S, len(topics))
+    values = np.concatenate([[10.0, 20.0, 30.0, 40.0], [20.0, 20.0, 20.0, 20.0],
+                             [100.0, 110.0, 120.0, 130.0], [50.0, 50.0, 50.0, 50.0]])
+    codes = np.repeat(np.arange(len(topics), dtype=np.int32), 4)
+    return SignalStore.from_columns(timestamps, values, codes, topics)
+
+
+@pytest.fixture
+def derivations(monkeypatch):
+    names = []
+
+    @contextlib.contextmanager
+    def stage(_, node):
+        names.append(node)
+        yield
+
+    monkeypatch.setattr(derived, 'stage', stage)
+    return names
+
+
+def test_nodes_are_computed_once(derivations):
+    graph = SignalGraph(_store())
+    timestamps, power = graph.get('total_propulsion_power')
+    assert power.tolist() == [150.0, 200.0, 250.0, 300.0]
+    graph.get('port_motor_power')
+    assert derivations == ['load_feedback', 'port_motor_power', 'stbd_motor_power', 'total_propulsion_power']
+
+
+def test_constant_changes_only_downstream_keys():
+    store = _store()
+    graph = SignalGraph(store, 'data')
+    changed = SignalGraph(store, 'data', constants={'density': 0.9})
+    for name in ('port_motor_power', 'total_propulsion_power', 'engine1_fuel'):
+        assert graph.key(name) == changed.key(name)
+    for name in ('engine1_fuel_kg_per_h', 'engine1_fuel_power', 'total_fuel_power', 'power_efficiency'):
+        assert graph.key(name) != changed.key(name)
+
+
+def test_constant_change_recomputes_only_downstream(tmp_path, derivations):
+    store = _store()
+    cache = ResultCache(str(tmp_path))
+    SignalGraph(store, 'data', cache).get('power_efficiency')
+    derivations.clear()
+    SignalGraph(store, 'data', cache).get('power_efficiency')
+    assert derivations == []
+    _, efficiency = SignalGraph(store, 'data', cache, constants={'density': 0.9}).get('power_efficiency')
+    assert sorted(derivations) == sorted(['engine1_fuel_kg_per_h', 'engine1_fuel_power', 'engine3_fuel_kg_per_h',
+                                          'engine3_fuel_power', 'total_fuel_power', 'power_efficiency'])
+    assert np.isfinite(efficiency).all()
+
+
+def test_unknown_signal():
+    with pytest.raises(KeyError):
+        SignalGraph(_store()).get('no_such_node')
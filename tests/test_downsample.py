@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from downsample import downsample, lttb_indices, minmax_indices
+
+
+def _series(n=100_003):
+    rng = np.random.default_rng(0)
+    y = np.cumsum(rng.normal(size=n))
+    y[31_337] += 500.0  #single-sample spike
+    y[77_777] -= 500.0  #and dip
+    return y
+
+
+#Every bucket's min and max are kept, so the drawn envelope is that of all samples
+def test_minmax_keeps_every_bucket_extreme():
+    y = _series()
+    y[1000:1500] = np.nan
+    index = minmax_indices(y, 500)
+    assert np.all(np.diff(index) > 0) and index[0] == 0 and index[-1] == len(y) - 1
+    assert len(index) <= 2 * 500 + 2
+    size = -(-len(y) // 500)
+    for start in range(0, len(y), size):
+        bucket = y[start:start + size]
+        if np.isnan(bucket).all():
+            assert start in index  #the gap is still drawn
+            continue
+        kept = y[index[(index >= start) & (index < start + size)]]
+        assert np.nanmax(kept) == np.nanmax(bucket) and np.nanmin(kept) == np.nanmin(bucket)
+
+
+def test_lttb_keeps_spikes_and_ends():
+    y = _series()
+    x = np.arange(len(y)).astype('datetime64[s]')
+    index = lttb_indices(x, y, 1000)
+    assert len(index) == 1000 and np.all(np.diff(index) > 0)
+    assert index[0] == 0 and index[-1] == len(y) - 1
+    assert np.argmax(y) in index and np.argmin(y) in index
+
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_downsample(method):
+    y = _series()
+    x = np.arange(len(y)) * 0.5
+    xs, ys = downsample(x, y, 2000, method)
+    assert len(ys) <= 2002 and ys.max() == y.max() and ys.min() == y.min()
+    assert np.array_equal(ys, y[(xs * 2).astype(np.int64)])
+    short_x, short_y = downsample(x[:100], y[:100], 2000, method)
+    assert np.array_equal(short_y, y[:100])
+    with pytest.raises(ValueError):
+        downsample(x, y, 2000, 'mean')
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from integrator import FuelIntegrator
+
+
+def _readings():
+    rng = np.random.default_rng(0)
+    readings = [(engine, t, rng.uniform(20, 60)) for t in range(0, 600, 2) for engine in ('Engine1', 'Engine3')]
+    return [reading for reading in readings if not 200 <= reading[1] < 300]  #a 100 s gap
+
+
+def _feed(integrator, readings):
+    for i, (engine, timestamp, value) in enumerate(readings):
+        if i == 100:
+            integrator.start_route('Route 1')
+        integrator.update(engine, timestamp, value)
+
+
+#A process saved to disk halfway and restarted from the file ends with the totals of one that ran throughout
+@pytest.mark.parametrize('max_gap_s', [None, 30])
+def test_snapshot_restore_round_trip(tmp_path, max_gap_s):
+    readings = _readings()
+    whole = FuelIntegrator(max_gap_s=max_gap_s)
+    _feed(whole, readings)
+
+    first = FuelIntegrator(max_gap_s=max_gap_s)
+    _feed(first, readings[:150])
+    path = str(tmp_path / 'integrator.json')
+    first.save(path)
+    second = FuelIntegrator.load(path)
+    assert second.snapshot() == first.snapshot()
+    for engine, timestamp, value in readings[150:]:
+        second.update(engine, timestamp, value)
+
+    assert second.voyage_totals() == whole.voyage_totals()
+    assert second.route_totals() == whole.route_totals()
+    assert second.end_route() == whole.end_route()
+
+
+def test_trapezoids_and_gap():
+    integrator = FuelIntegrator(max_gap_s=60)
+    integrator.update('Engine1', 0, 36.0)
+    assert integrator.update('Engine1', 10, 72.0) == pytest.approx(0.15)  #(36 + 72) / 2 L/h for 10 s
+    assert integrator.update('Engine1', 5, 100.0) == 0.0  #late reading
+    assert integrator.update('Engine1', 100, 36.0) == 0.0  #gap longer than max_gap_s
+    assert integrator.voyage_totals()['fuel_L'] == pytest.approx(0.15)
+
+
+def test_restore_rejects_other_version():
+    snapshot = FuelIntegrator().snapshot()
+    snapshot['version'] += 1
+    with pytest.raises(ValueError):
+        FuelIntegrator.restore(snapshot)
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from mqtt_ingest import LocalBroker, TelemetryIngestor, parse_payload, topic_matches
+from signal_store import ENGINE1_FUEL, PORT_LOAD_FEEDBACK
+
+
+def test_topic_matches():
+    assert topic_matches('gunnerus/RVG_mqtt/#', ENGINE1_FUEL)
+    assert topic_matches('gunnerus/+/Engine1/fuel_consumption', ENGINE1_FUEL)
+    assert not topic_matches('gunnerus/RVG_mqtt/+', ENGINE1_FUEL)
+
+
+@pytest.mark.parametrize('payload', [b'not a number', '{"timestamp": 1}', '[1, 2]', '{"value": null}', b'\xff'])
+def test_parse_payload_rejects(payload):
+    with pytest.raises((ValueError, KeyError, TypeError)):
+        parse_payload(payload, 0.0)
+
+
+def test_bad_message_in_stream_is_skipped():
+    #A queue smaller than the stream: if the consumer stopped at the bad message, publish would wait forever
+    async def stream():
+        broker = LocalBroker()
+        ingestor = TelemetryIngestor(batch_size=4)
+        consumer = asyncio.create_task(ingestor.run(broker.subscribe(maxsize=5)))
+        for i in range(50):
+            payload = b'garbage' if i == 25 else f'{{"timestamp": {1725949200 + i}, "value": {10 + i}}}'
+            await broker.publish(PORT_LOAD_FEEDBACK if i % 2 else ENGINE1_FUEL, payload)
+        await broker.close()
+        await consumer
+        return ingestor
+
+    ingestor = asyncio.run(asyncio.wait_for(stream(), timeout=10))
+    assert ingestor.messages == 49
+    assert ingestor.rejected == 1
+    assert ingestor.metrics()['rejected'] == 1
+    assert len(ingestor.to_store()) == 49
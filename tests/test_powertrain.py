@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from powertrain import CHAIN_COLUMNS, efficiency_chain, eta_engine
+
+#Constants as in Q1_iii.py
+eta_propulsion_motor = 0.97
+eta_switchboard = 0.99
+eta_VSD = 0.97
+eta_generator = 0.96
+genset_power = 450
+gensets_total_power = 900
+
+
+#The chain step by step, as Q1_iii.py builds it column by column
+def _baseline(port, stbd, percent=True):
+    def eta(x):
+        return -0.0024*x**2 + 0.402*x + 27.4382
+
+    columns = {}
+    for side, power, rated in (('Port', port, genset_power), ('Stbd', stbd, genset_power),
+                               ('Total', port + stbd, gensets_total_power)):
+        columns[f'VSD_{side}_Power'] = power / eta_propulsion_motor
+        columns[f'SW_{side}_Power'] = columns[f'VSD_{side}_Power'] / eta_VSD
+        columns[f'Generator_{side}_Power'] = columns[f'SW_{side}_Power'] / eta_switchboard
+        columns[f'Engine_{side}_Power'] = columns[f'Generator_{side}_Power'] / eta_generator
+        columns[f'Engine_{side}_Rated_Power'] = columns[f'Engine_{side}_Power'] / rated * 100
+        columns[f'Engine_{side}_Efficiency'] = eta(columns[f'Engine_{side}_Rated_Power']) / 100
+        columns[f'Power_{side}_Efficiency'] = (columns[f'Engine_{side}_Efficiency'] * eta_generator * eta_propulsion_motor
+                                               * eta_switchboard * eta_VSD * (100 if percent else 1))
+    return columns
+
+
+def _powers():
+    rng = np.random.default_rng(0)
+    return rng.uniform(0, 500, 1000), rng.uniform(0, 500, 1000)
+
+
+@pytest.mark.parametrize('percent', [True, False])
+def test_chain_matches_step_by_step(percent):
+    port, stbd = _powers()
+    result = efficiency_chain(port, stbd, percent=percent)
+    expected = _baseline(port, stbd, percent)
+    assert list(result) == list(CHAIN_COLUMNS) and set(result) == set(expected)
+    for name in CHAIN_COLUMNS:
+        np.testing.assert_allclose(result[name], expected[name], rtol=1e-12, err_msg=name)
+
+
+def test_requested_columns_and_etas():
+    port, stbd = _powers()
+    result = efficiency_chain(port, stbd, port + stbd, columns=['Power_Total_Efficiency'])
+    assert list(result) == ['Power_Total_Efficiency']
+    better = efficiency_chain(port, stbd, columns=['Generator_Port_Power'], etas={'eta_VSD': 0.98})
+    np.testing.assert_allclose(better['Generator_Port_Power'], port / eta_propulsion_motor / 0.98 / eta_switchboard)
+    with pytest.raises(KeyError):
+        efficiency_chain(port, stbd, columns=['No_Such_Column'])
+
+
+def test_eta_engine_scalar_and_array():
+    assert eta_engine(50) == pytest.approx(-0.0024 * 50**2 + 0.402 * 50 + 27.4382)
+    assert eta_engine(np.array([0.0, 100.0])).tolist() == pytest.approx([27.4382, 43.6382])
@@ -0,0 +1,62 @@
+import pytest
+
+import psm
+
+ROWS = [
+    '2024-09-10 06:20:00+00:00;gunnerus/RVG_mqtt/Engine1/engine_load;100.0',
+    '2024-09-10 06:20:01+00:00;gunnerus/RVG_mqtt/Engine1/engine_load;150.0',
+    '2024-09-10 06:20:01+00:00;gunnerus/RVG_mqtt/Engine1/fuel_consumption;36.0',
+    '2024-09-10 06:20:02+00:00;gunnerus/RVG_mqtt/Engine1/fuel_consumption;36.0',
+]
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('timestamp;var;value\n' + '\n'.join(ROWS) + '\n')
+    return str(path)
+
+
+#Engine 2 and 3 have no load topic in this log: no reading instead of an error
+def test_max_load_without_engine_topics(log, capsys):
+    psm.main(['max-load', '--data', log, '--routes', 'missing.csv', '--no-plots', '--no-cache'])
+    out = capsys.readouterr().out
+    assert 'Engine 1 max load 150.00 kW at 06:20:01' in out
+    assert 'Engine 2' not in out
+
+
+def test_all_analyses_in_one_process(tmp_path, capsys):
+    import json
+
+    from benchmark import generate
+
+    data = str(tmp_path / 'data.csv')
+    generate(data, 20000)
+    routes = tmp_path / 'routes.csv'
+    routes.write_text('route;start;stop\nRoute 1;2024-09-10 06:21:00;2024-09-10 06:25:00\n')
+    out = str(tmp_path / 'out')
+    psm.main(['all', '--data', data, '--routes', str(routes), '--out', out, '--no-plots', '--no-cache'])
+    with open(f'{out}/report.json') as f:
+        report = json.load(f)
+    assert list(report) == list(psm.ANALYSES)
+    assert list(report['fuel']) == ['Full trip', 'Route 1']
+    assert not (tmp_path / '.psm_cache').exists()  #neither the result nor the signal store cache
+
+
+#Missing values are written as null, report.json is strict JSON
+def test_report_without_nan(log, tmp_path):
+    import json
+
+    out = str(tmp_path / 'out')
+    psm.main(['max-load', '--data', log, '--routes', 'missing.csv', '--out', out, '--no-plots', '--no-cache'])
+    with open(f'{out}/report.json') as f:
+        text = f.read()
+    assert 'NaN' not in text
+    report = json.loads(text)
+    assert report['max-load']['Full trip']['Engine 2'] == {'max_kW': None, 'at': None}
+    assert report['max-load']['Full trip']['Engine 1']['max_kW'] == 150.0
+
+
+def test_unknown_analysis():
+    with pytest.raises(SystemExit):
+        psm.main(['no-such-analysis', '--no-plots'])
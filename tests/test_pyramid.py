@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from pyramid import Pyramid
+
+S = 1_000_000_000
+
+
+def _raw_stats(timestamps, values, start, stop):
+    inside = (timestamps >= start) & (timestamps <= stop)
+    t, v = timestamps[inside], values[inside]
+    return {'min': np.nanmin(v), 'max': np.nanmax(v), 'sum': v.sum(), 'count': len(v),
+            'integral': np.sum((v[1:] + v[:-1]) / 2 * np.diff(t) / 1e9)}
+
+
+#Half a day of 0.25 s samples, queried over windows that start and stop inside buckets of every level
+@pytest.mark.parametrize('seed', [0, 1])
+def test_stats_match_raw_scan(seed):
+    rng = np.random.default_rng(seed)
+    timestamps = np.cumsum(rng.integers(S // 8, S // 2, 200_000)).astype(np.int64)
+    values = rng.normal(100, 20, len(timestamps))
+    pyramid = Pyramid(timestamps, values)
+    for start, stop in rng.integers(timestamps[0], timestamps[-1], (20, 2)):
+        start, stop = sorted((int(start), int(stop)))
+        expected = _raw_stats(timestamps, values, start, stop)
+        result = pyramid.stats(start, stop)
+        assert result['min'] == expected['min'] and result['max'] == expected['max']
+        assert result['count'] == expected['count']
+        assert result['sum'] == pytest.approx(expected['sum'])
+        assert result['integral'] == pytest.approx(expected['integral'])
+
+
+#NaN samples are skipped by min/max in the raw edges and the buckets alike
+def test_min_max_skip_nan():
+    timestamps = np.arange(7200) * S // 2
+    values = np.linspace(0, 1, len(timestamps))
+    values[::7] = np.nan
+    values[3000:3600] = np.nan  #five whole 1 min buckets
+    pyramid = Pyramid(timestamps, values)
+    for start, stop in [(0, timestamps[-1]), (3 * S, 2000 * S), (1499 * S, 1800 * S)]:
+        result = pyramid.stats(start, stop)
+        expected = _raw_stats(timestamps, values, start, stop)
+        assert result['min'] == expected['min'] and result['max'] == expected['max']
+    assert np.isnan(pyramid.stats(1500 * S, 1799 * S)['min'])
+    buckets = pyramid.buckets('1min')
+    assert np.isnan(buckets['min'][25]) and not np.isnan(buckets['min'][[24, 30]]).any()
+
+
+def test_empty_interval():
+    pyramid = Pyramid(np.arange(10) * S, np.arange(10.0))
+    result = pyramid.stats(20 * S, 30 * S)
+    assert np.isnan(result['min']) and np.isnan(result['max']) and result['count'] == 0
@@ -0,0 +1,38 @@
+import numpy as np
+
+from range_index import RangeIndex, SparseTable
+
+S = 1_000_000_000
+
+
+def test_max_min_and_time():
+    values = np.array([3.0, 7.0, np.nan, 7.0, 1.0, 5.0])
+    index = RangeIndex(np.arange(6) * S, values)
+    assert index.max() == (7.0, 1 * S)  #ties go to the earliest sample, NaN never wins
+    assert index.min(2 * S, 5 * S) == (1.0, 4 * S)
+    peaks, at = index.max(np.array([0, 2, 4]) * S, np.array([0, 3, 5]) * S)
+    assert peaks.tolist() == [3.0, 7.0, 5.0] and (at // S).tolist() == [0, 3, 5]
+
+
+def test_query_matches_brute_force():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=200)
+    table = SparseTable(values, 'min')
+    lo = rng.integers(0, 200, 500)
+    hi = lo + rng.integers(1, 50, 500)
+    hi = np.minimum(hi, 200)
+    assert np.array_equal(table.query(lo, hi), [values[a:b].min() for a, b in zip(lo, hi)])
+
+
+def test_empty_window():
+    index = RangeIndex(np.arange(3) * S, np.ones(3))
+    assert np.isnan(index.max(10 * S, 20 * S)[0]) and index.max(10 * S, 20 * S)[1] is None
+
+
+def test_empty_series():
+    index = RangeIndex(np.empty(0, dtype=np.int64), np.empty(0))
+    peak, at = index.max()
+    assert np.isnan(peak) and at is None
+    peaks, at = index.min(np.array([0, 5]), np.array([1, 6]))
+    assert np.isnan(peaks).all() and at.tolist() == [-1, -1]
+    assert all(row['start'] is None for row in index.sustained_peaks(('1s', '1min')))
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from resample import grid_fuel_totals, resample
+from route_ledger import measured_fuel_ledger
+from signal_store import load_signals, SignalStore
+from streaming import stream_fuel_totals
+
+S = 1_000_000_000
+FUEL = 'gunnerus/RVG_mqtt/Engine1/fuel_consumption'
+FUEL3 = 'gunnerus/RVG_mqtt/Engine3/fuel_consumption'
+LOAD = 'gunnerus/RVG_mqtt/Engine1/engine_load'
+
+
+#36 L/h fuel and a load reading every second for 60 s, then nothing for 10 minutes, then 60 s more
+def _store_with_gap():
+    seconds = np.concatenate([np.arange(60), np.arange(660, 720)])
+    timestamps = np.concatenate([seconds, seconds]) * S
+    values = np.concatenate([np.full(len(seconds), 36.0), np.full(len(seconds), 50.0)])
+    codes = np.repeat(np.array([0, 1], dtype=np.int32), len(seconds))
+    return SignalStore.from_columns(timestamps, values, codes, [FUEL, LOAD])
+
+
+def test_hold_stops_at_max_hold():
+    grid, matrix = resample(_store_with_gap(), [FUEL], step=10 * S, max_hold=30 * S)
+    held = dict(zip(grid // S, matrix[:, 0]))
+    assert held[80] == 36.0
+    assert np.isnan(held[100]) and np.isnan(held[650])
+    assert held[660] == 36.0
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        resample(_store_with_gap(), [FUEL], step=S, how='cubic')
+
+
+def test_grid_fuel_totals_skip_gap():
+    totals = grid_fuel_totals(_store_with_gap(), [FUEL], step=S, max_hold=30 * S)
+    assert totals['time_hours'] == pytest.approx(719 / 3600)
+    #59 one-second steps before and after the gap; the 601 s step across it adds nothing
+    assert totals['fuel_L'] == pytest.approx(36.0 * 118 / 3600)
+    assert totals['gap_hours'] == pytest.approx(601 / 3600)
+
+
+def test_ledger_does_not_count_gap():
+    bounded = measured_fuel_ledger(_store_with_gap(), max_hold=30 * S)
+    assert bounded.total('fuel_L') == pytest.approx(36.0 * 118 / 3600)
+    ledger = measured_fuel_ledger(_store_with_gap())
+    assert ledger.total('fuel_L') == pytest.approx(36.0 * 719 / 3600)
+
+
+#Engine 1 fuel every second, Engine 3 fuel every 2 s, both changing, and nothing for 10 minutes in between
+def _write_log_with_gap(path):
+    rng = np.random.default_rng(2)
+    lines = ['timestamp;var;value']
+    for second in list(range(60)) + list(range(660, 720)):
+        time = f'1970-01-01 00:{second // 60:02d}:{second % 60:02d}+00:00'
+        lines.append(f'{time};{LOAD};{rng.uniform(100, 400)}')
+        lines.append(f'{time};{FUEL};{rng.uniform(20, 90)}')
+        if second % 2 == 0:
+            lines.append(f'{time};{FUEL3};{rng.uniform(20, 90)}')
+    path.write_text('\n'.join(lines) + '\n')
+
+
+@pytest.mark.parametrize('max_hold', [None, 30 * S])
+def test_fuel_totals_share_the_gap_rule(tmp_path, max_hold):
+    path = tmp_path / 'data.csv'
+    _write_log_with_gap(path)
+    ledger = measured_fuel_ledger(load_signals(str(path)), max_hold=max_hold)
+    streamed = stream_fuel_totals(str(path), chunk_rows=50, max_hold=max_hold)
+    grid = grid_fuel_totals(load_signals(str(path)), step=S, max_hold=max_hold)
+    assert streamed['fuel_L'] == pytest.approx(ledger.total('fuel_L'))
+    assert grid['fuel_L'] == pytest.approx(ledger.total('fuel_L'))
+    assert streamed['time_hours'] == pytest.approx(grid['time_hours'])
@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from result_cache import ResultCache, result_key
+
+
+def test_key_changes_with_every_input():
+    key = result_key('fp', 'fuel', {'density': 0.85}, ['a'])
+    assert key == result_key('fp', 'fuel', {'density': 0.85}, ['a'])
+    assert key != result_key('fp2', 'fuel', {'density': 0.85}, ['a'])
+    assert key != result_key('fp', 'fuel', {'density': 0.84}, ['a'])
+    assert key != result_key('fp', 'fuel', {'density': 0.85}, ['b'])
+    assert result_key(None, 'x', {'etas': np.array([0.9, 0.95])}) != result_key(None, 'x', {'etas': np.array([0.9, 0.96])})
+
+
+@pytest.mark.parametrize('value', [np.arange(3.0), (np.arange(2), np.ones(2)), {'fuel': np.zeros(2)}])
+def test_arrays_round_trip(tmp_path, value):
+    cache = ResultCache(str(tmp_path))
+    cache.put('k', value)
+    stored = cache.get('k')
+    assert type(stored) is type(value)
+    if isinstance(value, dict):
+        assert np.array_equal(stored['fuel'], value['fuel'])
+    else:
+        assert all(np.array_equal(a, b) for a, b in zip(np.atleast_2d(stored), np.atleast_2d(value)))
+
+
+def test_summary_round_trip_and_miss(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    assert cache.get('k', 'none') == 'none'
+    assert cache.get_or_compute('k', lambda: {'Route 1': {'fuel_L': 1.5}}) == {'Route 1': {'fuel_L': 1.5}}
+    assert cache.get_or_compute('k', lambda: 1 / 0) == {'Route 1': {'fuel_L': 1.5}}
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    for extension in ('npz', 'json'):
+        (tmp_path / f'{extension}.{extension}').write_text('{not')
+        assert cache.get(extension) is None
+    assert cache.get_or_compute('json', lambda: [1]) == [1]
+    assert cache.get('json') == [1]
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=3 * 1064)  #Three entries of 100 floats
+    for i, key in enumerate(('a', 'b', 'c')):
+        cache.put(key, np.zeros(100))
+        os.utime(cache._path(key, 'npz'), ns=(i * 10**9, i * 10**9))
+    cache.get('a')  #Touched, so b is the oldest
+    cache.put('d', np.zeros(100))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('d') is not None
+    assert cache.size() <= 3 * 1064
+
+
+def _write(directory, n):
+    cache = ResultCache(directory)
+    for _ in range(n):
+        cache.put('shared', np.arange(10000.0))
+        assert np.array_equal(cache.get('shared'), np.arange(10000.0))
+
+
+def test_concurrent_writers_of_one_key(tmp_path):
+    directory = str(tmp_path)
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(_write, [directory] * 4, [20] * 4))
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=_write, args=(directory, 20)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert [process.exitcode for process in processes] == [0] * 4
+    assert sorted(os.listdir(directory)) == ['shared.npz']
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from ring_buffer import RingBuffer, TopicRingBuffers, window_integral, window_max, window_mean, window_min
+
+S = 1_000_000_000
+
+
+#Readings appended one by one and in chunks of any size (larger than the capacity too) wrap around
+#and keep exactly the newest capacity readings, oldest first
+@pytest.mark.parametrize('chunk', [1, 3, 7, 20])
+def test_wrap_keeps_newest_readings(chunk):
+    timestamps = np.arange(53) * S
+    values = np.sin(np.arange(53.0))
+    buffer = RingBuffer(capacity=7)
+    for i in range(0, len(timestamps), chunk):
+        if chunk == 1:
+            buffer.append(timestamps[i], values[i])
+        else:
+            buffer.extend(timestamps[i:i + chunk], values[i:i + chunk])
+        seen = min(i + chunk, len(timestamps))
+        kept_timestamps, kept_values = buffer.arrays()
+        assert np.array_equal(kept_timestamps, timestamps[max(0, seen - 7):seen])
+        assert np.array_equal(kept_values, values[max(0, seen - 7):seen])
+    assert len(buffer) == 7
+
+
+#Reductions over a window across the wrap point equal those of the same readings in one array
+def test_window_across_wrap():
+    buffer = RingBuffer(capacity=10)
+    buffer.extend(np.arange(6) * S, np.arange(6.0) ** 2)
+    buffer.extend(np.arange(6, 14) * S, np.arange(6.0, 14.0) ** 2)
+    assert len(buffer.segments()) == 2
+    segments = buffer.window(5 * S, 12 * S)
+    t, v = np.arange(5, 13) * S, np.arange(5.0, 13.0) ** 2
+    assert window_max(segments) == v.max() and window_min(segments) == v.min()
+    assert window_mean(segments) == pytest.approx(v.mean())
+    assert window_integral(segments) == pytest.approx(np.sum((v[1:] + v[:-1]) / 2 * np.diff(t) / 1e9))
+    assert np.array_equal(np.concatenate([t for t, _ in buffer.last('3s')]), np.arange(10, 14) * S)
+
+
+def test_to_store():
+    buffers = TopicRingBuffers({'a': 3}, default_capacity=5)
+    buffers.extend('a', np.arange(6) * S, np.arange(6.0))
+    buffers.extend('b', np.arange(2) * S, np.ones(2))
+    store = buffers.to_store()
+    assert store.topics == ['a', 'b']
+    assert store.get('a')[1].tolist() == [3.0, 4.0, 5.0] and len(store.get('b')[0]) == 2
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from route_ledger import load_routes, measured_fuel_ledger, RouteLedger
+from signal_store import SignalStore
+
+S = 1_000_000_000
+
+
+def _ledger():
+    return RouteLedger(np.arange(10) * S, {'fuel_kg': np.ones(10)})
+
+
+def test_totals_are_prefix_differences():
+    totals = _ledger().totals(np.array([2, 5, 20]) * S, np.array([4, 5, 30]) * S)
+    assert totals['fuel_kg'].tolist() == [2.0, 0.0, 0.0]
+
+
+def test_cumulative_starts_at_zero():
+    timestamps, cumulative = _ledger().cumulative('fuel_kg', 3 * S, 6 * S)
+    assert (timestamps // S).tolist() == [3, 4, 5, 6]
+    assert cumulative.tolist() == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_load_routes(tmp_path):
+    path = tmp_path / 'routes.csv'
+    path.write_text('route;start;stop\nRoute 1;1970-01-01 00:00:02;1970-01-01 00:00:04+00:00\n')
+    names, starts, stops = load_routes(str(path))
+    assert names == ['Route 1'] and starts.tolist() == [2 * S] and stops.tolist() == [4 * S]
+    assert _ledger().route_totals((names, starts, stops)) == {'Route 1': {'fuel_kg': 2.0}}
+
+
+def test_ledger_of_store_without_fuel_topics():
+    store = SignalStore.from_columns(np.array([1, 2]), np.array([1.0, 2.0]), np.zeros(2, dtype=np.int32),
+                                     ['gunnerus/RVG_mqtt/hcx_port_mp/LoadFeedback'])
+    ledger = measured_fuel_ledger(store)
+    assert len(ledger.timestamps) == 0
+    assert ledger.total('CO2_kg') == 0.0
+    assert ledger.route_totals((['Route 1'], np.array([0]), np.array([5]))) == {
+        'Route 1': {'fuel_L': 0.0, 'fuel_kg': 0.0, 'fuel_energy_kWh': 0.0, 'CO2_kg': 0.0}}
+    assert len(ledger.cumulative('fuel_L', 0, 5)[1]) == 0
+
+
+def test_ledger_matches_forward_filled_sum():
+    fuel, load = 'gunnerus/RVG_mqtt/Engine1/fuel_consumption', 'gunnerus/RVG_mqtt/Engine1/engine_load'
+    timestamps = np.array([0, 2, 1, 3]) * S
+    store = SignalStore.from_columns(timestamps, np.array([36.0, 72.0, 50.0, 50.0]), np.array([0, 0, 1, 1], dtype=np.int32),
+                                     [fuel, load])
+    ledger = measured_fuel_ledger(store)
+    #36 L/h held over 1 s and 1 s, then 72 L/h over 1 s and 1 s
+    assert ledger.total('fuel_L') == pytest.approx((36 + 72 + 72) / 3600)
+
+
+#Q1_iv.py sums the route's own steps: df_route['Fuel_Consumed'].cumsum()
+def test_first_step_matches_route_cumsum():
+    steps = np.arange(1.0, 11.0)
+    ledger = RouteLedger(np.arange(10) * S, {'fuel_kg': steps})
+    starts, stops = np.array([0, 3, 20]) * S, np.array([4, 6, 30]) * S
+    totals = ledger.totals(starts, stops, first_step=True)['fuel_kg']
+    assert totals.tolist() == [steps[0:5].sum(), steps[3:7].sum(), 0.0]
+    timestamps, cumulative = ledger.cumulative('fuel_kg', 3 * S, 6 * S, first_step=True)
+    assert cumulative.tolist() == np.cumsum(steps[3:7]).tolist()
+    assert ledger.route_totals((['Route 1'], starts[:1], stops[:1]), first_step=True) == {'Route 1': {'fuel_kg': 15.0}}
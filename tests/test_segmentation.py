@@ -0,0 +1,66 @@
+import numpy as np
+
+from segmentation import classify, routes_from_segments, run_lengths, segment, HARBOUR, MANOEUVRING, TRANSIT
+from signal_store import ENGINE1_LOAD, PORT_LOAD_FEEDBACK, STBD_LOAD_FEEDBACK, SignalStore
+
+S = 1_000_000_000
+
+
+def test_low_power_is_harbour_only_at_hotel_load():
+    propulsion = np.full(300, 5.0)
+    assert (classify(propulsion, np.full(300, 60.0), S) == HARBOUR).all()
+    assert (classify(propulsion, np.full(300, 400.0), S) == MANOEUVRING).all()
+    #No engine load readings: the propulsion power decides alone
+    assert (classify(propulsion, np.full(300, np.nan), S) == HARBOUR).all()
+
+
+def test_steady_high_power_is_transit():
+    assert (classify(np.full(300, 500.0), np.full(300, 600.0), S) == TRANSIT).all()
+
+
+def test_run_lengths():
+    starts, stops, states = run_lengths(np.array([0, 0, 2, 2, 2, 0], dtype=np.int8))
+    assert starts.tolist() == [0, 2, 5] and stops.tolist() == [2, 5, 6] and states.tolist() == [0, 2, 0]
+    assert len(run_lengths(np.empty(0, dtype=np.int8))[0]) == 0
+
+
+#300 s alongside, 600 s at 60 % on both motors, 300 s alongside
+def _voyage_store():
+    seconds = np.arange(1200)
+    feedback = np.where((seconds >= 300) & (seconds < 900), 60.0, 1.0)
+    engine_load = feedback / 100 * 1000 / 0.87 + 60
+    timestamps = np.tile(seconds * S, 3)
+    values = np.concatenate([feedback, feedback, engine_load])
+    codes = np.repeat(np.arange(3, dtype=np.int32), len(seconds))
+    return SignalStore.from_columns(timestamps, values, codes, [PORT_LOAD_FEEDBACK, STBD_LOAD_FEEDBACK, ENGINE1_LOAD])
+
+
+def test_segment_to_route_table():
+    segments = segment(_voyage_store())
+    assert [seg['state'] for seg in segments] == ['harbour', 'transit', 'harbour']
+    names, starts, stops = routes_from_segments(segments)
+    assert names == ['Route 1']
+    assert abs(starts[0] - 300 * S) <= 30 * S and abs(stops[0] - 900 * S) <= 30 * S
+
+
+#Merging every short run in one pass gives the labels of merging them one group at a time
+def test_merge_short_matches_repeated_merges():
+    from segmentation import _merge_short
+
+    def repeated(labels, min_samples):
+        while True:
+            starts, stops, states = run_lengths(labels)
+            short = np.flatnonzero((stops - starts < min_samples)[1:]) + 1
+            if len(short) == 0:
+                return labels
+            short = short[np.concatenate([[True], np.diff(short) > 1])]
+            labels = labels.copy()
+            for i in short:
+                labels[starts[i]:stops[i]] = states[i - 1]
+
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        labels = np.repeat(rng.integers(0, 3, 40).astype(np.int8), rng.integers(1, 8, 40))
+        for min_samples in (1, 3, 6):
+            assert np.array_equal(_merge_short(labels, min_samples), repeated(labels, min_samples))
+    assert len(_merge_short(np.empty(0, dtype=np.int8), 5)) == 0
@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+
+from signal_store import SignalStore, open_store
+
+TOPICS = ['a', 'b']
+
+
+def _store(timestamps=(3, 1, 2), values=(30.0, 10.0, 20.0), codes=(0, 0, 1)):
+    return SignalStore.from_columns(np.array(timestamps, dtype=np.int64), np.array(values),
+                                    np.array(codes, dtype=np.int32), TOPICS)
+
+
+def test_window_is_binary_search_view():
+    store = _store()
+    timestamps, values = store.window('a', 2, 3)
+    assert timestamps.tolist() == [3] and values.tolist() == [30.0]
+    assert np.shares_memory(values, store.values)
+
+
+def test_time_range_without_readings():
+    store = _store((), (), ())
+    assert store.time_range() == (None, None)
+
+
+def test_save_replaces_existing_store(tmp_path):
+    directory = str(tmp_path / 'data.store')
+    _store().save(directory)
+    _store((5,), (50.0,), (1,)).save(directory)
+    store = open_store(directory)
+    assert store.get('b')[1].tolist() == [50.0]
+    assert len(store.get('a')[0]) == 0
+    assert os.listdir(tmp_path) == ['data.store']
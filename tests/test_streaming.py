@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from route_ledger import measured_fuel_ledger
+from signal_store import load_signals
+from streaming import stream_fuel_totals
+
+START = pd.Timestamp('2024-09-10 06:20:00', tz='UTC')
+ROUTES = {'Route 1': ('2024-09-10 06:20:30', '2024-09-10 06:28:00'), 'Route 2': ('2024-09-10 06:28:00', '2024-09-10 06:40:00')}
+
+
+#Engine 1 fuel and load every second, Engine 3 fuel every 3 s (with a missing value) and a
+#propulsion topic that is not used; nothing at all between 06:22 and 06:27
+def _write_log(path):
+    rng = np.random.default_rng(1)
+    rows = []
+    for second in list(range(0, 120)) + list(range(420, 1200)):
+        time = START + pd.Timedelta(seconds=second)
+        rows.append((time, 'gunnerus/RVG_mqtt/Engine1/engine_load', rng.uniform(100, 400)))
+        rows.append((time, 'gunnerus/RVG_mqtt/Engine1/fuel_consumption', rng.uniform(20, 90)))
+        rows.append((time, 'gunnerus/RVG_mqtt/hcx_port_mp/LoadFeedback', rng.uniform(0, 50)))
+        if second % 3 == 0:
+            rows.append((time + pd.Timedelta('500ms'), 'gunnerus/RVG_mqtt/Engine3/fuel_consumption',
+                         np.nan if second == 600 else rng.uniform(20, 90)))
+    frame = pd.DataFrame(rows, columns=['timestamp', 'var', 'value'])
+    frame['timestamp'] = frame['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S.%f+00:00')
+    frame.to_csv(path, sep=';', index=False)
+
+
+#Totals the way Avg_fuel_consumption.py and Q2_iii.py compute them in memory
+def _script_totals(path):
+    data = pd.read_csv(path, sep=';')
+    data['timestamp'] = pd.to_datetime(data['timestamp'])
+    engine_load_data = data[data['var'].str.contains('engine_load')].pivot(index='timestamp', columns='var', values='value')
+    fuel_data = data[data['var'].str.contains('fuel_consumption')].pivot(index='timestamp', columns='var', values='value')
+    merged_data = engine_load_data.join(fuel_data, how='outer').sort_index().ffill()
+    time_diff_hours = merged_data.index.to_series().diff().dt.total_seconds().fillna(0) / 3600
+    step_L = merged_data.filter(like='fuel_consumption').sum(axis=1) * time_diff_hours
+    cumulative = step_L.cumsum()
+    routes = {}
+    for name, (start, stop) in ROUTES.items():
+        route = cumulative[(cumulative.index >= pd.Timestamp(start, tz='UTC')) & (cumulative.index <= pd.Timestamp(stop, tz='UTC'))]
+        routes[name] = route.iloc[-1] - route.iloc[0]
+    return cumulative.iloc[-1], time_diff_hours.sum(), routes
+
+
+@pytest.fixture(scope='module')
+def log(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('log') / 'data.csv')
+    _write_log(path)
+    return path
+
+
+@pytest.mark.parametrize('chunk_rows', [5, 64, 1_000_000])
+def test_streaming_matches_scripts(log, chunk_rows):
+    fuel_L, time_hours, routes = _script_totals(log)
+    totals = stream_fuel_totals(log, routes=ROUTES, chunk_rows=chunk_rows)
+    assert totals['fuel_L'] == pytest.approx(fuel_L)
+    assert totals['time_hours'] == pytest.approx(time_hours)
+    for name, route_L in routes.items():
+        assert totals['routes'][name]['fuel_L'] == pytest.approx(route_L)
+
+
+def test_streaming_matches_ledger(log):
+    ledger = measured_fuel_ledger(load_signals(log), max_hold=None)
+    totals = stream_fuel_totals(log, routes=ROUTES, chunk_rows=64)
+    assert totals['fuel_L'] == pytest.approx(ledger.total('fuel_L'))
+    assert totals['CO2_kg'] == pytest.approx(ledger.total('CO2_kg'))
+
+
+def test_unsorted_log_is_rejected(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('timestamp;var;value\n'
+                    '2024-09-10 06:20:02+00:00;gunnerus/RVG_mqtt/Engine1/fuel_consumption;36.0\n'
+                    '2024-09-10 06:20:03+00:00;gunnerus/RVG_mqtt/Engine1/fuel_consumption;36.0\n'
+                    '2024-09-10 06:20:00+00:00;gunnerus/RVG_mqtt/Engine1/fuel_consumption;36.0\n')
+    with pytest.raises(ValueError):
+        stream_fuel_totals(str(path), chunk_rows=1)
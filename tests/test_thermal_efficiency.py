@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from thermal_efficiency import EfficiencyFilter, RollingMean, RunningStats, filter_efficiency
+
+
+def _eta(n=2000):
+    rng = np.random.default_rng(0)
+    eta = rng.normal(40, 3, n)
+    eta[rng.integers(0, n, 40)] = 95.0  #spikes for the z-score
+    eta[rng.integers(0, n, 100)] = np.nan
+    eta[500:520] = np.nan  #longer than the window
+    return eta
+
+
+#Fed in chunks of any size, the rolling mean is that of pandas over the whole series
+@pytest.mark.parametrize('chunk', [1, 3, 7, 2000])
+def test_rolling_mean_matches_pandas(chunk):
+    eta = _eta()
+    rolling = RollingMean(5)
+    result = np.concatenate([rolling.update(eta[i:i + chunk]) for i in range(0, len(eta), chunk)])
+    expected = pd.Series(eta).rolling(window=5, min_periods=1).mean().to_numpy()
+    np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize('chunk', [1, 13, 2000])
+def test_running_stats_match_pandas(chunk):
+    eta = _eta()
+    stats = RunningStats()
+    for i in range(0, len(eta), chunk):
+        stats.update(eta[i:i + chunk])
+    series = pd.Series(eta)
+    assert stats.count == series.count()
+    assert stats.mean == pytest.approx(series.mean(), rel=1e-12)
+    assert stats.std == pytest.approx(series.std(ddof=0), rel=1e-12)
+
+
+#Same samples kept as rolling().mean() + zscore(...fillna(0)) in Task03_part1.py
+@pytest.mark.parametrize('chunk_rows', [64, 1_000_000])
+def test_filter_matches_task03_part1(chunk_rows):
+    eta = _eta()
+    smoothed = pd.Series(eta).rolling(window=5, min_periods=1).mean()
+    filled = smoothed.fillna(0)
+    z = (filled - filled.mean()) / filled.std(ddof=0)
+    expected = np.where(z.abs() > 3, np.nan, smoothed)
+    assert (z.abs() > 3).sum() > smoothed.isna().sum()  #the spikes are rejected, not only the gap
+    result = filter_efficiency(eta, window=5, z_limit=3, chunk_rows=chunk_rows)
+    np.testing.assert_allclose(result['filtered'], expected, rtol=1e-12)
+    assert result['min'] == pytest.approx(np.nanmin(expected), rel=1e-12)
+    assert result['argmax'] == int(np.nanargmax(expected))
+
+
+def test_live_filter_tracks_extremes():
+    live = EfficiencyFilter(window=5, z_limit=3)
+    eta = _eta()
+    timestamps = np.arange(len(eta))
+    filtered = np.concatenate([live.update(timestamps[i:i + 100], eta[i:i + 100]) for i in range(0, len(eta), 100)])
+    assert live.min == (int(np.nanargmin(filtered)), np.nanmin(filtered))
+    assert live.max == (int(np.nanargmax(filtered)), np.nanmax(filtered))
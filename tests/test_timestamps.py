@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from timestamps import parse_timestamp, parse_timestamps
+
+ISO = [
+    '2024-09-10 06:20:00.031000+00:00',
+    '2024-09-10 06:20:01+00:00',  #fraction dropped when it is zero
+    '2024-09-10T06:20:01.5Z',
+    '2024-09-10T06:20:01.123456789',
+    '2024-09-10 08:20:01.25+02:00',
+    '2024-09-10 00:50:01-0530',
+    '2024-02-29 23:59:59.999',
+    '1969-12-31 23:59:59.9+00:00',
+    '2024-09-10 06:20',
+    '2024-09-10',
+]
+#Not ISO 8601, from a logger with another format: decoded by pandas
+OTHER = ['2024/09/10 06:20:00+00:00', '2024/09/10 07:21:01+00:00', '2024/09/11 23:59:59+00:00']
+
+
+def _expected(values):
+    return np.array([pd.Timestamp(pd.to_datetime(value, utc=True)).as_unit('ns').value for value in values])
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 4, 1 << 16])
+def test_matches_pandas(chunk_rows):
+    values = np.array(ISO * 3, dtype=object)
+    assert np.array_equal(parse_timestamps(values, chunk_rows), _expected(values))
+
+
+#Same length as ISO[1], so they are matched against its layout first and fail its separator check
+def test_other_formats_fall_back_to_pandas():
+    values = np.array(OTHER * 2, dtype=object)
+    assert np.array_equal(parse_timestamps(values), _expected(values))
+
+
+def test_one_layout_per_column():
+    values = pd.Series(pd.date_range('2024-09-10 06:20', periods=5000, freq='317ms', tz='UTC').astype(str))
+    expected = pd.to_datetime(values, utc=True, format='ISO8601').astype('int64').to_numpy()
+    assert np.array_equal(parse_timestamps(values), expected)
+
+
+#Invalid dates fit the layout but are handed to pandas, which raises as it did before
+@pytest.mark.parametrize('value', ['2023-02-29 06:20:00+00:00', '2024-09-10 24:00:00+00:00', '2024-13-10 06:20:00'])
+def test_invalid_date_raises_like_pandas(value):
+    with pytest.raises(ValueError):
+        pd.to_datetime([value], utc=True)
+    with pytest.raises(ValueError):
+        parse_timestamps(np.array(['2024-09-10 06:20:00+00:00', value], dtype=object))
+    assert parse_timestamp(value) is None
+
+
+def test_single_and_non_string_input():
+    assert parse_timestamp(ISO[4]) == _expected([ISO[4]])[0]
+    assert parse_timestamp(OTHER[1]) is None
+    stamps = _expected(ISO)
+    assert np.array_equal(parse_timestamps(stamps.astype('datetime64[ns]')), stamps)
+    assert np.array_equal(parse_timestamps(np.array([1, 2])), [1, 2])
@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+
+import tracing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = '''
+from tracing import stage, traced
+
+@traced('derive', rows_in=lambda args: len(args[0]), rows_out=len)
+def double(values):
+    with stage('inner', 'filter', rows_in=len(values)) as current:
+        current.set_rows(rows_out=1)
+    return values * 2
+
+double([1, 2, 3])
+try:
+    with stage('broken', 'report'):
+        raise KeyError('topic')
+except KeyError:
+    pass
+'''
+
+
+#With PSM_TRACE set, the stages are written at exit as a Chrome trace and summarised on stderr
+def test_chrome_trace_written_at_exit(tmp_path):
+    path = str(tmp_path / 'trace.json')
+    process = subprocess.run([sys.executable, '-c', SCRIPT], cwd=ROOT, env=dict(os.environ, PSM_TRACE=path),
+                             capture_output=True, text=True, check=True)
+    with open(path) as f:
+        document = json.load(f)
+    assert document['displayTimeUnit'] == 'ms'
+    events = {event['name']: event for event in document['traceEvents']}
+    assert list(events) == ['inner', 'derive', 'broken']  #written when a stage ends
+    for event in events.values():
+        assert event['ph'] == 'X' and event['dur'] >= 0 and event['pid'] > 0 and 'tid' in event
+        assert event['args']['cpu_ms'] >= 0 and event['args']['peak_memory_bytes'] >= 0
+
+    inner, derive = events['inner'], events['derive']
+    assert (inner['cat'], inner['args']['rows_in'], inner['args']['rows_out']) == ('filter', 3, 1)
+    assert (derive['cat'], derive['args']['rows_in'], derive['args']['rows_out']) == ('stage', 3, 6)
+    assert derive['args']['func'] == 'double'
+    assert derive['ts'] <= inner['ts'] and inner['ts'] + inner['dur'] <= derive['ts'] + derive['dur']
+    assert events['broken']['args']['error'] == "KeyError: 'topic'"
+
+    header = process.stderr.splitlines()[0].split()
+    assert header == ['stage', 'calls', 'wall', 'ms', 'cpu', 'ms', 'peak', 'MB']
+    assert f'Trace written to {path}' in process.stderr
+
+
+#Without PSM_TRACE nothing is wrapped or recorded
+def test_disabled_costs_nothing():
+    if tracing.enabled:
+        return
+
+    def func():
+        return 1
+
+    assert tracing.traced('x')(func) is func
+    with tracing.stage('x') as current:
+        current.set_rows(rows_out=1)
+    assert current is tracing.stage('y')
+    assert tracing.trace_document()['traceEvents'] == []
@@ -0,0 +1,154 @@
+#Thermal efficiency of the engines with rolling-mean smoothing and z-score outlier rejection
+#
+#   eta_th [%] = 100 * 3.6 * P [kW] / (fuel [kg/h] * 45.4 [MJ/kg])   (3.6 and 45.4 from constants.py)
+#
+#Everything stays float64 with NaN for "no value" (instead of None in an object column).
+#The rolling mean carries the last window - 1 samples from one chunk to the next and the
+#mean/std for the z-score are Welford running statistics merged chunk by chunk, so a
+#series of any length is processed in fixed size chunks:
+#   filter_efficiency  - whole series (two passes: smoothing + statistics, then rejection),
+#                        same result as rolling().mean() + scipy.stats.zscore in Task03_part1.py
+#   EfficiencyFilter   - live data, one per engine; a sample is judged against the
+#                        statistics of everything seen up to and including its chunk
+
+import numpy as np
+
+from constants import conversion_ratio_megajoule_to_kilowatt, energy_fuel
+from tracing import traced
+
+threshold = 10 #[kW], below this engine load eta is not defined (goes towards infinity)
+
+WINDOW = 5
+Z_LIMIT = 3
+CHUNK_ROWS = 1_000_000
+
+
+#Thermal efficiency [%], NaN where the engine load is below threshold
+def thermal_efficiency(engine_load, fuel_kg_per_h, threshold=threshold):
+    engine_load = np.asarray(engine_load, dtype=np.float64)
+    fuel_kg_per_h = np.asarray(fuel_kg_per_h, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        #Same operation order as Task03_part1.py, so the values match it to the last digit
+        eta = 100 * (conversion_ratio_megajoule_to_kilowatt * engine_load) / (fuel_kg_per_h * energy_fuel)
+    eta[engine_load < threshold] = np.nan
+    return eta
+
+
+class RollingMean:
+
+    #Mean of the last window samples, NaN left out (like rolling(window, min_periods=1).mean())
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.carry = np.full(window - 1, np.nan)
+
+    #Window sums are added up one lag at a time (window passes, no running cumsum drift on long series)
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        joined = np.concatenate([self.carry, values])
+        valid = ~np.isnan(joined)
+        filled = np.where(valid, joined, 0.0)
+        total = np.zeros(len(values))
+        count = np.zeros(len(values))
+        for lag in range(self.window):
+            total += filled[self.window - 1 - lag:len(joined) - lag]
+            count += valid[self.window - 1 - lag:len(joined) - lag]
+        self.carry = joined[len(joined) - (self.window - 1):]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(count > 0, total / count, np.nan)
+
+
+class RunningStats:
+
+    #Welford count/mean/M2, updated with whole chunks (Chan et al. merge of two sets)
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        n = len(values)
+        if n == 0:
+            return
+        mean = values.mean()
+        m2 = np.sum((values - mean) ** 2)
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    #Population standard deviation (ddof=0, like scipy.stats.zscore)
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.count) if self.count else np.nan
+
+    def zscore(self, values):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (np.asarray(values, dtype=np.float64) - self.mean) / self.std
+
+
+#Index and value of the minimum and maximum, ignoring NaN (None for an all-NaN series)
+def extrema(values):
+    values = np.asarray(values, dtype=np.float64)
+    if np.isnan(values).all():
+        return {'argmin': None, 'min': np.nan, 'argmax': None, 'max': np.nan}
+    argmin = int(np.nanargmin(values))
+    argmax = int(np.nanargmax(values))
+    return {'argmin': argmin, 'min': values[argmin], 'argmax': argmax, 'max': values[argmax]}
+
+
+#Smooth eta with a rolling mean and drop samples with |z| > z_limit.
+#fill_value replaces NaN in the smoothed series for the statistics (0 like zscore(...fillna(0)) in
+#Task03_part1.py), None leaves them out. Returns a dict of smoothed, zscore and filtered arrays
+#plus argmin/min/argmax/max of filtered.
+@traced('derive', rows_in=lambda args: len(args[0]))
+def filter_efficiency(eta, window=WINDOW, z_limit=Z_LIMIT, fill_value=0.0, chunk_rows=CHUNK_ROWS):
+    eta = np.asarray(eta, dtype=np.float64)
+    smoothed = np.empty(len(eta))
+    rolling = RollingMean(window)
+    stats = RunningStats()
+    for start in range(0, len(eta), chunk_rows):
+        chunk = rolling.update(eta[start:start + chunk_rows])
+        smoothed[start:start + chunk_rows] = chunk
+        stats.update(chunk if fill_value is None else np.where(np.isnan(chunk), fill_value, chunk))
+
+    zscore = np.empty(len(eta))
+    filtered = np.empty(len(eta))
+    for start in range(0, len(eta), chunk_rows):
+        chunk = smoothed[start:start + chunk_rows]
+        z = stats.zscore(chunk if fill_value is None else np.where(np.isnan(chunk), fill_value, chunk))
+        zscore[start:start + chunk_rows] = z
+        filtered[start:start + chunk_rows] = np.where(np.abs(z) > z_limit, np.nan, chunk)
+
+    result = {'smoothed': smoothed, 'zscore': zscore, 'filtered': filtered}
+    result.update(extrema(filtered))
+    return result
+
+
+class EfficiencyFilter:
+
+    #Incremental filter for one engine's live eta samples
+    def __init__(self, window=WINDOW, z_limit=Z_LIMIT):
+        self.z_limit = z_limit
+        self.rolling = RollingMean(window)
+        self.stats = RunningStats()
+        self.min = (None, np.inf)  #(timestamp, filtered eta)
+        self.max = (None, -np.inf)
+
+    #Filtered eta for a chunk of (timestamps, eta) samples
+    def update(self, timestamps, eta):
+        smoothed = self.rolling.update(eta)
+        self.stats.update(smoothed)
+        z = self.stats.zscore(smoothed)
+        filtered = np.where(np.abs(z) > self.z_limit, np.nan, smoothed)
+        if self.stats.count < 2:
+            filtered = smoothed  #no spread to judge against yet
+        found = extrema(filtered)
+        if found['argmin'] is not None:
+            if found['min'] < self.min[1]:
+                self.min = (timestamps[found['argmin']], found['min'])
+            if found['max'] > self.max[1]:
+                self.max = (timestamps[found['argmax']], found['max'])
+        return filtered
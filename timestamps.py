@@ -0,0 +1,185 @@
+#Format-aware vectorized decoding of the data.csv timestamps to int64 epoch ns (UTC)
+#
+#The timestamps are ISO 8601 strings such as
+#   2024-09-10 06:20:00.031000+00:00
+#('T' or ' ' between date and time, 0-9 fraction digits, an offset, 'Z' or none). Instead
+#of letting pandas work out the format value by value, the strings are laid out as a
+#fixed width byte matrix, the layout of every distinct string length is detected once
+#from one sample, and the fields of all rows of that length are read with integer
+#arithmetic on the digit columns. Loggers that drop the fraction when it is zero give
+#two lengths, and both are decoded this way.
+#
+#Naive times are taken as UTC, like pd.to_datetime(..., utc=True) and signal_store.to_ns.
+#Rows that don't fit the detected layout (other formats, invalid dates) are handed to
+#pd.to_datetime(..., utc=True), so they give the same result, or the same error, as before.
+
+import re
+
+import numpy as np
+
+_ISO = re.compile(rb'(\d{4})-(\d\d)-(\d\d)(?:[ T](\d\d):(\d\d)(?::(\d\d)(?:[.,](\d{1,9}))?)?)?'
+                  rb'(?:(Z)|([+-])(\d\d):?(\d\d))?')
+_FIELDS = ('year', 'month', 'day', 'hour', 'minute', 'second', 'fraction', 'zulu', 'sign', 'offset_hour', 'offset_minute')
+_DIGITS = ('year', 'month', 'day', 'hour', 'minute', 'second', 'fraction', 'offset_hour', 'offset_minute')
+_DAYS_IN_MONTH = np.array([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+_MASK_DIGITS = bytes.maketrans(b'0123456789', b'0000000000')
+
+CHUNK_ROWS = 1 << 16
+
+_layouts = {}
+
+
+#Layout of one timestamp (bytes): positions of its digits, {field: (first, stop)} into those digits,
+#the position of the offset sign and the separator bytes every row of the layout must have;
+#None when it is not an ISO 8601 timestamp
+def detect_format(sample):
+    key = sample.translate(_MASK_DIGITS)  #the layout only depends on where the digits are
+    if key in _layouts:
+        return _layouts[key]
+    match = _ISO.fullmatch(sample)
+    layout = None
+    if match is not None:
+        digits, fields = [], {}
+        for i, name in enumerate(_FIELDS):
+            if match.group(i + 1) is not None and name in _DIGITS:
+                start, stop = match.span(i + 1)
+                fields[name] = (len(digits), len(digits) + stop - start)
+                digits.extend(range(start, stop))
+        sign = match.start(9) if match.group(9) is not None else None
+        literals = [i for i in range(len(sample)) if i not in digits and i != sign]
+        layout = {
+            'width': len(sample),
+            'digits': np.array(digits, dtype=np.intp),
+            'fields': fields,
+            'sign': sign,
+            'literals': np.array(literals, dtype=np.intp),
+            'literal_bytes': np.frombuffer(sample, dtype=np.uint8)[literals][:, None],
+        }
+    if len(_layouts) < 256:
+        _layouts[key] = layout
+    return layout
+
+
+#Days since 1970-01-01 of a proleptic Gregorian date (arrays), from H. Hinnant's days_from_civil
+def _days_from_civil(year, month, day):
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+#Epoch ns and a valid flag per timestamp of a uint8 matrix (character position x timestamps) with this layout
+def _decode(columns, layout):
+    fields = layout['fields']
+    digits = columns[layout['digits']] - np.uint8(48)  #wraps around for bytes below '0'
+    valid = (digits <= 9).all(axis=0)
+    valid &= (columns[layout['literals']] == layout['literal_bytes']).all(axis=0)
+    numbers = {}
+    for name, (first, stop) in fields.items():
+        number = digits[first].astype(np.int32)  #9 digits at most
+        for row in range(first + 1, stop):
+            number *= 10
+            number += digits[row]
+        numbers[name] = number
+
+    year, month, day = numbers['year'], numbers['month'], numbers['day']
+    hour, minute, second = (numbers.get(name, 0) for name in ('hour', 'minute', 'second'))
+    valid &= (month >= 1) & (month <= 12) & (day >= 1)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    valid &= day <= _DAYS_IN_MONTH[np.clip(month, 0, 12)] - ((month == 2) & ~leap)
+    valid &= (hour < 24) & (minute < 60) & (second < 60)
+
+    seconds = _days_from_civil(year, month, day).astype(np.int64) * 86400 + (hour * 3600 + minute * 60 + second)
+    ns = seconds * 1_000_000_000
+    if 'fraction' in fields:
+        first, stop = fields['fraction']
+        ns += numbers['fraction'].astype(np.int64) * 10 ** (9 - (stop - first))
+    if layout['sign'] is not None:
+        sign = columns[layout['sign']]
+        valid &= (sign == ord('+')) | (sign == ord('-'))
+        valid &= (numbers['offset_hour'] < 24) & (numbers['offset_minute'] < 60)
+        offset = (numbers['offset_hour'] * 60 + numbers['offset_minute']).astype(np.int64) * 60_000_000_000
+        ns -= np.where(sign == ord('-'), -offset, offset)
+    return ns, valid
+
+
+def _pandas(values):
+    import pandas as pd
+
+    return pd.DatetimeIndex(pd.to_datetime(values, utc=True)).as_unit('ns').asi8
+
+
+#String lengths of a (character position x timestamps) uint8 matrix of NUL padded bytes strings;
+#only the trailing positions that are NUL in some rows are looked at
+def _lengths(columns):
+    width = len(columns)
+    lengths = None
+    while width and not columns[width - 1].all():
+        width -= 1
+        ends = columns[width] != 0
+        lengths = ends.astype(np.intp) if lengths is None else lengths + ends
+    return np.full(columns.shape[1], width, dtype=np.intp) if lengths is None else lengths + width
+
+
+#Decode one chunk of bytes strings into result, returns the rows that did not fit a layout
+def _parse_chunk(text, result):
+    #One row per character position, so every field is read from contiguous memory
+    columns = np.ascontiguousarray(text.view(np.uint8).reshape(len(text), text.dtype.itemsize).T)
+    lengths = _lengths(columns)
+    done = np.zeros(len(text), dtype=bool)
+    present = np.flatnonzero(np.bincount(lengths))
+    for length in present:
+        rows = slice(None) if len(present) == 1 else np.flatnonzero(lengths == length)
+        layout = detect_format(text[rows][0] if isinstance(rows, slice) else text[rows[0]])
+        if layout is None:
+            continue
+        ns, valid = _decode(columns[:length, rows], layout)
+        if isinstance(rows, slice):
+            result[valid] = ns[valid]
+            done[valid] = True
+        else:
+            result[rows[valid]] = ns[valid]
+            done[rows[valid]] = True
+    return np.flatnonzero(~done)
+
+
+#Timestamps (strings, datetime64 or epoch ns integers) to an int64 array of epoch ns (UTC).
+#Strings are decoded in chunks of chunk_rows, small enough for the byte matrix to stay in cache.
+def parse_timestamps(values, chunk_rows=CHUNK_ROWS):
+    if hasattr(values, 'to_numpy'):
+        values = values.to_numpy()
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[ns]').astype(np.int64)
+    if values.dtype.kind in 'iu':
+        return values.astype(np.int64)
+
+    result = np.empty(len(values), dtype=np.int64)
+    rest = []
+    for start in range(0, len(values), chunk_rows):
+        chunk = values[start:start + chunk_rows]
+        try:
+            text = np.ascontiguousarray(chunk.astype('S') if chunk.dtype.kind != 'S' else chunk)
+        except (UnicodeEncodeError, ValueError, TypeError):
+            rest.append(np.arange(start, start + len(chunk)))
+            continue
+        rest.append(_parse_chunk(text, result[start:start + len(chunk)]) + start)
+    rest = np.concatenate(rest) if rest else np.empty(0, dtype=np.intp)
+    if len(rest):
+        result[rest] = _pandas(values[rest])
+    return result
+
+
+#One ISO 8601 timestamp string to epoch ns (UTC), or None when it is not in a format detect_format knows
+def parse_timestamp(text):
+    try:
+        sample = text.encode('ascii')
+    except UnicodeEncodeError:
+        return None
+    layout = detect_format(sample)
+    if layout is None:
+        return None
+    ns, valid = _decode(np.frombuffer(sample, dtype=np.uint8).reshape(-1, 1), layout)
+    return int(ns[0]) if valid[0] else None
@@ -0,0 +1,193 @@
+#Stage level tracing of the analysis pipeline
+#
+#Turned on for any script or entry point with one environment variable:
+#   PSM_TRACE=trace.json python Q1_ii.py      (PSM_TRACE=1 writes psm_trace.json)
+#Every traced stage (load, filter, align, derive, integrate, report, ...) records wall
+#time, CPU time, rows in/out and peak traced memory (tracemalloc). At exit the stages
+#are written as a Chrome trace (open in chrome://tracing or https://ui.perfetto.dev)
+#and summarised on stderr.
+#
+#When PSM_TRACE is not set, traced() returns the function itself and stage() a shared
+#do-nothing context manager, so the instrumentation costs nothing in normal runs.
+#The flag is read once at import, set it before starting the program.
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+TRACE_ENV = 'PSM_TRACE'
+DEFAULT_TRACE_FILE = 'psm_trace.json'
+
+_events = []
+_stack = threading.local()
+_path = None
+enabled = False
+
+
+class _NullStage:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_rows(self, rows_in=None, rows_out=None):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+
+    def __init__(self, name, category, rows_in, args):
+        self.name = name
+        self.category = category
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.args = args
+        self.peak = 0
+
+    def set_rows(self, rows_in=None, rows_out=None):
+        if rows_in is not None:
+            self.rows_in = rows_in
+        if rows_out is not None:
+            self.rows_out = rows_out
+
+    def __enter__(self):
+        import tracemalloc
+
+        stack = _frames()
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        stack.append(self)
+        self.wall = time.perf_counter_ns()
+        self.cpu = time.process_time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        import tracemalloc
+
+        wall = time.perf_counter_ns() - self.wall
+        cpu = time.process_time_ns() - self.cpu
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        stack = _frames()
+        stack.pop()
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, self.peak)
+        args = dict(self.args, cpu_ms=cpu / 1e6, peak_memory_bytes=self.peak)
+        if self.rows_in is not None:
+            args['rows_in'] = self.rows_in
+        if self.rows_out is not None:
+            args['rows_out'] = self.rows_out
+        if exc_type is not None:
+            args['error'] = f'{exc_type.__name__}: {exc}'
+        _events.append({
+            'name': self.name,
+            'cat': self.category,
+            'ph': 'X',
+            'ts': self.wall / 1000,
+            'dur': wall / 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args,
+        })
+        return False
+
+
+def _frames():
+    frames = getattr(_stack, 'frames', None)
+    if frames is None:
+        frames = _stack.frames = []
+    return frames
+
+
+#Context manager for one stage; use set_rows() on it to record the rows in and out
+def stage(name, category='stage', rows_in=None, **args):
+    if not enabled:
+        return _NULL_STAGE
+    return _Stage(name, category, rows_in, args)
+
+
+def _rows(func, value):
+    try:
+        return func(value)
+    except Exception:
+        return None
+
+
+#Decorator tracing every call of a function as stage name.
+#rows_in(args) and rows_out(result) give the row counts, e.g. rows_out=len.
+def traced(name=None, category='stage', rows_in=None, rows_out=None):
+    def decorate(func):
+        if not enabled:
+            return func
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name, category, func=func.__qualname__) as current:
+                if rows_in is not None:
+                    current.set_rows(rows_in=_rows(rows_in, args))
+                result = func(*args, **kwargs)
+                if rows_out is not None:
+                    current.set_rows(rows_out=_rows(rows_out, result))
+                return result
+        return wrapper
+    return decorate
+
+
+#Recorded stages as a Chrome trace document
+def trace_document():
+    return {'traceEvents': list(_events), 'displayTimeUnit': 'ms'}
+
+
+def write(path=None):
+    path = path or _path or DEFAULT_TRACE_FILE
+    with open(path, 'w') as f:
+        json.dump(trace_document(), f)
+    return path
+
+
+#Wall time, CPU time and peak memory per stage name on stderr
+def summary(file=sys.stderr):
+    totals = {}
+    for event in _events:
+        total = totals.setdefault(event['name'], [0, 0.0, 0.0, 0])
+        total[0] += 1
+        total[1] += event['dur'] / 1000
+        total[2] += event['args']['cpu_ms']
+        total[3] = max(total[3], event['args']['peak_memory_bytes'])
+    print(f"{'stage':<28}{'calls':>6}{'wall ms':>12}{'cpu ms':>12}{'peak MB':>10}", file=file)
+    for name, (calls, wall, cpu, peak) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        print(f'{name:<28}{calls:>6}{wall:>12.1f}{cpu:>12.1f}{peak / 2**20:>10.1f}', file=file)
+
+
+def _finish():
+    if _events:
+        path = write()
+        summary()
+        print(f'Trace written to {path}', file=sys.stderr)
+
+
+#Start tracing (done at import when PSM_TRACE is set); path is the trace file written at exit
+def enable(path=DEFAULT_TRACE_FILE):
+    global enabled, _path
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if not enabled:
+        atexit.register(_finish)
+    enabled = True
+    _path = path
+
+
+if os.environ.get(TRACE_ENV):
+    enable(DEFAULT_TRACE_FILE if os.environ[TRACE_ENV] in ('1', 'true', 'yes') else os.environ[TRACE_ENV])